@@ -0,0 +1,66 @@
+import importlib.abc
+import importlib.util
+import os
+import pytest
+import random
+import sys
+
+# NOTE:
+# The modules are imported as utils.Uniswap.Uniswap_v2.Uniswap_v2_<name> by
+# the host project. This finder resolves that namespace to the
+# uniswap_v2_<name>.py files at the repository root, so the tests run
+# against this checkout.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'utils.Uniswap.Uniswap_v2'
+
+
+class _RepositoryFinder(importlib.abc.MetaPathFinder):
+
+    def find_spec(
+        self,
+        name,
+        path,
+        target = None
+    ):
+        if name in ('utils', 'utils.Uniswap', PACKAGE):
+            spec = importlib.util.spec_from_loader(name, loader = None, is_package = True)
+            spec.submodule_search_locations = []
+            return spec
+
+        if name.startswith(PACKAGE + '.Uniswap_v2_'):
+            file_name = 'u' + name[len(PACKAGE) + 2:] + '.py'
+            return importlib.util.spec_from_file_location(name, os.path.join(ROOT, file_name))
+
+        return None
+
+
+sys.meta_path.insert(0, _RepositoryFinder())
+
+
+@pytest.fixture
+def random_pool_dicts():
+    '''
+        Returns a function of n that builds n random pools in the
+        UniswapV2Pool input format, with reserves.
+    '''
+    def build(
+        n,
+        nr_tokens = 5000,
+        seed = 0
+    ):
+        rng = random.Random(seed)
+        tokens = ['0x' + rng.getrandbits(160).to_bytes(20, 'big').hex() for _ in range(nr_tokens)]
+        pools = list()
+        for _ in range(n):
+            token0, token1 = sorted(rng.sample(tokens, 2))
+            pools.append({
+                'pool_address': '0x' + rng.getrandbits(160).to_bytes(20, 'big').hex(),
+                'tokens': [token0, token1],
+                'source': 'UniswapV2',
+                'reserve0': rng.randrange(10**6, 2**112),
+                'reserve1': rng.randrange(10**6, 2**112)
+            })
+
+        return pools
+
+    return build
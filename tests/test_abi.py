@@ -0,0 +1,75 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_abi import (
+    SWAP_SELECTOR, encode_uint256, encode_bool, encode_address, encode_bytes32, encode_array, encode_bytes
+)
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_encoder import UniswapV2Encoder
+from collections import namedtuple
+import eth_abi
+import random
+import pytest
+
+ADDRESS = '0xB4e16d0168e52d35CaCD2c6185b44281Ec28C9Dc'
+
+
+def _eth_abi(
+    types,
+    values
+):
+    return eth_abi.encode_abi(types, values).hex()
+
+
+@pytest.mark.parametrize('value', [0, 1, 2**112 - 1, 2**256 - 1])
+def test_static_words_match_eth_abi(value):
+    assert encode_uint256(value) == _eth_abi(['uint256'], [value])
+    assert encode_bool(value) == _eth_abi(['bool'], [bool(value)])
+    assert encode_address(ADDRESS) == encode_address(ADDRESS.lower()) == _eth_abi(['address'], [ADDRESS])
+    assert encode_bytes32('0x' + '%064x' % value) == _eth_abi(['bytes32'], [value.to_bytes(32, 'big')])
+
+
+@pytest.mark.parametrize('length', [1, 31, 32, 33, 64, 100])
+def test_padded_bytes_match_eth_abi(length):
+    value = bytes(random.Random(length).getrandbits(8) for _ in range(length))
+
+    # Offset word, then the tail
+    expected = _eth_abi(['bytes'], [value])
+    assert encode_uint256(32) + encode_bytes(value) == expected
+    assert encode_bytes('0x' + value.hex()) == expected[64:]
+    assert len(encode_bytes(value)) % 64 == 0
+
+
+def test_empty_bytes_is_the_length_word():
+    # eth_abi v2 pads empty bytes with a zero word, both decode to b''
+    expected = _eth_abi(['bytes'], [b''])
+    assert expected == encode_uint256(32) + encode_uint256(0) + encode_uint256(0)
+    assert encode_bytes(b'') == encode_bytes('0x') == encode_uint256(0)
+
+    encoded = bytes.fromhex(encode_uint256(32) + encode_bytes(b''))
+    assert eth_abi.decode_abi(['bytes'], encoded) == (b'',)
+
+
+@pytest.mark.parametrize('length', [0, 1, 3])
+def test_arrays_match_eth_abi(length):
+    words = ['0x' + '%064x' % (i + 1) for i in range(length)]
+    addresses = ['0x' + '%040x' % (i + 1) for i in range(length)]
+
+    assert encode_uint256(32) + encode_array([encode_bytes32(w) for w in words]) == \
+        _eth_abi(['bytes32[]'], [[bytes.fromhex(w[2:]) for w in words]])
+    assert encode_uint256(32) + encode_array([encode_address(a) for a in addresses]) == \
+        _eth_abi(['address[]'], [addresses])
+
+
+def test_swap_calldata_decodes_as_eth_abi():
+    Hop = namedtuple('Hop', 'sell_token buy_token pools_utils pools_addresses exec_sell_amount exec_buy_amount slippage')
+    tokens = ['0x' + 'a' * 40, '0x' + 'b' * 40]
+    encoder = UniswapV2Encoder()
+    hop = Hop(tokens[0], tokens[1], tokens, [ADDRESS], 10**18, 2 * 10**18, 0.01)
+
+    data = encoder.encode_hop_single_pool(hop)['data']
+    assert data[:10] == SWAP_SELECTOR
+
+    amount0_out, amount1_out, to, payload = eth_abi.decode_abi(['uint256', 'uint256', 'address', 'bytes'], bytes.fromhex(data[10:]))
+    assert (amount0_out, amount1_out, payload) == (0, 2 * 10**18 - 2 * 10**16, b'')
+    assert to.lower() == encoder.resolver_contract.lower()
+
+    # One word shorter than eth_abi, the empty bytes padding
+    expected = _eth_abi(['uint256', 'uint256', 'address', 'bytes'], [amount0_out, amount1_out, to, b''])
+    assert data[10:] + encode_uint256(0) == expected
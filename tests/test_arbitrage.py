@@ -0,0 +1,156 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_arbitrage import UniswapV2CycleFinder
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+TOKEN_C = '0x' + 'c' * 40
+
+
+def _pool(
+    pool_address,
+    tokens,
+    reserve0 = 10**21,
+    reserve1 = 10**21,
+    source = 'UniswapV2'
+):
+    return {
+        'pool_address': pool_address,
+        'tokens': list(tokens),
+        'source': source,
+        'reserve0': reserve0,
+        'reserve1': reserve1
+    }
+
+
+def _pools():
+    # Two A/B pools and the B/C, C/A edges of the triangle
+    return [
+        _pool('0x01', (TOKEN_A, TOKEN_B), 10**21, 2 * 10**21),
+        _pool('0x02', (TOKEN_A, TOKEN_B), 10**21, 2 * 10**21, source = 'SushiSwap'),
+        _pool('0x03', (TOKEN_B, TOKEN_C), 2 * 10**21, 10**21),
+        _pool('0x04', (TOKEN_C, TOKEN_A), 10**21, 10**21)
+    ]
+
+
+def _profit(
+    finder,
+    cycle_id,
+    amount_in
+):
+    '''
+        Exact profit of a cycle for amount_in, pool by pool.
+    '''
+    _, pools, sell_token0 = finder.cycles[cycle_id]
+    amount = amount_in
+    for pool, zero_for_one in zip(pools, sell_token0):
+        reserves = (pool.reserve0, pool.reserve1) if zero_for_one else (pool.reserve1, pool.reserve0)
+        _, amount = pool.get_amount_out(amount, *reserves)
+
+    return amount - amount_in
+
+
+def _signature(
+    finder
+):
+    return sorted((token, tuple(p.pool_address for p in pools), sell_token0) for token, pools, sell_token0 in finder.cycles)
+
+
+def test_build_enumerates_pair_and_triangle_cycles():
+    pools = [UniswapV2Pool(p) for p in _pools()]
+    finder = UniswapV2CycleFinder(pools)
+
+    # 2 pool cycles both ways, 2 x 1 x 1 triangles both ways
+    assert len(finder.cycles) == 2 + 4
+    assert sorted(len(cycle_ids) for cycle_ids in finder.pool_cycles.values()) == [4, 4, 4, 4]
+    assert all(len(pools) == 2 for _, pools, _ in finder.cycles[:2])
+
+    # Triangles start from the lowest token
+    assert {token for token, pools, _ in finder.cycles if len(pools) == 3} == {TOKEN_A}
+
+    assert UniswapV2CycleFinder(pools, max_length = 2).build(pools) == 2
+
+    # Same cycles from a registry
+    registry = PoolRegistry()
+    registry.add_pools(_pools())
+    assert _signature(UniswapV2CycleFinder(registry)) == _signature(finder)
+
+
+def test_balanced_pools_have_no_opportunity():
+    finder = UniswapV2CycleFinder([UniswapV2Pool(p) for p in _pools()])
+
+    # Equal prices lose the fees, the triangle prices to 1
+    assert finder.scan() == []
+    assert finder.get_opportunities() == []
+
+
+def test_scan_finds_the_optimal_amount():
+    pools = [UniswapV2Pool(p) for p in _pools()]
+    pools[1].set_reserves(10**21, 22 * 10**20)
+    finder = UniswapV2CycleFinder(pools[:2])
+
+    opportunity, = finder.scan()
+
+    # Buy B where it is cheap, sell it where it is expensive
+    assert opportunity['token'] == TOKEN_A
+    assert opportunity['pools'] == ['0x02', '0x01']
+    assert opportunity['profit'] == _profit(finder, opportunity['cycle'], opportunity['amount_in']) > 0
+    assert opportunity['amounts'][0] == opportunity['amount_in']
+    assert opportunity['price_product'] > 1
+
+    amount_in = opportunity['amount_in']
+    for delta in (amount_in // 100, amount_in // 10**6):
+        assert opportunity['profit'] >= _profit(finder, opportunity['cycle'], amount_in + delta)
+        assert opportunity['profit'] >= _profit(finder, opportunity['cycle'], amount_in - delta)
+
+
+def test_triangle_is_found_in_its_profitable_direction():
+    pools = [UniswapV2Pool(p) for p in _pools()]
+    # C is cheap in A: A -> C -> B -> A pays out
+    pools[3].set_reserves(10**21, 12 * 10**20)
+    finder = UniswapV2CycleFinder(pools)
+
+    opportunities = finder.scan()
+
+    assert opportunities
+    assert all(len(o['pools']) == 3 and o['pools'][:2] == ['0x04', '0x03'] for o in opportunities)
+    assert all(o['profit'] == _profit(finder, o['cycle'], o['amount_in']) for o in opportunities)
+
+
+def test_update_rechecks_cycles_of_changed_pools():
+    pools = [UniswapV2Pool(p) for p in _pools()]
+    finder = UniswapV2CycleFinder(pools)
+    assert finder.scan() == []
+
+    pools[1].set_reserves(10**21, 22 * 10**20)
+    # 0x04 moves too, its cycles are only re-checked once it is reported
+    pools[3].set_reserves(10**21, 12 * 10**20)
+
+    found = finder.update(['0x02'])
+    assert ['0x02', '0x01'] in [o['pools'] for o in found]
+    assert all('0x02' in o['pools'] for o in found)
+
+    found = finder.update([pools[3], '0x05'])
+    assert found and all('0x04' in o['pools'] for o in found)
+
+    # By profit, with a floor
+    opportunities = finder.get_opportunities()
+    assert [o['profit'] for o in opportunities] == sorted((o['profit'] for o in opportunities), reverse = True)
+    assert finder.get_opportunities(min_profit = opportunities[0]['profit']) == []
+
+    # Closed opportunities are dropped
+    pools[1].set_reserves(10**21, 2 * 10**21)
+    pools[3].set_reserves(10**21, 10**21)
+    assert finder.update(['0x02', '0x04']) == []
+    assert finder.get_opportunities() == []
+
+
+def test_pools_without_reserves_are_skipped():
+    dicts = _pools()
+    dicts[1]['reserve0'] = dicts[1]['reserve1'] = None
+    pools = [UniswapV2Pool(p) for p in dicts]
+    pools[0].set_reserves(10**21, 22 * 10**20)
+    finder = UniswapV2CycleFinder(pools)
+
+    assert all('0x02' not in o['pools'] for o in finder.scan())
+    assert finder.evaluate(0) is None
@@ -0,0 +1,87 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_curves import UniswapV2CurveTable, RELATIVE_ERROR
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+import random
+import pytest
+
+
+def _pools(
+    n,
+    seed = 0
+):
+    rng = random.Random(seed)
+    pools = list()
+    for i in range(n):
+        pools.append(UniswapV2Pool({
+            'pool_address': '0x%040x' % (i + 1),
+            'tokens': ['0x%040x' % (2 * i + 1), '0x%040x' % (2 * i + 2)],
+            'source': 'SushiSwap' if i % 2 else 'UniswapV2',
+            'reserve0': rng.randrange(10**3, 2**112),
+            'reserve1': rng.randrange(10**3, 2**112)
+        }))
+
+    return pools
+
+
+def test_amount_out_within_error_bound():
+    pools = _pools(200)
+    table = UniswapV2CurveTable()
+    table.add_pools(pools)
+    rng = random.Random(1)
+
+    for pool in pools:
+        for token_in, reserve_in in ((pool.token0, pool.reserve0), (pool.token1, pool.reserve1)):
+            amounts_in = [1, 997, reserve_in, 10 * reserve_in] + [int(reserve_in * 10 ** rng.uniform(-12, 2)) for _ in range(10)]
+            assert table.check(pool, token_in, amounts_in) <= 1
+
+
+def test_amount_out_matches_exact_quote_direction():
+    pool = _pools(1)[0]
+    table = UniswapV2CurveTable()
+    table.add_pool(pool)
+    amount_in = pool.reserve1 // 100
+
+    amount_out = table.get_amount_out(pool.pool_address.upper().replace('0X', '0x'), pool.token1, amount_in)
+    _, exact = pool.get_amount_out(amount_in, pool.reserve1, pool.reserve0)
+
+    assert abs(amount_out - exact) <= table.get_error_bound(amount_out)
+    assert table.get_amount_out_batch([pool.pool_address], [pool.token1], [amount_in]) == [amount_out]
+
+
+def test_marginal_price_is_the_curve_slope():
+    pool = _pools(1)[0]
+    table = UniswapV2CurveTable()
+    table.add_pool(pool)
+    fee = pool.fork.fee_numerator / pool.fork.fee_denominator
+
+    # At zero the marginal price is the spot price after fee
+    spot = table.get_marginal_price(pool.pool_address, pool.token0, 0)
+    assert spot == pytest.approx(fee * pool.reserve1 / pool.reserve0, rel = RELATIVE_ERROR * 2)
+
+    for fraction in (1e-6, 1e-2, 1.0):
+        amount_in = pool.reserve0 * fraction
+        h = amount_in * 1e-6
+        slope = (table.get_amount_out(pool.pool_address, pool.token0, amount_in + h)
+                 - table.get_amount_out(pool.pool_address, pool.token0, amount_in - h)) / (2 * h)
+        price = table.get_marginal_price(pool.pool_address, pool.token0, amount_in)
+
+        assert price == pytest.approx(slope, rel = 1e-6)
+        assert price < spot
+
+
+def test_pools_without_reserves_and_updates():
+    pool = UniswapV2Pool({'pool_address': '0x01', 'tokens': ['0x0a', '0x0b'], 'source': 'UniswapV2'})
+    table = UniswapV2CurveTable()
+    table.add_pool(pool)
+
+    assert table.get_amount_out('0x01', '0x0a', 10**18) == 0
+    assert table.get_marginal_price('0x01', '0x0a', 10**18) == 0
+
+    pool.set_reserves(10**21, 2 * 10**21)
+    table.update_pools([pool])
+
+    assert len(table) == 1
+    assert table.check(pool, '0x0a', [10**18, 10**21]) <= 1
+    assert table.get_amount_out('0x01', '0x0a', 0) == 0
+
+    with pytest.raises(Exception, match = 'has no curve'):
+        table.get_row('0x02', '0x0a')
@@ -0,0 +1,287 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_encoder import UniswapV2Encoder
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from collections import namedtuple
+import json
+import pytest
+
+Hop = namedtuple('Hop', 'sell_token buy_token pools_utils pools_addresses exec_sell_amount exec_buy_amount slippage')
+
+USDC = '0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48'
+WETH = '0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2'
+PAIR = '0xB4e16d0168e52d35CaCD2c6185b44281Ec28C9Dc'
+
+# USDC/WETH pair state of the direct flash swap golden record
+RESERVE0 = 30000000 * 10**6
+RESERVE1 = 10000 * 10**18
+
+DAI = '0x6B175474E89094C44Da98b946EeDBD3C8a5E6a6c'
+
+
+def _pool(
+    source = 'UniswapV2'
+):
+    return UniswapV2Pool({
+        'pool_address': PAIR.lower(),
+        'tokens': [USDC.lower(), WETH.lower()],
+        'source': source,
+        'reserve0': RESERVE0,
+        'reserve1': RESERVE1
+    })
+
+
+def _decode_swap(
+    calldata
+):
+    '''
+        Returns (amount0Out, amount1Out, to) of swap(uint,uint,address,bytes) calldata.
+    '''
+    assert calldata[:10] == '0x022c0d9f'
+    words = [calldata[10 + 64 * i:10 + 64 * (i + 1)] for i in range(5)]
+
+    return int(words[0], 16), int(words[1], 16), '0x' + words[2][24:]
+
+
+def _k_holds(
+    reserve0,
+    reserve1,
+    amount0_in,
+    amount1_in,
+    amount0_out,
+    amount1_out
+):
+    '''
+        UniswapV2Pair.swap K check after the transfer in and the payout.
+    '''
+    if amount0_out >= reserve0 or amount1_out >= reserve1:
+        return False
+
+    balance0 = reserve0 + amount0_in - amount0_out
+    balance1 = reserve1 + amount1_in - amount1_out
+    balance0_adjusted = balance0 * 1000 - amount0_in * 3
+    balance1_adjusted = balance1 * 1000 - amount1_in * 3
+
+    return balance0_adjusted * balance1_adjusted >= reserve0 * reserve1 * 1000**2
+
+
+def test_direct_swap_golden_calldata():
+    encoder = UniswapV2Encoder()
+    hop = Hop(WETH, USDC, [WETH, USDC], [PAIR], 10**18, 2980000000, 0.01)
+
+    it_pre, approval, it = encoder.encode_hop(hop, None, verbose = False, pool = _pool())
+
+    assert approval == dict()
+    assert it_pre['target'] == WETH
+    assert it_pre['data'] == (
+        '0xa9059cbb000000000000000000000000b4e16d0168e52d35cacd2c6185b44281ec28c9dc'
+        '0000000000000000000000000000000000000000000000000de0b6b3a7640000'
+    )
+
+    # 2990701827 at 997/1000, less 1% slippage
+    assert it['target'] == PAIR
+    assert it['data'] == (
+        '0x022c0d9f'
+        '00000000000000000000000000000000000000000000000000000000b07a24b8'
+        '0000000000000000000000000000000000000000000000000000000000000000'
+        '0000000000000000000000007a359544e4031703a6149db2994afb4e324bb242'
+        '0000000000000000000000000000000000000000000000000000000000000080'
+        '0000000000000000000000000000000000000000000000000000000000000000'
+    )
+    assert it['outputs'] == [{'token': USDC, 'amount': '2960794808'}]
+
+    # The amount previously requested at the 9975/10000 pricing fee fails K
+    assert not _k_holds(RESERVE0, RESERVE1, 0, 10**18, 2992201527, 0)
+    assert _k_holds(RESERVE0, RESERVE1, 0, 10**18, 2990701827, 0)
+
+
+@pytest.mark.parametrize('source', ['UniswapV2', 'SushiSwap'])
+@pytest.mark.parametrize('sell_weth', [True, False])
+@pytest.mark.parametrize('slippage', [0.0, 0.001, 0.01])
+def test_direct_swap_satisfies_k(
+    source,
+    sell_weth,
+    slippage
+):
+    encoder = UniswapV2Encoder()
+    pool = _pool(source)
+
+    if sell_weth:
+        amount_in = 10**18
+        hop = Hop(WETH, USDC, [WETH, USDC], [PAIR], amount_in, 2900000000, slippage)
+    else:
+        amount_in = 3000 * 10**6
+        hop = Hop(USDC, WETH, [USDC, WETH], [PAIR], amount_in, 99 * 10**16, slippage)
+
+    it = encoder.encode_hop_single_pool(hop, pool = pool)
+    amount0_out, amount1_out, to = _decode_swap(it['data'])
+
+    amount0_in, amount1_in = (0, amount_in) if sell_weth else (amount_in, 0)
+    assert (amount0_out == 0) == (not sell_weth)
+    assert to == encoder.resolver_contract
+    assert _k_holds(RESERVE0, RESERVE1, amount0_in, amount1_in, amount0_out, amount1_out)
+
+    # The pair quote is the K bound: one more unit reverts
+    bound = pool.get_pair_amount_out(amount_in, *((RESERVE1, RESERVE0) if sell_weth else (RESERVE0, RESERVE1)))
+    assert max(amount0_out, amount1_out) <= bound
+    if sell_weth:
+        assert not _k_holds(RESERVE0, RESERVE1, 0, amount_in, bound + 1, 0)
+    else:
+        assert not _k_holds(RESERVE0, RESERVE1, amount_in, 0, 0, bound + 1)
+
+
+def test_direct_swap_rejects_quote_below_minimum():
+    encoder = UniswapV2Encoder()
+    hop = Hop(WETH, USDC, [WETH, USDC], [PAIR], 10**18, 3100000000, 0.01)
+
+    with pytest.raises(Exception, match = 'below minimum buy amount'):
+        encoder.encode_hop_single_pool(hop, pool = _pool())
+
+
+def test_direct_swap_without_pool_requests_minimum():
+    encoder = UniswapV2Encoder()
+    hop = Hop(WETH, USDC, [WETH, USDC], [PAIR], 10**18, 2980000000, 0.01)
+
+    amount0_out, amount1_out, _ = _decode_swap(encoder.encode_hop_single_pool(hop)['data'])
+
+    assert (amount0_out, amount1_out) == (2950200000, 0)
+    assert _k_holds(RESERVE0, RESERVE1, 0, 10**18, amount0_out, 0)
+
+
+def _estimates(
+    encoder,
+    hop,
+    pool = None
+):
+    '''
+        Estimated gas per target of the calldata each target encodes for hop.
+    '''
+    nr_hops = len(hop.pools_utils) - 1
+    estimates = {t: encoder.gas_model.estimate(t, nr_hops, encoder.encode(t, hop)['data']) for t in ('1inch', 'zeroex')}
+    if pool is not None:
+        calldata = [encoder.encode_sell_transfer(hop)['data'], encoder.encode_hop_single_pool(hop, pool = pool)['data']]
+        estimates['uniswap_v2'] = encoder.gas_model.estimate('uniswap_v2', 1, calldata)
+
+    return estimates
+
+
+def test_select_target_scores_encoded_calldata():
+    encoder = UniswapV2Encoder()
+    pool = UniswapV2Pool({'pool_address': PAIR.lower(), 'tokens': [USDC.lower(), WETH.lower()], 'source': 'UniswapV2', 'reserve0': 10**40, 'reserve1': 10**40})
+    small = Hop(WETH, USDC, [WETH, USDC], [PAIR], 1000, 900, 0.01)
+    large = Hop(WETH, USDC, [WETH, USDC], [PAIR], 10**30, 9 * 10**29, 0.01)
+
+    # The direct swap sends both amounts in full, unoswap rounds minReturn,
+    # so the direct path's lead shrinks as amounts grow
+    small_gap = _estimates(encoder, small, pool)['1inch'] - _estimates(encoder, small, pool)['uniswap_v2']
+    large_gap = _estimates(encoder, large, pool)['1inch'] - _estimates(encoder, large, pool)['uniswap_v2']
+    assert small_gap > large_gap > 0
+
+    assert encoder.select_target(small, direct = True, pool = pool) == 'uniswap_v2'
+    assert encoder.select_target(large, direct = True, pool = pool) == 'uniswap_v2'
+
+    # With execution costs between the two gaps, the choice flips with size
+    encoder.gas_model.base['uniswap_v2'] += (small_gap + large_gap) // 2
+    assert encoder.select_target(small, direct = True, pool = pool) == 'uniswap_v2'
+    assert encoder.select_target(large, direct = True, pool = pool) == '1inch'
+
+    it_pre, _, it = encoder.encode_hop(large, None, verbose = False, pool = pool)
+    assert it_pre == dict() and it['data'] == encoder.encode('1inch', large)['data']
+
+
+def test_select_target_flips_with_hop_count():
+    encoder = UniswapV2Encoder()
+    hops = [Hop(WETH, path[-1], path, [PAIR] * (len(path) - 1), 10**18, 10**17, 0.01)
+            for path in ([WETH, USDC], [WETH, USDC, DAI, WETH])]
+
+    # sellToUniswap pays less calldata per hop than unoswap, but more overall
+    gaps = [_estimates(encoder, hop)['zeroex'] - _estimates(encoder, hop)['1inch'] for hop in hops]
+    assert gaps[0] > gaps[1] > 0
+    assert [encoder.select_target(hop) for hop in hops] == ['1inch', '1inch']
+
+    encoder.gas_model.base['zeroex'] -= (gaps[0] + gaps[1]) // 2
+    assert [encoder.select_target(hop) for hop in hops] == ['1inch', 'zeroex']
+
+    # The direct swap only executes single pool hops
+    assert encoder.select_target(hops[0], direct = True) == 'uniswap_v2'
+    assert encoder.select_target(hops[1], direct = True) == 'zeroex'
+
+
+def test_pool_cache_is_a_bounded_lru():
+    encoder = UniswapV2Encoder()
+    encoder.pool_cache_size = 2
+
+    packed = encoder._to_pool(USDC, WETH)
+    encoder._to_pool(WETH, DAI)
+
+    # A hit refreshes the entry, whatever the token case
+    assert encoder._to_pool(USDC.lower(), WETH.upper().replace('0X', '0x')) == packed
+    encoder._to_pool(DAI, USDC)
+
+    assert list(encoder._pool_cache) == [(USDC.lower(), WETH.lower(), None), (DAI.lower(), USDC.lower(), None)]
+
+    # Directions and sources are cached apart
+    assert encoder._to_pool(WETH, USDC) != packed
+    assert encoder._to_pool(USDC, WETH, 'SushiSwap') != packed
+    assert len(encoder._pool_cache) == 2
+
+
+def test_pair_address_table_round_trip(tmp_path):
+    path = str(tmp_path / 'pairs.json')
+    UniswapV2Encoder().save_pair_address_table(path, [(WETH, USDC), (DAI, WETH)])
+
+    encoder = UniswapV2Encoder()
+    encoder.load_pair_address_table(path)
+
+    assert len(encoder.pair_address_table) == 2
+    assert encoder.pair_address_table[tuple(sorted((USDC.lower(), WETH.lower())))] == PAIR
+    assert encoder.get_pair_address(USDC, WETH) == PAIR
+
+    # Lookups come from the table, and loading drops packed pools
+    encoder._to_pool(USDC, WETH)
+    other = '0x' + '1' * 40
+    with open(path) as f:
+        table = json.load(f)
+    table['pairs'] = {','.join(sorted((USDC.lower(), WETH.lower()))): other}
+    with open(path, 'w') as f:
+        json.dump(table, f)
+    encoder.load_pair_address_table(path)
+
+    assert encoder.get_pair_address(WETH, USDC) == other
+    assert encoder._to_pool(USDC, WETH).endswith(other[2:])
+
+    # Other forks do not use the table
+    assert encoder.get_pair_address(WETH, USDC, 'SushiSwap') == UniswapV2Encoder().get_pair_address(WETH, USDC, 'SushiSwap')
+
+
+def test_pair_address_table_of_another_factory_raises(tmp_path):
+    path = str(tmp_path / 'pairs.json')
+    encoder = UniswapV2Encoder()
+    encoder.save_pair_address_table(path, [(WETH, USDC)])
+
+    encoder.factory_address = '0x' + '2' * 40
+    with pytest.raises(Exception, match = 'another factory'):
+        encoder.load_pair_address_table(path)
+
+    assert encoder.pair_address_table == dict()
+
+
+def test_encode_batch_matches_encode_hop(capsys):
+    encoder = UniswapV2Encoder()
+    pool = _pool()
+    hops = [Hop(WETH, USDC, [WETH, USDC], [PAIR], 10**18 + n, 2980000000, 0.01) for n in range(3)]
+    hops += [Hop(WETH, DAI, [WETH, USDC, DAI], [PAIR, PAIR], 10**18 + n, 10**20, 0.01) for n in range(2)]
+    hops += [Hop(USDC, WETH, [USDC, WETH], [PAIR], 10**9, 10**17, 0.01)]
+    pools = {PAIR: pool}
+
+    expected = [encoder.encode_hop(hop, None, verbose = False, pool = pools.get(hop.pools_addresses[0]) if len(hop.pools_addresses) == 1 else None) for hop in hops]
+    capsys.readouterr()
+
+    assert encoder.encode_batch(hops, pools = pools) == expected
+    assert capsys.readouterr().out == ''
+
+    # Direct swaps need the pool
+    assert [it_pre == dict() for it_pre, _, _ in encoder.encode_batch(hops)] == [True] * len(hops)
+    assert [it_pre == dict() for it_pre, _, _ in expected] == [False, False, False, True, True, False]
+
+    # Chunks on a process pool keep the hop order
+    assert encoder.encode_batch(iter(hops), pools = pools, processes = 2, chunk_size = 2) == expected
+    assert encoder.encode_batch([]) == []
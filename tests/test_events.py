@@ -0,0 +1,174 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_events import UniswapV2EventProcessor
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_helper import UniswapV2Helper
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+import json
+import os
+import pytest
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+LOG_FILE = os.path.join(FIXTURES, 'sync_swap_logs.jsonl')
+
+
+@pytest.fixture
+def snapshot():
+    with open(os.path.join(FIXTURES, 'sync_swap_get_reserves.json')) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def logs():
+    with open(LOG_FILE) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_pools(snapshot):
+    pools = list()
+    for n, (pool_address, reserves) in enumerate(snapshot['initial'].items()):
+        pools.append(UniswapV2Pool({
+            'pool_address': pool_address,
+            'source': 'UniswapV2',
+            'tokens': ['0x%040x' % (2 * n + 1), '0x%040x' % (2 * n + 2)],
+            'reserve0': reserves[0],
+            'reserve1': reserves[1]
+        }))
+
+    return pools
+
+
+def get_reserves(snapshot):
+    '''
+        (pool address) => (reserve0, reserve1) of the getReserves snapshot
+    '''
+    helper = UniswapV2Helper()
+
+    return {
+        pool_address.lower(): tuple(helper.process_balances_call(data)[:2])
+        for pool_address, data in snapshot['get_reserves'].items()
+    }
+
+
+def assert_reserves(processor, snapshot, skip_stale = False):
+    expected = get_reserves(snapshot)
+    actual = {a: (pool.reserve0, pool.reserve1) for a, pool in processor.pools.items()}
+    if skip_stale:
+        expected = {a: r for a, r in expected.items() if a not in processor.stale}
+        actual = {a: r for a, r in actual.items() if a not in processor.stale}
+
+    assert actual == expected
+
+
+def test_replay_log_file_matches_get_reserves(snapshot):
+    pools = make_pools(snapshot)
+    processor = UniswapV2EventProcessor(pools)
+
+    swaps = processor.replay_log_file(LOG_FILE)
+
+    assert_reserves(processor, snapshot)
+    assert processor.last_block == snapshot['block_number']
+
+    # The pool only traded in the reorged block is back to its block 99
+    # reserves, but it is flagged for a refresh as the node never confirmed them
+    stale_pool = '0x0d4a11d5eeaac28ec3f61d100daf4d40471f1852'
+    assert processor.stale == {stale_pool}
+    assert {pool.pool_address.lower() for pool in processor.get_changed()} == set(processor.pools) - {stale_pool}
+
+    # Swaps of the removed block and of the untracked pool are dropped, the
+    # others come in chain order
+    assert [swap['block_number'] for swap in swaps] == ['0x64', '0x64', '0x65', '0x65', '0x66', '0x66']
+    assert snapshot['untracked'] not in {swap['pool_address'] for swap in swaps}
+
+
+def test_replay_swaps_add_up_to_get_reserves(snapshot):
+    pools = make_pools(snapshot)
+    processor = UniswapV2EventProcessor(pools)
+    expected = get_reserves(snapshot)
+
+    swaps = processor.replay_log_file(LOG_FILE)
+
+    for pool in pools:
+        pool_address = pool.pool_address.lower()
+        reserve0, reserve1 = snapshot['initial'][pool.pool_address]
+        for swap in swaps:
+            if swap['pool_address'] == pool_address:
+                reserve0 += swap['amount0In'] - swap['amount0Out']
+                reserve1 += swap['amount1In'] - swap['amount1Out']
+
+        assert (reserve0, reserve1) == expected[pool_address]
+
+
+def test_streamed_batches_match_get_reserves(snapshot, logs):
+    pools = make_pools(snapshot)
+    processor = UniswapV2EventProcessor(pools)
+
+    # Block 100, block 101 as first mined, its removal, the new block 101 and 102
+    processor.process_logs(logs[:6])
+    processor.process_logs(logs[6:14])
+    assert processor.stale == set()
+
+    processor.process_logs(logs[14:22])
+    assert processor.stale == {
+        '0xb4e16d0168e52d35cacd2c6185b44281ec28c9dc',
+        '0xa478c2975ab1ea89e8196811f51a7b7ade33eb11',
+        '0x0d4a11d5eeaac28ec3f61d100daf4d40471f1852'
+    }
+
+    # The stale pool holds the reserves of the removed block until refreshed
+    processor.process_logs(logs[22:])
+    assert_reserves(processor, snapshot, skip_stale = True)
+    assert processor.stale == {'0x0d4a11d5eeaac28ec3f61d100daf4d40471f1852'}
+
+    # Late removed logs of the old block leave reserves of the new block alone
+    processor.process_logs(logs[14:22])
+    assert_reserves(processor, snapshot, skip_stale = True)
+    assert processor.stale == {'0x0d4a11d5eeaac28ec3f61d100daf4d40471f1852'}
+
+    # A getReserves refresh clears the stale pool
+    refresh_stale(processor, snapshot)
+    assert processor.stale == set()
+    assert_reserves(processor, snapshot)
+
+
+def refresh_stale(processor, snapshot):
+    '''
+        Answers the stale pools' getReserves calls from the snapshot.
+    '''
+    results = {a.lower(): d for a, d in snapshot['get_reserves'].items()}
+    for pool_address, call in processor.get_stale_calls():
+        assert call['attribute'] == 'balances'
+        assert call['params']['params'][0]['to'].lower() == pool_address
+        processor.refresh_stale(pool_address, results[pool_address])
+
+
+def test_refresh_stale_pools(snapshot, logs):
+    pools = make_pools(snapshot)
+    processor = UniswapV2EventProcessor(pools)
+    stale_pool = '0x0d4a11d5eeaac28ec3f61d100daf4d40471f1852'
+
+    processor.replay_log_file(LOG_FILE)
+    processor.get_changed()
+    assert [pool_address for pool_address, _ in processor.get_stale_calls()] == [stale_pool]
+
+    refresh_stale(processor, snapshot)
+
+    assert processor.stale == set() and processor.get_stale_calls() == []
+    assert [pool.pool_address.lower() for pool in processor.get_changed()] == [stale_pool]
+    assert_reserves(processor, snapshot)
+
+    # Refreshed reserves are not tied to a block, a removed Sync marks the pool again
+    processor.process_logs([log for log in logs[14:22] if log['address'].lower() == stale_pool])
+    assert processor.stale == {stale_pool}
+
+
+def test_removed_logs_without_block_hash_mark_pools_stale(snapshot, logs):
+    pools = make_pools(snapshot)
+    processor = UniswapV2EventProcessor(pools)
+
+    processor.process_logs(logs[:6])
+    removed = [dict(log, blockHash = None) for log in logs[14:22]]
+    processor.process_logs(removed)
+
+    assert processor.stale == {
+        '0xb4e16d0168e52d35cacd2c6185b44281ec28c9dc',
+        '0xa478c2975ab1ea89e8196811f51a7b7ade33eb11',
+        '0x0d4a11d5eeaac28ec3f61d100daf4d40471f1852'
+    }
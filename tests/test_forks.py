@@ -0,0 +1,97 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_forks import FORKS, get_fork, add_fork
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_quoter import UniswapV2Quoter
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_encoder import UniswapV2Encoder
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_helper import UniswapV2Helper
+import pytest
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+
+
+def _pool(
+    pool_address,
+    source
+):
+    return {
+        'pool_address': pool_address,
+        'tokens': [TOKEN_A, TOKEN_B],
+        'source': source,
+        'reserve0': 10**21,
+        'reserve1': 2 * 10**21
+    }
+
+
+def test_unknown_source_falls_back_to_uniswap_v2(capsys):
+    assert get_fork('Venue0') is FORKS['UniswapV2']
+    assert get_fork('Venue0') is FORKS['UniswapV2']
+
+    # One warning per source
+    out = capsys.readouterr().out
+    assert out.count('### WARNING: Unknown Uniswap V2 fork Venue0') == 1
+
+    with pytest.raises(Exception, match = 'Unknown Uniswap V2 fork Venue0'):
+        get_fork('Venue0', strict = True)
+
+
+def test_unknown_source_pools_load_and_quote():
+    pool = UniswapV2Pool(_pool('0x01', 'Venue1'))
+    reference = UniswapV2Pool(_pool('0x02', 'UniswapV2'))
+
+    assert pool.source == 'Venue1'
+    assert pool.fork is FORKS['UniswapV2']
+
+    quoter = UniswapV2Quoter()
+    amounts_out = quoter.quote_pools([pool, reference], TOKEN_A, 10**18)
+    assert amounts_out[0] == amounts_out[1] > 0
+
+    registry = PoolRegistry()
+    row = registry.add_pool(_pool('0x01', 'Venue1'))
+    assert registry[row].source == 'Venue1'
+    assert registry[row].fork is FORKS['UniswapV2']
+
+
+def test_pair_address_of_unknown_source_raises():
+    encoder = UniswapV2Encoder()
+
+    assert encoder.get_pair_address(TOKEN_A, TOKEN_B, source = 'SushiSwap') != encoder.get_pair_address(TOKEN_A, TOKEN_B)
+
+    with pytest.raises(Exception, match = 'Unknown Uniswap V2 fork Venue2'):
+        encoder.get_pair_address(TOKEN_A, TOKEN_B, source = 'Venue2')
+
+
+@pytest.mark.parametrize('source', ['UniswapV2', 'SushiSwap', 'PancakeSwapV2'])
+def test_pricing_fee_is_the_pair_fee(source):
+    fork = get_fork(source)
+    assert (fork.fee_numerator * fork.pair_fee_denominator) == (fork.pair_fee_numerator * fork.fee_denominator)
+
+    # Quotes are what swap() pays out
+    pool = UniswapV2Pool(_pool('0x01', source))
+    assert pool.get_amount_out(10**18, 10**21, 2 * 10**21)[1] == pool.get_pair_amount_out(10**18, 10**21, 2 * 10**21)
+
+
+def test_default_router_is_the_uniswap_v2_router():
+    helper = UniswapV2Helper()
+
+    assert helper.router_address == get_fork('UniswapV2').router_address
+    assert helper.get_amounts_out_call(10**18, [TOKEN_A, TOKEN_B])['params']['params'][0]['to'] == FORKS['UniswapV2'].router_address
+    assert helper.get_amounts_out_call(10**18, [TOKEN_A, TOKEN_B], source = 'PancakeSwapV2')['params']['params'][0]['to'] == FORKS['PancakeSwapV2'].router_address
+
+
+def test_unoswap_pool_word_carries_the_pair_fee():
+    encoder = UniswapV2Encoder()
+
+    assert encoder._to_pool(TOKEN_A, TOKEN_B)[2:26] == '00000000000000003b6d0340'
+    assert encoder._to_pool(TOKEN_B, TOKEN_A, 'SushiSwap')[2:26] == '80000000000000003b6d0340'
+    assert encoder._to_pool(TOKEN_A, TOKEN_B, 'PancakeSwapV2')[2:26] == '00000000000000003b74a460'
+    assert encoder._to_pool(TOKEN_A, TOKEN_B, 'PancakeSwapV2')[26:] == encoder.get_pair_address(TOKEN_A, TOKEN_B, 'PancakeSwapV2')[2:]
+
+
+def test_unoswap_rejects_inexact_pair_fee():
+    add_fork(FORKS['UniswapV2']._replace(name = 'Venue3', factory_address = '0x' + '1' * 40, pair_fee_numerator = 9973, pair_fee_denominator = 9999))
+    try:
+        with pytest.raises(Exception, match = 'no exact unoswap numerator'):
+            UniswapV2Encoder()._to_pool(TOKEN_A, TOKEN_B, 'Venue3')
+    finally:
+        del FORKS['Venue3']
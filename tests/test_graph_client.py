@@ -0,0 +1,274 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_graph_client import UniswapV2AsyncHelper
+from aiohttp import web
+import asyncio
+import pytest
+import re
+import threading
+
+
+def make_pairs(n):
+    return [
+        {
+            'id': '0x%040x' % (i + 1),
+            'token0': {'id': '0x%040x' % (1000 + i)},
+            'token1': {'id': '0x%040x' % (2000 + i)},
+            'createdAtBlockNumber': str(100 + i)
+        }
+        for i in range(n)
+    ]
+
+
+'''
+Subgraph transport serving pairs pages from memory
+'''
+class MockTransport:
+
+    def __init__(
+        self,
+        pairs,
+        failures = None,
+        hold = None
+    ):
+        # Pairs sorted by id, as the subgraph serves orderBy:id
+        self.pairs = sorted(pairs, key = lambda p: p['id'])
+
+        # (skip or cursor) => nr of failed responses before the page is served
+        self.failures = dict(failures or {})
+
+        # (skip) => Event the page waits for before it is served
+        self.hold = hold or dict()
+
+        self.lock = threading.Lock()
+        self.calls = list()
+
+    def _get_key(
+        self,
+        payload
+    ):
+        '''
+            Records the call and returns its page key, skip or cursor.
+        '''
+        query = payload['query']
+        skip = re.search(r'skip:(\d+)', query)
+        key = int(skip.group(1)) if skip else re.search(r'id_gt:"([^"]*)"', query).group(1)
+        with self.lock:
+            self.calls.append(key)
+
+        return key
+
+    def _fail(
+        self,
+        key
+    ):
+        with self.lock:
+            if self.failures.get(key):
+                self.failures[key] -= 1
+                return True
+
+        return False
+
+    def _get_page(
+        self,
+        key,
+        payload
+    ):
+        query = payload['query']
+        first = int(re.search(r'first:(\d+)', query).group(1))
+        block = re.search(r'createdAtBlockNumber_gt:(\d+)', query)
+
+        pairs = self.pairs
+        if block:
+            pairs = [p for p in pairs if int(p['createdAtBlockNumber']) > int(block.group(1))]
+
+        if isinstance(key, int):
+            page = pairs[key:key + first]
+        else:
+            page = [p for p in pairs if p['id'] > key][:first]
+
+        return {'data': {'pairs': page}}
+
+    def post(
+        self,
+        url,
+        payload
+    ):
+        key = self._get_key(payload)
+        if self._fail(key):
+            return {'errors': [{'message': 'indexer unavailable'}]}
+
+        if key in self.hold:
+            assert self.hold[key].wait(5)
+
+        return self._get_page(key, payload)
+
+
+'''
+Async subgraph transport serving pairs pages from memory, hold takes asyncio.Events
+'''
+class AsyncMockTransport(MockTransport):
+
+    async def post(
+        self,
+        url,
+        payload
+    ):
+        key = self._get_key(payload)
+        if self._fail(key):
+            return {'errors': [{'message': 'indexer unavailable'}]}
+
+        if key in self.hold:
+            await asyncio.wait_for(self.hold[key].wait(), 5)
+
+        # Pages of concurrent requests interleave
+        await asyncio.sleep(0)
+
+        return self._get_page(key, payload)
+
+
+def skip_queries(helper, nr_pages, first):
+    return [
+        {
+            'url': helper.graph_endpoint,
+            'query': '{pairs(first:' + str(first) + ',skip:' + str(n * first) + '){id,token0{id},token1{id}}}',
+            'source': 'UniswapV2'
+        }
+        for n in range(nr_pages)
+    ]
+
+
+def collect(helper, queries):
+    return asyncio.run(helper.get_pools(queries))
+
+
+def test_stream_pools_keeps_page_order_with_out_of_order_pages():
+    pairs = make_pairs(9)
+
+    async def run():
+        # The first page is held until the last page was served, so pages
+        # complete out of order
+        release = asyncio.Event()
+        transport = AsyncMockTransport(pairs, hold = {0: release})
+        helper = UniswapV2AsyncHelper(async_http_client = transport, concurrency = 3, backoff = 0)
+
+        original = transport.post
+
+        async def post(url, payload):
+            resp = await original(url, payload)
+            if 'skip:6' in payload['query']:
+                release.set()
+            return resp
+
+        transport.post = post
+
+        return await helper.get_pools(skip_queries(helper, 3, 3))
+
+    pools = asyncio.run(run())
+    addresses = [pool['pool_address'] for pool in pools]
+
+    # Every pool once, each page contiguous and in subgraph order
+    assert sorted(addresses) == [p['id'] for p in pairs]
+    pages = [addresses[i:i + 3] for i in range(0, 9, 3)]
+    assert all(page == sorted(page) for page in pages)
+    assert sorted(pages) == [[p['id'] for p in pairs[i:i + 3]] for i in range(0, 9, 3)]
+
+    # The held page is yielded last
+    assert pages[-1] == [p['id'] for p in pairs[:3]]
+    assert pools[-1]['token1'] == pairs[2]['token1']['id']
+
+
+def test_stream_pools_retries_failed_page():
+    pairs = make_pairs(6)
+    transport = AsyncMockTransport(pairs, failures = {3: 2})
+    helper = UniswapV2AsyncHelper(async_http_client = transport, retries = 3, backoff = 0)
+
+    pools = collect(helper, skip_queries(helper, 2, 3))
+
+    assert sorted(pool['pool_address'] for pool in pools) == [p['id'] for p in pairs]
+    assert transport.calls.count(3) == 3
+    assert transport.calls.count(0) == 1
+
+
+def test_stream_pools_raises_after_retries():
+    transport = AsyncMockTransport(make_pairs(6), failures = {3: 10})
+    helper = UniswapV2AsyncHelper(async_http_client = transport, retries = 2, backoff = 0)
+
+    with pytest.raises(Exception, match = 'Subgraph query failed'):
+        collect(helper, skip_queries(helper, 2, 3))
+
+    assert transport.calls.count(3) == 3
+
+
+def test_stream_pools_fetches_pages_concurrently_over_http():
+    pairs = make_pairs(12)
+    transport = AsyncMockTransport(pairs)
+    in_flight = [0, 0]
+
+    async def handle(request):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        try:
+            # Pages are slow enough that requests overlap
+            await asyncio.sleep(0.01)
+            return web.json_response(await transport.post(None, await request.json()))
+        finally:
+            in_flight[0] -= 1
+
+    async def run():
+        app = web.Application()
+        app.router.add_post('/', handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        try:
+            helper = UniswapV2AsyncHelper(graph_endpoint = f'http://127.0.0.1:{port}/', concurrency = 4, backoff = 0)
+            pools = await helper.get_pools(skip_queries(helper, 4, 3))
+            return helper, pools
+        finally:
+            await runner.cleanup()
+
+    helper, pools = asyncio.run(run())
+
+    assert sorted(pool['pool_address'] for pool in pools) == [p['id'] for p in pairs]
+    assert in_flight[1] > 1
+
+    # get_pools closed the session it created
+    assert helper.async_http_client.session is None
+
+
+@pytest.mark.parametrize('nr_pairs, nr_calls', [(7, 3), (6, 3), (2, 1), (0, 1)])
+def test_iter_pools_stops_on_short_page(nr_pairs, nr_calls):
+    pairs = make_pairs(nr_pairs)
+    transport = MockTransport(pairs)
+    helper = UniswapV2AsyncHelper(http_client = transport, backoff = 0)
+
+    pools = list(helper.iter_pools(page_size = 3))
+
+    assert [pool.pool_address for pool in pools] == [p['id'] for p in pairs]
+    assert len(transport.calls) == nr_calls
+
+    # Cursor pages continue after the last id of the previous page
+    assert transport.calls == [''] + [pairs[i]['id'] for i in range(2, 3 * (nr_calls - 1), 3)]
+    assert helper.cursor == (pairs[-1]['id'] if pairs else '')
+    assert helper.last_block == (99 + nr_pairs if pairs else None)
+
+
+def test_iter_pools_retries_and_resyncs_new_pools():
+    pairs = make_pairs(5)
+    transport = MockTransport(pairs, failures = {'': 1})
+    helper = UniswapV2AsyncHelper(http_client = transport, retries = 1, backoff = 0)
+
+    assert len(list(helper.iter_pools(page_size = 3))) == 5
+    assert transport.calls[:2] == ['', '']
+
+    # Pairs created later sort anywhere by id, resync selects them by block
+    new = make_pairs(8)[5:]
+    new[0]['id'] = '0x' + '0' * 39 + '0'
+    transport.pairs = sorted(pairs + new, key = lambda p: p['id'])
+
+    resynced = list(helper.resync(page_size = 3))
+
+    assert sorted(pool.pool_address for pool in resynced) == sorted(p['id'] for p in new)
+    assert helper.last_block == 107
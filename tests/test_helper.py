@@ -0,0 +1,103 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_helper import UniswapV2Helper
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_rpc import UniswapV2ReserveRefresher
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+import eth_abi
+import json
+import os
+import pytest
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+@pytest.fixture
+def aggregate3():
+    with open(os.path.join(FIXTURES, 'aggregate3_get_reserves.json')) as f:
+        return json.load(f)
+
+
+def test_reserves_multicall_call_round_trip(aggregate3):
+    helper = UniswapV2Helper()
+    pool_addresses = [a.lower() for a in aggregate3['pool_addresses']]
+
+    query = helper.get_reserves_multicall_call(pool_addresses = pool_addresses, request_id = 7)
+    params = query['params']
+
+    assert query['attribute'] == 'multicall_balances'
+    assert params['id'] == 7 and params['method'] == 'eth_call'
+    assert params['params'][0]['to'] == aggregate3['multicall_address']
+
+    data = params['params'][0]['data']
+    assert data[:10] == '0x82ad56cb'
+
+    calls, = eth_abi.decode_abi(['(address,bool,bytes)[]'], bytes.fromhex(data[10:]))
+    assert [target for target, _, _ in calls] == pool_addresses
+    assert all(allow_failure for _, allow_failure, _ in calls)
+    assert all(call_data == bytes.fromhex('0902f1ac') for _, _, call_data in calls)
+
+
+def test_process_reserves_multicall_fixture(aggregate3):
+    helper = UniswapV2Helper()
+
+    reserves0, reserves1, success = helper.process_reserves_multicall(aggregate3['response']['result'])
+
+    assert reserves0 == aggregate3['expected']['reserves0']
+    assert reserves1 == aggregate3['expected']['reserves1']
+    assert success == aggregate3['expected']['success']
+
+
+def test_process_reserves_multicall_failed_and_short_calls():
+    helper = UniswapV2Helper()
+    word = lambda x: x.to_bytes(32, 'big')
+
+    results = [
+        (True, word(5) + word(7) + word(1)),
+        (False, word(5) + word(7) + word(1)),   # allowFailure: reverted call with data
+        (True, word(5) + word(7)),              # 64 bytes
+        (True, b''),
+        (True, word(9) + word(11) + word(1) + word(0))
+    ]
+    data = '0x' + eth_abi.encode_abi(['(bool,bytes)[]'], [results]).hex()
+
+    reserves0, reserves1, success = helper.process_reserves_multicall(data)
+
+    assert success == [True, False, False, False, True]
+    assert reserves0 == [5, 0, 0, 0, 9]
+    assert reserves1 == [7, 0, 0, 0, 11]
+
+    assert helper.process_reserves_multicall('0x' + eth_abi.encode_abi(['(bool,bytes)[]'], [[]]).hex()) == ([], [], [])
+
+
+class _FixtureClient:
+
+    def __init__(
+        self,
+        response
+    ):
+        self.response = response
+        self.requests = list()
+
+    def post(
+        self,
+        url,
+        payload
+    ):
+        self.requests.append(payload)
+        return self.response
+
+
+def test_multicall_refresh_from_fixture(aggregate3):
+    pools = [
+        UniswapV2Pool({'pool_address': a, 'tokens': ['0x0', '0x1'], 'source': 'UniswapV2'})
+        for a in aggregate3['pool_addresses']
+    ]
+    client = _FixtureClient(aggregate3['response'])
+
+    stats = UniswapV2ReserveRefresher(client = client, url = 'http://node', batch_size = 5, multicall = True).refresh(pools)
+
+    assert stats == {'updated': 2, 'failed': 3, 'batches': 1}
+    assert len(client.requests) == 1
+    assert [(p.reserve0, p.reserve1) for p in pools[:2]] == [
+        (43012345678901, 17345123456789012345678),
+        (40812345678, 1612345678901234567890)
+    ]
+    assert all(p.reserve0 is None for p in pools[2:])
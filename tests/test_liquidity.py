@@ -0,0 +1,101 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_liquidity import UniswapV2LiquidityIndex
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_quoter import UniswapV2Quoter
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_router import UniswapV2Router
+import pytest
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+TOKEN_C = '0x' + 'c' * 40
+TOKEN_D = '0x' + 'd' * 40
+TOKEN_E = '0x' + 'e' * 40
+
+
+def _pool(
+    pool_address,
+    tokens,
+    reserve0,
+    reserve1
+):
+    return {'pool_address': pool_address, 'tokens': list(tokens), 'source': 'UniswapV2', 'reserve0': reserve0, 'reserve1': reserve1}
+
+
+@pytest.fixture
+def registry():
+    registry = PoolRegistry()
+    registry.add_pools([
+        # B is worth 0.5 A, the dust pool quotes better
+        _pool('0x01', (TOKEN_A, TOKEN_B), 10**21, 2 * 10**21),
+        _pool('0x02', (TOKEN_A, TOKEN_B), 10**15, 3 * 10**15),
+        # C is worth 2 A through B
+        _pool('0x03', (TOKEN_B, TOKEN_C), 4 * 10**21, 10**21),
+        # Not connected to A
+        _pool('0x04', (TOKEN_D, TOKEN_E), 10**21, 10**21)
+    ])
+
+    return registry
+
+
+def _views(
+    registry
+):
+    return [registry[row] for row in range(len(registry))]
+
+
+def test_prices_and_depths(registry):
+    index = UniswapV2LiquidityIndex(TOKEN_A.upper().replace('0X', '0x'), pools = _views(registry))
+
+    assert index.prices == {TOKEN_A: 1.0, TOKEN_B: 0.5, TOKEN_C: 2.0}
+    assert index.depths == {'0x01': 2e21, '0x02': 2e15, '0x03': 4e21, '0x04': 0.0}
+    assert [pool.pool_address for pool, _ in index.get_ranked(2)] == ['0x03', '0x01']
+
+    # Without a min depth every pool is kept
+    assert len(index.get_liquid_pools()) == len(index) == 4
+
+
+def test_tokens_are_priced_through_the_fewest_hops(registry):
+    # A direct, shallow A/C pool prices C before the path through B
+    registry.add_pool(_pool('0x05', (TOKEN_A, TOKEN_C), 10**18, 10**18))
+    index = UniswapV2LiquidityIndex(TOKEN_A, pools = _views(registry))
+
+    assert index.prices[TOKEN_C] == 1.0
+    assert index.depths['0x03'] == 2e21
+
+
+def test_min_depth_prunes_dust_pools(registry):
+    index = UniswapV2LiquidityIndex(TOKEN_A, min_depth = 10**18, pools = _views(registry))
+
+    assert [pool.pool_address for pool in index.get_liquid_pools()] == ['0x01', '0x03']
+    assert list(registry.liquidity) == [1, 0, 1, 0]
+
+    # The router and the quoter skip pruned pools
+    assert UniswapV2Router(registry).find_best_route(TOKEN_A, TOKEN_B, 10**12)['pools'] == ['0x01']
+    amounts_out = UniswapV2Quoter().quote_pools(_views(registry)[:2], TOKEN_A, 10**12)
+    assert amounts_out[0] > 0 and amounts_out[1] == 0
+
+    assert index.set_min_depth(0) == 2
+    assert UniswapV2Router(registry).find_best_route(TOKEN_A, TOKEN_B, 10**12)['pools'] == ['0x02']
+
+
+def test_update_refreshes_changed_pools(registry):
+    index = UniswapV2LiquidityIndex(TOKEN_A, min_depth = 10**18, pools = _views(registry)[:3])
+
+    # The deep pool is drained, the dust pool refilled
+    registry[0].reserve0, registry[0].reserve1 = 10**14, 2 * 10**14
+    registry[1].reserve0, registry[1].reserve1 = 10**21, 2 * 10**21
+
+    assert index.update([registry[0], registry[1], registry[3]]) == 2
+    assert index.depths['0x01'] == 2e14 and index.depths['0x02'] == 2e21
+    assert list(registry.liquidity) == [0, 1, 1, 1]
+
+    # Prices follow only on update_prices
+    registry[1].reserve1 = 4 * 10**21
+    assert index.update() == 0
+    assert index.prices[TOKEN_B] == 0.5
+
+    assert index.rebuild() == 0
+    assert index.prices[TOKEN_B] == 0.25
+
+    # Pools without reserves have no depth
+    registry[1].reserve0 = None
+    assert index.get_depth(registry[1]) == 0.0
@@ -0,0 +1,95 @@
+from utils.Uniswap.Uniswap_v2 import Uniswap_v2_metrics
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_metrics import UniswapV2Histogram, UniswapV2Metrics, UniswapV2JsonLinesSink, NR_BUCKETS, print_sink, timed, _wrap
+import json
+import pytest
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = UniswapV2Histogram()
+    assert histogram.get_percentile(0.5) == 0
+
+    # < 1 us, [1, 2) us, [2, 4) us and above ~16 s
+    for seconds in (0.5e-6, 1.5e-6, 3e-6, 3e-6, 100.0):
+        histogram.observe(seconds)
+
+    assert histogram.buckets[:3] == [1, 1, 2]
+    assert histogram.buckets[-1] == 1
+    assert sum(histogram.buckets) == histogram.count == 5
+
+    assert histogram.get_percentile(0.2) == 1
+    assert histogram.get_percentile(0.5) == 4
+    assert histogram.get_percentile(1.0) == 2 ** (NR_BUCKETS - 1)
+
+    summary = histogram.to_dict()
+    assert summary['max_us'] == 100.0 * 1e6
+    assert summary['mean_us'] == pytest.approx(100.0000080 / 5 * 1e6)
+
+
+def test_wrapped_functions_record_calls_and_errors():
+    registry = UniswapV2Metrics()
+
+    def divide(a, b):
+        return a / b
+
+    wrapped = _wrap('divide', divide, registry)
+    assert wrapped.__name__ == 'divide'
+
+    assert wrapped(1, 2) == 0.5
+    with pytest.raises(ZeroDivisionError):
+        wrapped(1, 0)
+
+    histogram = registry.histograms['divide']
+    assert (histogram.count, histogram.errors) == (2, 1)
+    assert sum(histogram.buckets) == 2 and histogram.total > 0
+
+
+def test_timed_is_free_when_disabled(monkeypatch):
+    def function():
+        return 1
+
+    monkeypatch.setattr(Uniswap_v2_metrics, 'ENABLED', False)
+    assert timed('test.function')(function) is function
+
+    monkeypatch.setattr(Uniswap_v2_metrics, 'ENABLED', True)
+    wrapped = timed('test.function')(function)
+    try:
+        assert wrapped is not function and wrapped() == 1
+        assert Uniswap_v2_metrics.metrics.histograms['test.function'].count == 1
+    finally:
+        del Uniswap_v2_metrics.metrics.histograms['test.function']
+
+
+def test_export_sends_snapshots_to_sinks(tmp_path, capsys):
+    registry = UniswapV2Metrics()
+    wrapped = _wrap('quote', lambda: None, registry)
+    snapshots = list()
+    path = str(tmp_path / 'metrics.jsonl')
+    sink = UniswapV2JsonLinesSink(path)
+
+    registry.add_sink(snapshots.append)
+    registry.add_sink(sink)
+    registry.add_sink(print_sink)
+
+    wrapped()
+    registry.increment('encoder.pool_cache_hits', 3)
+    snapshot = registry.export(reset = True)
+
+    assert snapshots == [snapshot]
+    assert snapshot['counters'] == {'encoder.pool_cache_hits': 3}
+    assert snapshot['histograms']['quote']['count'] == 1
+
+    out = capsys.readouterr().out
+    assert '### INFO: Metrics -> quote: count 1, errors 0' in out
+    assert "### INFO: Metrics -> counters: {'encoder.pool_cache_hits': 3}" in out
+
+    # Reset keeps the histograms wrapped functions hold
+    wrapped()
+    registry.remove_sink(print_sink)
+    snapshot = registry.export()
+    assert snapshot['counters'] == {}
+    assert snapshot['histograms']['quote']['count'] == 1
+    assert capsys.readouterr().out == ''
+
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == snapshots
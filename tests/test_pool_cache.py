@@ -0,0 +1,147 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_cache import UniswapV2PoolCache, MAX_SOURCES, HEADER_SIZE, RECORD_SIZE
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+import os
+import pytest
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+
+
+def _pool(
+    n,
+    source = 'UniswapV2',
+    reserves = (10**21, 2 * 10**21)
+):
+    p = {
+        'pool_address': '0x%040x' % n,
+        'tokens': [TOKEN_A, TOKEN_B],
+        'source': source
+    }
+    if reserves is not None:
+        p['reserve0'], p['reserve1'] = reserves
+
+    return p
+
+
+def test_load_registry_keeps_unknown_reserves(tmp_path):
+    path = str(tmp_path / 'pools.cache')
+    cache = UniswapV2PoolCache.create(path, [_pool(1), _pool(2, reserves = None)], block = 100)
+
+    registry = PoolRegistry()
+    rows = cache.load_registry(registry)
+
+    assert (registry[rows[0]].reserve0, registry[rows[0]].reserve1) == (10**21, 2 * 10**21)
+    assert registry[rows[0]].has_complete_data()
+
+    # Same as get_pool_dict and iter_pools
+    assert (registry[rows[1]].reserve0, registry[rows[1]].reserve1) == (None, None)
+    assert not registry[rows[1]].has_complete_data()
+    assert cache.get_pool_dict(1)['reserve0'] is None
+    assert [pool.has_complete_data() for pool in cache.iter_pools()] == [True, False]
+
+    cache.close()
+
+
+def test_add_pools_rejects_source_before_growing(tmp_path):
+    path = str(tmp_path / 'pools.cache')
+    cache = UniswapV2PoolCache.create(path, [_pool(1)], capacity = 1)
+
+    # Fill the source table
+    sources = ['Fork%d' % i for i in range(MAX_SOURCES - 1)]
+    for source in sources:
+        cache._get_source_index(source)
+    assert len(cache.get_sources()) == MAX_SOURCES
+
+    size = os.path.getsize(path)
+    with pytest.raises(Exception, match = 'at most'):
+        cache.add_pools([_pool(2, source = 'SushiSwap')])
+
+    assert os.path.getsize(path) == size == HEADER_SIZE + RECORD_SIZE
+    assert len(cache) == 1
+
+    # A known source still grows the file and appends the pool
+    assert cache.add_pools([_pool(2)]) == [1]
+    assert len(cache) == 2
+    assert os.path.getsize(path) == HEADER_SIZE + 2 * RECORD_SIZE
+
+    cache.close()
+
+
+def test_reader_remaps_after_writer_grows(tmp_path):
+    path = str(tmp_path / 'pools.cache')
+    writer = UniswapV2PoolCache.create(path, [_pool(1)], capacity = 1)
+    reader = UniswapV2PoolCache(path)
+    assert len(reader) == 1
+
+    writer.add_pools([_pool(n) for n in range(2, 10)])
+
+    assert len(reader) == 9
+    assert [pool.pool_address for pool in reader.iter_pools()] == ['0x%040x' % n for n in range(1, 10)]
+    assert reader.get_row('0x%040x' % 9) == 8
+    assert reader.get_reserves(8)[:2] == (10**21, 2 * 10**21)
+
+    with pytest.raises(IndexError):
+        reader.get_reserves(100)
+
+    reader.close()
+    writer.close()
+
+
+def test_zero_reserves_differ_from_unknown(tmp_path):
+    path = str(tmp_path / 'pools.cache')
+    cache = UniswapV2PoolCache.create(path, [_pool(1, reserves = (0, 0)), _pool(2, reserves = None)])
+
+    assert cache.get_reserves(0) == (0, 0, 0)
+    assert cache.get_reserves(1) == (None, None, 0)
+
+    registry = PoolRegistry()
+    cache.load_registry(registry)
+    assert (registry.reserve0, registry.reserve1) == ([0, None], [0, None])
+
+    cache.close()
+
+
+def test_load_registry_matches_add_pools(tmp_path):
+    path = str(tmp_path / 'pools.cache')
+    pools = [_pool(1), _pool(2, source = 'SushiSwap', reserves = None), _pool(3)]
+    pools[2]['tokens'] = [TOKEN_B, '0x' + 'c' * 40]
+    cache = UniswapV2PoolCache.create(path, pools)
+
+    loaded = PoolRegistry()
+    assert cache.load_registry(loaded) == [0, 1, 2]
+    expected = PoolRegistry()
+    expected.add_pools(pools)
+
+    for column in ('pool_addresses', 'tokens', 'token0', 'token1', 'sources', 'source', 'reserve0', 'reserve1', 'pair_rows', 'more_pair_rows', 'adjacency'):
+        assert getattr(loaded, column) == getattr(expected, column), column
+
+    # Pools already loaded keep their rows
+    assert cache.load_registry(loaded) == [0, 1, 2]
+    assert len(loaded) == 3
+
+    cache.close()
+
+
+def test_read_retries_overlapping_writes(tmp_path):
+    path = str(tmp_path / 'pools.cache')
+    cache = UniswapV2PoolCache.create(path, [_pool(1)], block = 1)
+    reader = UniswapV2PoolCache(path, spins = 2, backoff = 0, max_retries = 5)
+    calls = list()
+
+    def function():
+        calls.append(reader.get_sequence())
+        # A refresh lands during the first read
+        if len(calls) == 1:
+            cache.update_reserves(0, 5, 7, 2)
+        return reader.get_reserves(0)
+
+    assert reader.read(function) == (5, 7, 2)
+    assert len(calls) == 2
+
+    # A writer that died mid-write leaves the sequence odd
+    cache._begin_write()
+    with pytest.raises(Exception, match = 'writer stalled'):
+        reader.read(reader.get_reserves, 0)
+
+    reader.close()
+    cache.close()
@@ -0,0 +1,84 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from fractions import Fraction
+import math
+import random
+import pytest
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+
+
+def _pool(
+    source = 'UniswapV2'
+):
+    return UniswapV2Pool({
+        'pool_address': '0x01',
+        'tokens': [TOKEN_A, TOKEN_B],
+        'source': source,
+        'reserve0': 10**21,
+        'reserve1': 2 * 10**21
+    })
+
+
+# (source, amount, reserve_in, reserve_out, fee, amount_out, amount_in of amount out)
+# worked by hand from UniswapV2Library getAmountOut/getAmountIn and the fork fee
+FORMULA_CASES = [
+    ('UniswapV2', 10**4, 10**6, 10**6, 30, 9871, 10132),
+    ('SushiSwap', 10**4, 10**6, 10**6, 30, 9871, 10132),
+    ('PancakeSwapV2', 10**4, 10**6, 10**6, 25, 9876, 10127),
+    ('UniswapV2', 10**18, 2**112 - 1, 2**111, 3 * 10**15, 498499999999999904, 2006018054162488236),
+    ('PancakeSwapV2', 10**18, 2**112 - 1, 2**111, 25 * 10**14, 498749999999999904, 2005012531328321575),
+]
+
+
+@pytest.mark.parametrize('source, amount, reserve_in, reserve_out, fee, amount_out, amount_in', FORMULA_CASES)
+def test_quotes_match_the_solidity_formula(source, amount, reserve_in, reserve_out, fee, amount_out, amount_in):
+    pool = _pool(source)
+
+    assert pool.get_amount_out(amount, reserve_in, reserve_out) == (fee, amount_out)
+    assert pool.get_amount_in(amount, reserve_in, reserve_out)[1] == amount_in
+
+
+def test_amount_out_rounds_down():
+    pool = _pool()
+
+    # 3 * 997 * 5991 / (3 * 1000 + 3 * 997) = 2991 exactly
+    assert pool.get_amount_out(3, 3, 5991)[1] == 2991
+    assert pool.get_amount_out(3, 3, 5990)[1] == 2990
+
+    # Dust rounds to 0
+    assert pool.get_amount_out(1, 10**21, 10**21)[1] == 0
+    assert pool.get_amount_out(0, 10**21, 10**21) == (0, 0)
+
+
+def test_amount_in_always_adds_one():
+    pool = _pool()
+
+    # 997 * 1000 * 1000 / ((2000 - 1000) * 997) = 1000 exactly, still + 1
+    assert pool.get_amount_in(1000, 997, 2000) == (3, 1001)
+
+    # The whole reserve out cannot be bought
+    assert pool.get_amount_in(2000, 997, 2000) == (None, None)
+    assert pool.get_amount_in(1, 0, 2000) == (0, 0)
+
+
+@pytest.mark.parametrize('source', ['UniswapV2', 'SushiSwap', 'PancakeSwapV2'])
+def test_quotes_match_exact_rationals(source):
+    pool = _pool(source)
+    fee = Fraction(pool.fork.fee_numerator, pool.fork.fee_denominator)
+    rng = random.Random(source)
+
+    for _ in range(200):
+        reserve_in = rng.randrange(1, 2**112)
+        reserve_out = rng.randrange(2, 2**112)
+        amount_in = rng.randrange(1, 2**112)
+        amount_out = rng.randrange(1, reserve_out)
+
+        expected_out = math.floor(fee * amount_in * reserve_out / (reserve_in + fee * amount_in))
+        expected_in = math.floor(Fraction(reserve_in * amount_out) / ((reserve_out - amount_out) * fee)) + 1
+
+        assert pool.get_amount_out(amount_in, reserve_in, reserve_out)[1] == expected_out
+        assert pool.get_amount_in(amount_out, reserve_in, reserve_out)[1] == expected_in
+
+        # amount_in buys amount_out
+        assert pool.get_amount_out(expected_in, reserve_in, reserve_out)[1] >= amount_out
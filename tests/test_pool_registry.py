@@ -0,0 +1,104 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_router import UniswapV2Router
+import tracemalloc
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+TOKEN_C = '0x' + 'c' * 40
+
+
+def _pool(
+    pool_address,
+    tokens,
+    source = 'UniswapV2'
+):
+    return {
+        'pool_address': pool_address,
+        'tokens': tokens,
+        'source': source,
+        'reserve0': 10**21,
+        'reserve1': 2 * 10**21
+    }
+
+
+def test_pair_index_over_rows():
+    registry = PoolRegistry()
+    row_ab = registry.add_pool(_pool('0x01', [TOKEN_A, TOKEN_B]))
+    row_ab_sushi = registry.add_pool(_pool('0x02', [TOKEN_B, TOKEN_A], source = 'SushiSwap'))
+    row_bc = registry.add_pool(_pool('0x03', [TOKEN_B, TOKEN_C]))
+
+    # Duplicates are not indexed twice
+    assert registry.add_pool(_pool('0x01', [TOKEN_A, TOKEN_B])) == row_ab
+
+    a = registry.get_token_id(TOKEN_A.upper().replace('0X', '0x'))
+    b = registry.get_token_id(TOKEN_B)
+    c = registry.get_token_id(TOKEN_C)
+
+    assert registry.get_pair_rows(a, b) == [row_ab, row_ab_sushi]
+    assert registry.get_pair_rows(b, a) == [row_ab, row_ab_sushi]
+    assert registry.get_pair_rows(a, c) == []
+    assert sorted(registry.get_neighbour_ids(b)) == sorted([a, c])
+    assert registry.get_common_neighbour_ids(a, c) == [b]
+    assert registry.has_pair(c, b) and not registry.has_pair(a, c)
+
+    assert [p.pool_address for p in registry.get_pair_pools(TOKEN_B, TOKEN_A)] == ['0x01', '0x02']
+    assert registry.get_neighbours(TOKEN_A) == {TOKEN_B}
+    assert registry.get_pair_pools(TOKEN_A, '0x' + 'd' * 40) == []
+
+    route = UniswapV2Router(registry).find_best_route(TOKEN_A, TOKEN_C, 10**18)
+    assert route['path'] == [TOKEN_A, TOKEN_B, TOKEN_C]
+    assert route['pools'][1] == '0x03' and row_bc == 2
+
+
+def test_registry_memory_below_pool_objects(random_pool_dicts):
+    pools = random_pool_dicts(20000)
+
+    tracemalloc.start()
+    objects = [UniswapV2Pool(p) for p in pools]
+    objects_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+
+    tracemalloc.start()
+    registry = PoolRegistry()
+    registry.add_pools(pools)
+    registry_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert registry_bytes < objects_bytes / 2
+
+
+def test_pool_addresses_are_case_insensitive():
+    checksummed = '0xB4e16d0168e52d35CaCD2c6185b44281Ec28C9Dc'
+    registry = PoolRegistry()
+    row = registry.add_pool(_pool(checksummed, [TOKEN_A, TOKEN_B]))
+
+    assert registry.add_pool(_pool(checksummed.lower(), [TOKEN_A, TOKEN_B])) == row
+    assert registry.add_columns([checksummed.upper().replace('0X', '0x')], [TOKEN_A], [TOKEN_B], ['UniswapV2'], [1], [2]) == [row]
+    assert len(registry) == 1
+
+    assert registry.get_row(checksummed.lower()) == row
+    assert registry.get_pool(checksummed).pool_address == checksummed.lower()
+    assert registry.get_pool(checksummed).reserve0 == 10**21
+
+    # Repeated addresses in one bulk load share a row
+    rows = registry.add_columns(['0x0C', '0x0c'], [TOKEN_A, TOKEN_A], [TOKEN_C, TOKEN_C], ['UniswapV2'] * 2, [1, 3], [2, 4])
+    assert rows == [1, 1]
+    assert registry.pool_addresses == [checksummed.lower(), '0x0c']
+    assert registry.get_pool('0x0c').reserve0 == 1
+
+
+def test_get_path_uses_the_registry_pair_index():
+    registry = PoolRegistry()
+    row = registry.add_pool(_pool('0x01', [TOKEN_A, TOKEN_B]))
+    pool = UniswapV2Pool(_pool('0x02', [TOKEN_B, TOKEN_C]))
+
+    assert registry[row].get_path(TOKEN_B, TOKEN_A.upper().replace('0X', '0x')) == [TOKEN_B, TOKEN_A.upper().replace('0X', '0x')]
+    assert registry[row].get_path(TOKEN_A, TOKEN_C) is None
+
+    # Pool objects check a registry if given
+    assert pool.get_path(TOKEN_B, TOKEN_C) == [TOKEN_B, TOKEN_C]
+    assert pool.get_path(TOKEN_B, TOKEN_C, registry) is None
+    registry.add_pool(pool.to_dict())
+    assert pool.get_path(TOKEN_B, TOKEN_C, registry) == [TOKEN_B, TOKEN_C]
@@ -0,0 +1,40 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_quoter import UniswapV2Quoter
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+import pytest
+
+USDC = '0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48'
+WETH = '0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2'
+
+
+@pytest.fixture
+def pool():
+    # Subgraph rows are lower case
+    return UniswapV2Pool({
+        'pool_address': '0xb4e16d0168e52d35cacd2c6185b44281ec28c9dc',
+        'source': 'UniswapV2',
+        'tokens': [WETH.lower(), USDC.lower()],
+        'reserve0': 43012345678901,
+        'reserve1': 16234567890123456789012
+    })
+
+
+@pytest.mark.parametrize('sell_token', [USDC, USDC.lower(), USDC.upper().replace('0X', '0x')])
+def test_get_reserves_ignores_address_case(pool, sell_token):
+    quoter = UniswapV2Quoter()
+
+    assert quoter.get_reserves([pool], sell_token) == ([43012345678901], [16234567890123456789012])
+    assert quoter.get_reserves([pool], WETH) == ([16234567890123456789012], [43012345678901])
+
+
+def test_quote_pools_checksummed_sell_token(pool):
+    quoter = UniswapV2Quoter()
+    amount_in = 1000 * 10 ** 6
+
+    amounts_out = quoter.quote_pools([pool], USDC, amount_in)
+
+    assert amounts_out == quoter.quote_pools([pool], USDC.lower(), amount_in)
+
+    # USDC sorts first, so it is token0 and is sold into reserve0
+    amount_in_with_fee = amount_in * pool.fork.fee_numerator
+    amount_out = amount_in_with_fee * pool.reserve1 // (pool.reserve0 * pool.fork.fee_denominator + amount_in_with_fee)
+    assert amounts_out == [amount_out]
@@ -0,0 +1,101 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_quoter import UniswapV2Quoter
+import pytest
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+TRADE_SIZE = 10**18
+
+
+def _pool(
+    pool_address = '0x01'
+):
+    return {
+        'pool_address': pool_address,
+        'tokens': [TOKEN_A, TOKEN_B],
+        'source': 'UniswapV2',
+        'reserve0': 10**21,
+        'reserve1': 2 * 10**21
+    }
+
+
+def _exact(
+    pool,
+    reserve_in,
+    reserve_out
+):
+    _, amount_out = pool.get_amount_out(amount_in = TRADE_SIZE, reserve_in = reserve_in, reserve_out = reserve_out)
+    return amount_out
+
+
+@pytest.fixture
+def counters():
+    hits, misses = UniswapV2Pool.reference_bid_hits, UniswapV2Pool.reference_bid_misses
+    return lambda: (UniswapV2Pool.reference_bid_hits - hits, UniswapV2Pool.reference_bid_misses - misses)
+
+
+@pytest.fixture(params = ['model', 'view'])
+def pool(request):
+    if request.param == 'model':
+        return UniswapV2Pool(_pool())
+
+    registry = PoolRegistry()
+    row = registry.add_pool(_pool())
+    return registry[row]
+
+
+def test_reserve_setters_invalidate_bids(pool, counters):
+    first = pool.get_reference_bid(TOKEN_A, TOKEN_B, TRADE_SIZE)
+    assert pool.get_reference_bid(TOKEN_A, TOKEN_B, TRADE_SIZE) == first
+    assert counters() == (1, 1)
+
+    pool.reserve0 = 4 * 10**21
+    assert pool.reference_bids_dirty
+    assert pool.get_reference_bid(TOKEN_A, TOKEN_B, TRADE_SIZE) == _exact(pool, 4 * 10**21, 2 * 10**21) < first
+
+    pool.reserve1 = 10**21
+    assert pool.get_reference_bid(TOKEN_B, TOKEN_A, TRADE_SIZE) == _exact(pool, 10**21, 4 * 10**21)
+    assert counters() == (1, 3)
+
+
+def test_set_reserves_invalidates_bids(pool, counters):
+    pool.get_reference_bid(TOKEN_A, TOKEN_B, TRADE_SIZE)
+
+    # Same reserves keep the cached bid
+    pool.set_reserves(10**21, 2 * 10**21)
+    assert not pool.reference_bids_dirty
+    pool.get_reference_bid(TOKEN_A, TOKEN_B, TRADE_SIZE)
+
+    pool.set_reserves(10**21, 3 * 10**21)
+    assert pool.get_reference_bid(TOKEN_A, TOKEN_B, TRADE_SIZE) == _exact(pool, 10**21, 3 * 10**21)
+    assert counters() == (1, 2)
+
+
+def test_unchanged_reserve_write_keeps_bids(pool):
+    pool.get_reference_bid(TOKEN_A, TOKEN_B, TRADE_SIZE)
+    pool.reserve0 = 10**21
+    pool.reserve1 = 2 * 10**21
+
+    assert not pool.reference_bids_dirty
+
+
+def test_batch_refresh_after_reserve_writes(counters):
+    pools = [UniswapV2Pool(_pool('0x%02x' % n)) for n in range(1, 4)]
+    quoter = UniswapV2Quoter()
+    assert quoter.refresh_reference_bids(pools, TRADE_SIZE) == 3
+
+    pools[1].reserve1 = 5 * 10**21
+    assert quoter.refresh_reference_bids(pools, TRADE_SIZE) == 1
+    assert pools[1].reference_bids[TOKEN_A][TOKEN_B] == _exact(pools[1], 10**21, 5 * 10**21)
+
+    registry = PoolRegistry()
+    registry.add_pools([_pool('0x%02x' % n) for n in range(1, 4)])
+    assert registry.refresh_reference_bids(TRADE_SIZE) == 3
+
+    registry[2].reserve0 = 5 * 10**21
+    assert registry.refresh_reference_bids(TRADE_SIZE) == 1
+    assert registry.reference_bids0[2] == _exact(pools[0], 5 * 10**21, 2 * 10**21)
+
+    # Quoter and registry share the pool counters
+    assert counters() == (2 + 2, 3 + 1 + 3 + 1)
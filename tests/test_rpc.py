@@ -0,0 +1,159 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_rpc import UniswapV2HttpClient, UniswapV2ReserveRefresher
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import json
+import pytest
+
+
+def _reserves_result(
+    reserve0,
+    reserve1
+):
+    return '0x' + format(reserve0, '064x') + format(reserve1, '064x') + format(1, '064x')
+
+
+class _NodeHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(
+        self
+    ):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(
+        self
+    ):
+        batch = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.batches.append(batch)
+
+        body = json.dumps(self.server.answer(batch)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(
+        self,
+        *args
+    ):
+        pass
+
+
+def _reserves_of(
+    call
+):
+    # Reserves derived from the pool address, so responses are checkable
+    n = int(call['params'][0]['to'], 16)
+    return n * 10, n * 10 + 1
+
+
+def _answer_all(
+    batch
+):
+    return [
+        {'jsonrpc': '2.0', 'id': call['id'], 'result': _reserves_result(*_reserves_of(call))}
+        for call in reversed(batch)
+    ]
+
+
+@pytest.fixture
+def node():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _NodeHandler)
+    server.connections = 0
+    server.batches = list()
+    server.answer = _answer_all
+
+    thread = threading.Thread(target = server.serve_forever, kwargs = {'poll_interval': 0.01}, daemon = True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _pools(
+    n
+):
+    return [
+        UniswapV2Pool({'pool_address': '0x%040x' % (i + 1), 'tokens': ['0x0', '0x1'], 'source': 'UniswapV2'})
+        for i in range(n)
+    ]
+
+
+def _refresher(
+    node,
+    **kwargs
+):
+    url = f'http://127.0.0.1:{node.server_address[1]}/'
+    return UniswapV2ReserveRefresher(client = UniswapV2HttpClient(max_connections = 1), url = url, **kwargs)
+
+
+def test_batches_split_and_connection_reused(node):
+    pools = _pools(250)
+    refresher = _refresher(node, batch_size = 100, concurrency = 1)
+
+    stats = refresher.refresh(pools)
+    assert stats == {'updated': 250, 'failed': 0, 'batches': 3}
+    assert [len(batch) for batch in node.batches] == [100, 100, 50]
+    assert [call['id'] for batch in node.batches for call in batch] == list(range(1, 251))
+
+    # Responses come back reversed and are routed by id
+    for i, pool in enumerate(pools):
+        assert (pool.reserve0, pool.reserve1) == ((i + 1) * 10, (i + 1) * 10 + 1)
+
+    # Keep-alive: every request of both refreshes went over one connection
+    refresher.refresh(pools)
+    assert len(node.batches) == 6
+    assert node.connections == 1
+
+
+def test_partial_failure(node):
+
+    def answer(batch):
+        responses = list()
+        for call in batch:
+            offset = call['id'] % 6
+            if offset == 0:
+                responses.append({'jsonrpc': '2.0', 'id': call['id'], 'error': {'code': -32000, 'message': 'execution reverted'}})
+            elif offset == 1:
+                responses.append({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'Invalid request'}})
+            elif offset == 2:
+                continue
+            elif offset == 3:
+                responses.append({'jsonrpc': '2.0', 'id': call['id'] + 10**6, 'result': _reserves_result(1, 1)})
+            else:
+                responses.append({'jsonrpc': '2.0', 'id': call['id'], 'result': _reserves_result(*_reserves_of(call))})
+        return responses
+
+    node.answer = answer
+    pools = _pools(60)
+
+    stats = _refresher(node, batch_size = 25, concurrency = 2).refresh(pools)
+
+    assert stats == {'updated': 20, 'failed': 40, 'batches': 3}
+    for i, pool in enumerate(pools):
+        if (i + 1) % 6 in (4, 5):
+            assert (pool.reserve0, pool.reserve1) == ((i + 1) * 10, (i + 1) * 10 + 1)
+        else:
+            assert pool.reserve0 is None
+
+
+@pytest.mark.parametrize('answer', [
+    {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': 'Parse error'}},
+    [],
+    None,
+    'bad gateway'
+])
+def test_whole_batch_error(node, answer):
+    node.answer = lambda batch: answer
+    pools = _pools(10)
+
+    stats = _refresher(node, batch_size = 4).refresh(pools)
+
+    assert stats == {'updated': 0, 'failed': 10, 'batches': 3}
+    assert all(pool.reserve0 is None for pool in pools)
@@ -0,0 +1,59 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_snapshots import UniswapV2SnapshotStore
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_router import UniswapV2Router
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+
+
+def _pool(
+    pool_address,
+    reserve0,
+    reserve1
+):
+    return {
+        'pool_address': pool_address,
+        'tokens': [TOKEN_A, TOKEN_B],
+        'source': 'UniswapV2',
+        'reserve0': reserve0,
+        'reserve1': reserve1
+    }
+
+
+def test_snapshot_isolated_from_later_updates():
+    registry = PoolRegistry()
+    registry.add_pool(_pool('0x01', 10**21, 10**21))
+    store = UniswapV2SnapshotStore(registry, chunk_size = 4)
+
+    snapshot = store.publish(1)
+    registry.set_reserves(0, 2 * 10**21, 10**21)
+
+    assert snapshot.get_reserves(0) == (10**21, 10**21)
+    assert store.publish(2).get_reserves(0) == (2 * 10**21, 10**21)
+    assert store.get_pool('0x01', snapshot).reserve0 == 10**21
+
+
+def test_add_pool_after_publish():
+    registry = PoolRegistry()
+    registry.add_pool(_pool('0x01', 10**21, 10**21))
+    store = UniswapV2SnapshotStore(registry, chunk_size = 4)
+    snapshot = store.publish(1)
+
+    # Deeper pool of the same pair, unknown to the published snapshot
+    row = registry.add_pool(_pool('0x02', 10**24, 10**24))
+    assert row >= len(snapshot)
+    assert snapshot.get_reserves(row) == (None, None)
+    assert snapshot.get_reserves_batch([0, row]) == ([10**21, None], [10**21, None])
+
+    router = UniswapV2Router(registry)
+    route = router.find_best_route(TOKEN_A, TOKEN_B, 10**18, snapshot = snapshot)
+    assert route['pools'] == ['0x01']
+
+    route = router.find_best_route(TOKEN_A, TOKEN_B, 10**18, snapshot = store.publish(2))
+    assert route['pools'] == ['0x02']
+
+    # Rows beyond the last chunk of the snapshot
+    for i in range(3, 10):
+        registry.add_pool(_pool('0x%02x' % i, 10**21, 10**21))
+    route = router.find_best_route(TOKEN_A, TOKEN_B, 10**18, snapshot = snapshot)
+    assert route['pools'] == ['0x01']
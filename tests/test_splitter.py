@@ -0,0 +1,114 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_splitter import UniswapV2Splitter
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+import pytest
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+TOKEN_C = '0x' + 'c' * 40
+
+
+def _pool(
+    pool_address,
+    reserve0,
+    reserve1,
+    tokens = (TOKEN_A, TOKEN_B),
+    source = 'UniswapV2'
+):
+    return UniswapV2Pool({
+        'pool_address': pool_address,
+        'tokens': list(tokens),
+        'source': source,
+        'reserve0': reserve0,
+        'reserve1': reserve1
+    })
+
+
+def test_amounts_in_add_up_to_the_order():
+    splitter = UniswapV2Splitter()
+    reserves = [(10**21, 2 * 10**21), (0, 10**21), (3 * 10**20, 5 * 10**20), (7 * 10**21, 10**22)]
+
+    for amount_in in (1, 10**15, 10**18 + 7, 10**22):
+        amounts_in = splitter.split_reserves(reserves, amount_in)
+
+        assert sum(amounts_in) == amount_in
+        assert min(amounts_in) >= 0
+        # Pools without reserves get nothing
+        assert amounts_in[1] == 0
+
+    assert splitter.split_reserves(reserves, 0) == [0, 0, 0, 0]
+    assert splitter.split_reserves([(0, 1)], 10**18) == [0]
+
+
+def test_identical_pools_split_evenly():
+    splitter = UniswapV2Splitter()
+
+    amounts_in = splitter.split_reserves([(10**21, 2 * 10**21)] * 4, 4 * 10**18)
+
+    # The solve is in floats
+    assert max(amounts_in) - min(amounts_in) <= 10**18 * 1e-12
+
+
+def test_small_orders_stay_in_the_best_pool():
+    splitter = UniswapV2Splitter()
+    # Spot prices 2 and 1.9
+    reserves = [(10**21, 19 * 10**20), (10**21, 2 * 10**21)]
+
+    assert splitter.split_reserves(reserves, 10**18) == [0, 10**18]
+
+    # Large orders move the best pool below the other one
+    amounts_in = splitter.split_reserves(reserves, 10**20)
+    assert 0 < amounts_in[0] < amounts_in[1]
+
+
+def test_split_equalizes_marginal_prices():
+    splitter = UniswapV2Splitter()
+    g = splitter.fee
+    reserves = [(10**21, 2 * 10**21), (3 * 10**20, 59 * 10**19), (7 * 10**21, 15 * 10**21)]
+
+    amounts_in = splitter.split_reserves(reserves, 10**21)
+    prices = [g * x * y / (x + g * a) ** 2 for (x, y), a in zip(reserves, amounts_in)]
+
+    assert all(a > 0 for a in amounts_in)
+    assert max(prices) == pytest.approx(min(prices), rel = 1e-9)
+
+
+def test_split_beats_moving_amounts_between_pools():
+    splitter = UniswapV2Splitter()
+    pools = [_pool('0x01', 10**21, 2 * 10**21), _pool('0x02', 4 * 10**20, 7 * 10**20), _pool('0x03', 10**21, 18 * 10**20, source = 'SushiSwap')]
+    amount_in = 3 * 10**20
+
+    split = splitter.split_pools(pools, TOKEN_A, amount_in)
+    assert split['amount_out'] == sum(split['amounts_out'])
+    assert split['amounts_out'] == [pool.get_amount_out(a, pool.reserve0, pool.reserve1)[1] for pool, a in zip(pools, split['amounts_in'])]
+
+    # Every single pool and every 1% shift between two pools does worse
+    for pool in pools:
+        assert split['amount_out'] >= pool.get_amount_out(amount_in, pool.reserve0, pool.reserve1)[1]
+
+    step = amount_in // 100
+    for i in range(len(pools)):
+        for j in range(len(pools)):
+            amounts_in = list(split['amounts_in'])
+            if i == j or amounts_in[i] < step:
+                continue
+            amounts_in[i] -= step
+            amounts_in[j] += step
+            amount_out = sum(pool.get_amount_out(a, pool.reserve0, pool.reserve1)[1] for pool, a in zip(pools, amounts_in))
+            assert split['amount_out'] >= amount_out
+
+
+def test_virtual_reserves_quote_like_the_path():
+    splitter = UniswapV2Splitter()
+    g = splitter.fee
+    path = [_pool('0x01', 10**21, 2 * 10**21), _pool('0x02', 5 * 10**20, 3 * 10**21, tokens = (TOKEN_C, TOKEN_B), source = 'PancakeSwapV2')]
+
+    x, y = splitter.get_virtual_reserves(path, TOKEN_A)
+
+    for amount_in in (10**15, 10**18, 10**20):
+        exact = splitter.split_paths([path], TOKEN_A, amount_in)['amount_out']
+        assert g * amount_in * y / (x + g * amount_in) == pytest.approx(exact, rel = 1e-9)
+
+    # Reversed path starts from the other side
+    x, y = splitter.get_virtual_reserves(path[::-1], TOKEN_C)
+    amount_out = splitter.split_paths([path[::-1]], TOKEN_C, 10**18)['amount_out']
+    assert g * 10**18 * y / (x + g * 10**18) == pytest.approx(amount_out, rel = 1e-9)
@@ -0,0 +1,134 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_workers import UniswapV2SharedReserves, UniswapV2QuoteWorkerPool, _HEADER, _quote, _init_worker, _route_chunk, _worker
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+import pickle
+import pytest
+
+TOKEN_A = '0x' + 'a' * 40
+TOKEN_B = '0x' + 'b' * 40
+TOKEN_C = '0x' + 'c' * 40
+
+
+def _pool(
+    pool_address,
+    tokens = (TOKEN_A, TOKEN_B)
+):
+    return {'pool_address': pool_address, 'tokens': list(tokens), 'source': 'UniswapV2', 'reserve0': 10**21, 'reserve1': 2 * 10**21}
+
+
+@pytest.fixture
+def reserves():
+    table = UniswapV2SharedReserves(size = 3, spins = 2, backoff = 0, max_retries = 5)
+    yield table
+    table.close()
+
+
+def test_unknown_reserves_differ_from_empty_pools(reserves):
+    reserves.write([0, 1, 2], [None, 0, 10**21], [None, 0, 2**112 - 1], block = 7)
+
+    assert reserves.get_reserves(0) == (None, None)
+    assert reserves.get_reserves(1) == (0, 0)
+    assert reserves.get_reserves(2) == (10**21, 2**112 - 1)
+    assert reserves.get_block() == 7
+
+    # Attached tables read the same records
+    attached = UniswapV2SharedReserves(name = reserves.name)
+    assert [attached.get_reserves(row) for row in range(3)] == [(None, None), (0, 0), (10**21, 2**112 - 1)]
+    attached.close()
+
+
+def test_write_registry_keeps_unknown_reserves(reserves):
+    registry = PoolRegistry()
+    row_known = registry.add_pool({'pool_address': '0x01', 'tokens': [TOKEN_A, TOKEN_B], 'source': 'UniswapV2', 'reserve0': 10**21, 'reserve1': 10**18})
+    row_unknown = registry.add_pool({'pool_address': '0x02', 'tokens': [TOKEN_A, TOKEN_B], 'source': 'UniswapV2'})
+
+    reserves.write_registry(registry, block = 8)
+
+    assert reserves.get_reserves(row_known) == (10**21, 10**18)
+    assert reserves.get_reserves(row_unknown) == (None, None)
+
+    # Unknown reserves quote 0, unknown pools None
+    assert _quote(registry, reserves, '0x01', TOKEN_A, 10**18) > 0
+    assert _quote(registry, reserves, '0x02', TOKEN_A, 10**18) == 0
+    assert _quote(registry, reserves, '0x03', TOKEN_A, 10**18) is None
+
+
+def test_read_retries_overlapping_writes(reserves):
+    reserves.write([0], [1], [2], block = 1)
+    calls = list()
+
+    def function():
+        calls.append(reserves.get_version())
+        # A write lands during the first two reads
+        if len(calls) < 3:
+            reserves.write([0], [len(calls)], [2], block = 1)
+        return reserves.get_reserves(0)
+
+    assert reserves.read(function) == (2, 2)
+    assert len(calls) == 3
+
+
+def test_read_raises_on_stalled_writer(reserves):
+    # A writer that died mid-write leaves the version odd
+    version, size, block = _HEADER.unpack_from(reserves.buf, 0)
+    _HEADER.pack_into(reserves.buf, 0, version + 1, size, block)
+    calls = list()
+
+    with pytest.raises(Exception, match = 'writer stalled'):
+        reserves.read(calls.append, 1)
+
+    assert calls == []
+
+
+def test_writes_beyond_the_table_raise(reserves):
+    with pytest.raises(Exception, match = 'Row 3 is out of the 3 rows'):
+        reserves.write([0, 3], [1, 1], [1, 1], block = 1)
+
+    # Nothing was written
+    assert reserves.get_version() == 0
+    assert reserves.get_reserves(0) == (None, None)
+
+    registry = PoolRegistry()
+    registry.add_pools([_pool('0x%02x' % n) for n in range(1, 5)])
+    with pytest.raises(Exception, match = 'Registry has 4 pools'):
+        reserves.write_registry(registry, block = 1)
+
+
+def test_workers_see_the_refresher_liquidity(reserves):
+    registry = PoolRegistry()
+    registry.add_pools([_pool('0x01'), _pool('0x02', (TOKEN_B, TOKEN_C)), _pool('0x03', (TOKEN_A, TOKEN_C))])
+    registry[2].has_liquidity = False
+    reserves.write_registry(registry, block = 1)
+
+    # As in a worker process, on a copy of the registry
+    _init_worker(reserves.name, pickle.loads(pickle.dumps(registry)))
+    try:
+        route, = _route_chunk([(TOKEN_A, TOKEN_C, 10**18)])
+        assert route['pools'] == ['0x01', '0x02']
+
+        registry[2].has_liquidity = True
+        registry[1].has_liquidity = False
+        reserves.write_registry(registry, block = 2, rows = [])
+
+        route, = _route_chunk([(TOKEN_A, TOKEN_C, 10**18)])
+        assert route['pools'] == ['0x03']
+    finally:
+        _worker['registry'].liquidity = None
+        _worker['reserves'].close()
+        _worker.clear()
+
+
+def test_worker_pool_restarts_when_the_registry_grows():
+    registry = PoolRegistry()
+    registry.add_pool(_pool('0x01'))
+    workers = UniswapV2QuoteWorkerPool(registry, processes = 1)
+    try:
+        assert workers.get_amount_out_batch([('0x01', TOKEN_A, 10**18), ('0x02', TOKEN_A, 10**18)])[1] is None
+
+        registry.add_pool(_pool('0x02', (TOKEN_B, TOKEN_C)))
+        workers.refresh(block = 2)
+
+        assert len(workers.reserves) == 2
+        assert workers.get_amount_out_batch([('0x02', TOKEN_B, 10**18)])[0] > 0
+        assert workers.find_best_routes([(TOKEN_A, TOKEN_C, 10**18)])[0]['pools'] == ['0x01', '0x02']
+    finally:
+        workers.close()
@@ -0,0 +1,103 @@
+from web3 import Web3
+
+'''
+Precomputed function selectors and fixed-layout ABI encoding for the static
+call shapes used by the Uniswap V2 helper and encoder.
+
+Encoders return hex strings without '0x', 64 characters per ABI word, and
+produce the same output as eth_abi.encode_abi for these shapes, with one
+exception: eth_abi (v2) pads an empty bytes value with a zero word, while
+encode_bytes emits its length word only, as Solidity's abi.encode does. Both
+decode to b''.
+'''
+
+
+def get_selector(
+    function_definition
+):
+    '''
+        Returns the '0x' prefixed 4-byte selector of a function definition.
+    '''
+    return Web3.keccak(text=function_definition).hex()[:10]
+
+
+# Selectors, computed once at import
+TRANSFER_SELECTOR = get_selector('transfer(address,uint256)')
+SWAP_SELECTOR = get_selector('swap(uint256,uint256,address,bytes)')
+UNOSWAP_SELECTOR = get_selector('unoswap(address,uint256,uint256,bytes32[])')
+SELL_TO_UNISWAP_SELECTOR = get_selector('sellToUniswap(address[],uint256,uint256,bool)')
+GET_RESERVES_SELECTOR = get_selector('getReserves()')
+GET_AMOUNTS_OUT_SELECTOR = get_selector('getAmountsOut(uint256,address[])')
+AGGREGATE3_SELECTOR = get_selector('aggregate3((address,bool,bytes)[])')
+
+# Event topics
+SYNC_TOPIC = Web3.keccak(text='Sync(uint112,uint112)').hex()
+SWAP_TOPIC = Web3.keccak(text='Swap(address,uint256,uint256,uint256,uint256,address)').hex()
+
+
+def encode_uint256(
+    value
+):
+    value = int(value)
+    if value < 0 or value >> 256:
+        raise Exception(f"### ERROR: Value {value} out of uint256 range.")
+
+    return '%064x' % value
+
+
+def encode_bool(
+    value
+):
+    return '%064x' % (1 if value else 0)
+
+
+def encode_address(
+    address
+):
+    # NOTE:
+    # Checksum conversion only changes letter case, so the word is built
+    # from the lower case address directly.
+    if len(address) != 42 or address[:2] not in ('0x', '0X'):
+        raise Exception(f"### ERROR: Invalid address {address}.")
+
+    int(address, 16)
+
+    return '0' * 24 + address[2:].lower()
+
+
+def encode_bytes32(
+    value
+):
+    '''
+        Encodes a '0x' prefixed 32-byte hex string.
+    '''
+    if len(value) != 66:
+        raise Exception(f"### ERROR: Invalid bytes32 {value}.")
+
+    int(value, 16)
+
+    return value[2:].lower()
+
+
+def encode_array(
+    encoded_items
+):
+    '''
+        Encodes the tail of a dynamic array of static items: length word
+        followed by the already encoded items.
+    '''
+    return encode_uint256(len(encoded_items)) + ''.join(encoded_items)
+
+
+def encode_bytes(
+    value
+):
+    '''
+        Encodes the tail of a dynamic bytes value: length word followed by
+        the data right padded to a multiple of 32 bytes. value is bytes or a
+        '0x' prefixed hex string.
+    '''
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:])
+
+    return encode_uint256(len(value)) + value.hex() + '0' * (-2 * len(value) % 64)
@@ -0,0 +1,297 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+import math
+
+'''
+Detection of profitable 2 and 3 pool arbitrage cycles over the Uniswap V2 pool graph
+'''
+class UniswapV2CycleFinder:
+
+    def __init__(
+        self,
+        pools = None,
+        max_length = 3
+    ):
+
+        # NOTE:
+        # A cycle is (start_token, pools, sell_token0 per pool). Every cycle is
+        # stored once per direction, rotations are not repeated. pool_cycles is
+        # a (pool address) => [cycle ids] index, so that a reserve update only
+        # re-examines the cycles through the changed pools.
+        # Cycles are first screened on log marginal prices: the cycle is
+        # profitable at zero input iff sum(log g) + sum(+-log(reserve1 / reserve0))
+        # over its pools is positive. Only those cycles are evaluated exactly.
+        self.max_length = max_length
+
+        self.cycles = list()
+        self.pool_cycles = dict()
+
+        # Pools by position, log(reserve1 / reserve0) per position, and per
+        # cycle (positions, +1 / -1 per pool, sum of log fees)
+        self.pools = list()
+        self.pool_ids = dict()
+        self.log_prices = list()
+        self.cycle_weights = list()
+
+        # (cycle id) => opportunity, for the cycles profitable at the last check
+        self.opportunities = dict()
+
+        if pools is not None:
+            self.build(pools)
+
+    def _add_cycle(
+        self,
+        start_token,
+        hops
+    ):
+        '''
+            Adds a cycle from (pool, token_in) hops.
+        '''
+        cycle_id = len(self.cycles)
+        pools = tuple(pool for pool, _ in hops)
+        sell_token0 = tuple(pool.token0.lower() == token_in for pool, token_in in hops)
+
+        positions = list()
+        for pool in pools:
+            pool_address = pool.pool_address.lower()
+            position = self.pool_ids.get(pool_address)
+            if position is None:
+                position = len(self.pools)
+                self.pool_ids[pool_address] = position
+                self.pools.append(pool)
+                self.log_prices.append(math.nan)
+            positions.append(position)
+
+        signs = tuple(1 if zero_for_one else -1 for zero_for_one in sell_token0)
+        fee_log = sum(math.log(pool.fork.fee_numerator / pool.fork.fee_denominator) for pool in pools)
+
+        self.cycles.append((start_token, pools, sell_token0))
+        self.cycle_weights.append((tuple(positions), signs, fee_log))
+        for pool in pools:
+            self.pool_cycles.setdefault(pool.pool_address.lower(), list()).append(cycle_id)
+
+    def build(
+        self,
+        pools
+    ):
+        '''
+            Enumerates the 2 pool cycles between pools of the same pair and,
+            with max_length 3, the 3 pool cycles over token triangles. pools
+            are UniswapV2Pool (or view) objects, or a PoolRegistry whose pair
+            index is used as is.
+        '''
+
+        self.cycles = list()
+        self.pool_cycles = dict()
+        self.opportunities = dict()
+        self.pools = list()
+        self.pool_ids = dict()
+        self.log_prices = list()
+        self.cycle_weights = list()
+
+        # NOTE:
+        # Pairs and triangles come from the pair index of a PoolRegistry. Pool
+        # objects are indexed in a registry of their own, and cycles keep the
+        # objects themselves (row => object), so their reserve updates are
+        # seen by update. Tokens are ordered by lower case address as before.
+        if isinstance(pools, PoolRegistry):
+            index = pools
+            row_pools = [index[row] for row in range(len(index))]
+        else:
+            index = PoolRegistry()
+            row_pools = list()
+            for pool in pools:
+                row = index.add_pool({'pool_address': pool.pool_address, 'tokens': pool.tokens, 'source': pool.source})
+                if row == len(row_pools):
+                    row_pools.append(pool)
+
+        names = [token.lower() for token in index.tokens]
+
+        def get_pools(
+            token_a_id,
+            token_b_id
+        ):
+            return [row_pools[row] for row in index.get_pair_rows(token_a_id, token_b_id)]
+
+        # Two pools of one pair, buy in one and sell in the other
+        for key in index.pair_rows:
+            a, b = key >> 32, key & 0xffffffff
+            token_a, token_b = sorted((names[a], names[b]))
+            pair_pools = get_pools(a, b)
+            for p in pair_pools:
+                for q in pair_pools:
+                    if p is not q:
+                        self._add_cycle(token_a, [(p, token_a), (q, token_b)])
+
+        if self.max_length < 3:
+            return len(self.cycles)
+
+        # Token triangles a < b < c, both directions and every pool per edge
+        for a in range(len(names)):
+            for b in index.get_neighbour_ids(a):
+                if names[b] <= names[a]:
+                    continue
+
+                pools_ab = get_pools(a, b)
+                for c in index.get_common_neighbour_ids(a, b):
+                    if names[c] <= names[b]:
+                        continue
+
+                    pools_bc = get_pools(b, c)
+                    pools_ca = get_pools(c, a)
+                    for p in pools_ab:
+                        for q in pools_bc:
+                            for r in pools_ca:
+                                self._add_cycle(names[a], [(p, names[a]), (q, names[b]), (r, names[c])])
+                                self._add_cycle(names[a], [(r, names[a]), (q, names[c]), (p, names[b])])
+
+        return len(self.cycles)
+
+    def evaluate(
+        self,
+        cycle_id
+    ):
+        '''
+            Returns the opportunity of a cycle at the optimal input amount, or
+            None if the cycle is not profitable.
+        '''
+
+        # NOTE:
+        # The cycle is reduced to one constant-product pool (X, Y) with the fee
+        # G of its first pool, composing pool by pool as in
+        # UniswapV2Splitter.get_virtual_reserves. The product of marginal prices
+        # after fees at zero input is G Y / X, and the profit G a Y / (X + G a) - a
+        # is maximal at a* = (sqrt(G X Y) - X) / G. a* is then checked with the
+        # exact integer quotes of the pools.
+        start_token, pools, sell_token0 = self.cycles[cycle_id]
+
+        X = None
+        for pool, zero_for_one in zip(pools, sell_token0):
+            reserve0 = pool.reserve0
+            reserve1 = pool.reserve1
+            if not reserve0 or not reserve1:
+                return None
+
+            fork = pool.fork
+            g = fork.fee_numerator / fork.fee_denominator
+            x, y = (reserve0, reserve1) if zero_for_one else (reserve1, reserve0)
+
+            if X is None:
+                X, Y, G = float(x), float(y), g
+                continue
+
+            denominator = x + g * Y
+            X, Y = X * x / denominator, g * Y * y / denominator
+
+        if G * Y <= X:
+            return None
+
+        amount_in = int((math.sqrt(G * X * Y) - X) / G)
+        if amount_in <= 0:
+            return None
+
+        amounts = [amount_in]
+        for pool, zero_for_one in zip(pools, sell_token0):
+            if zero_for_one:
+                _, amount = pool.get_amount_out(amounts[-1], pool.reserve0, pool.reserve1)
+            else:
+                _, amount = pool.get_amount_out(amounts[-1], pool.reserve1, pool.reserve0)
+            amounts.append(amount)
+
+        profit = amounts[-1] - amount_in
+        if profit <= 0:
+            return None
+
+        opportunity = {
+            'cycle': cycle_id,
+            'token': start_token,
+            'pools': [pool.pool_address for pool in pools],
+            'amounts': amounts,
+            'amount_in': amount_in,
+            'profit': profit,
+            'price_product': G * Y / X
+        }
+
+        return opportunity
+
+    def _update_log_prices(
+        self,
+        positions
+    ):
+        log_prices = self.log_prices
+        for position in positions:
+            pool = self.pools[position]
+            if pool.reserve0 and pool.reserve1:
+                log_prices[position] = math.log(pool.reserve1) - math.log(pool.reserve0)
+            else:
+                log_prices[position] = math.nan
+
+    def _check(
+        self,
+        cycle_ids
+    ) -> list:
+        log_prices = self.log_prices
+        cycle_weights = self.cycle_weights
+
+        found = list()
+        for cycle_id in cycle_ids:
+            positions, signs, weight = cycle_weights[cycle_id]
+            for position, sign in zip(positions, signs):
+                weight += sign * log_prices[position]
+
+            # Also False for pools without reserves (nan)
+            if not weight > 0:
+                self.opportunities.pop(cycle_id, None)
+                continue
+
+            opportunity = self.evaluate(cycle_id)
+            if opportunity is None:
+                self.opportunities.pop(cycle_id, None)
+            else:
+                self.opportunities[cycle_id] = opportunity
+                found.append(opportunity)
+
+        return found
+
+    def scan(
+        self
+    ) -> list:
+        '''
+            Checks all cycles and returns the profitable ones.
+        '''
+        self._update_log_prices(range(len(self.pools)))
+
+        return self._check(range(len(self.cycles)))
+
+    def update(
+        self,
+        pools
+    ) -> list:
+        '''
+            Re-checks only the cycles through changed pools (pool objects or
+            addresses, e.g. UniswapV2EventProcessor.get_changed) and returns
+            the ones that are profitable.
+        '''
+        cycle_ids = set()
+        positions = list()
+        for pool in pools:
+            pool_address = pool if isinstance(pool, str) else pool.pool_address
+            pool_address = pool_address.lower()
+            if pool_address in self.pool_ids:
+                positions.append(self.pool_ids[pool_address])
+                cycle_ids.update(self.pool_cycles[pool_address])
+
+        self._update_log_prices(positions)
+
+        return self._check(cycle_ids)
+
+    def get_opportunities(
+        self,
+        min_profit = 0
+    ) -> list:
+        '''
+            Returns the currently profitable cycles, by profit (in units of
+            each cycle's start token) descending.
+        '''
+        opportunities = [o for o in self.opportunities.values() if o['profit'] > min_profit]
+
+        return sorted(opportunities, key = lambda o: o['profit'], reverse = True)
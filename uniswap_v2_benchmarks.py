@@ -0,0 +1,629 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import PoolRegistry
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_quoter import UniswapV2Quoter
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_router import UniswapV2Router
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_cache import UniswapV2PoolCache
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_arbitrage import UniswapV2CycleFinder
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_curves import UniswapV2CurveTable
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_liquidity import UniswapV2LiquidityIndex
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_metrics import UniswapV2Metrics, _wrap
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_workers import UniswapV2QuoteWorkerPool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_abi import (
+    TRANSFER_SELECTOR, UNOSWAP_SELECTOR, encode_uint256, encode_address, encode_bytes32, encode_array
+)
+from web3 import Web3
+import eth_abi
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+'''
+Offline benchmarks for the Uniswap V2 toolkit.
+
+Run with: python -m utils.Uniswap.Uniswap_v2.Uniswap_v2_benchmarks
+'''
+
+
+def _legacy_get_amount_out(
+    amount_in,
+    reserve_in,
+    reserve_out
+):
+    '''
+        Float division quote path used before the exact integer path.
+        Kept here as the reference for the differential benchmark.
+    '''
+    amount_in = int(amount_in)
+    amount_in_with_fee = amount_in * 9975
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * 10000 + amount_in_with_fee
+    return int(numerator/denominator)
+
+
+def _legacy_get_amount_in(
+    amount_out,
+    reserve_in,
+    reserve_out
+):
+    amount_out = int(amount_out)
+    numerator = reserve_in * amount_out * 10000
+    denominator = (reserve_out - amount_out) * 9975
+    return (numerator / denominator) + 1
+
+
+def _random_pools(
+    n,
+    seed = 0
+):
+    '''
+        Returns n random (reserve_in, reserve_out, amount_in) samples with
+        uint112 reserves.
+    '''
+    rng = random.Random(seed)
+    samples = list()
+    for _ in range(n):
+        reserve_in = rng.randrange(10**6, 2**112)
+        reserve_out = rng.randrange(10**6, 2**112)
+        amount_in = rng.randrange(1, reserve_in)
+        samples.append((reserve_in, reserve_out, amount_in))
+
+    return samples
+
+
+def _random_pool_dicts(
+    n,
+    nr_tokens = 5000,
+    seed = 0
+):
+    '''
+        Returns n random pools in the UniswapV2Pool input format, with
+        reserves.
+    '''
+    rng = random.Random(seed)
+    tokens = ['0x' + rng.getrandbits(160).to_bytes(20, 'big').hex() for _ in range(nr_tokens)]
+    pools = list()
+    for _ in range(n):
+        token0, token1 = sorted(rng.sample(tokens, 2))
+        pools.append({
+            'pool_address': '0x' + rng.getrandbits(160).to_bytes(20, 'big').hex(),
+            'tokens': [token0, token1],
+            'source': 'UniswapV2',
+            'reserve0': rng.randrange(10**6, 2**112),
+            'reserve1': rng.randrange(10**6, 2**112)
+        })
+
+    return pools
+
+
+def bench_quote_paths(
+    n = 7000
+):
+    '''
+        Differential benchmark of the exact integer quote path against the
+        legacy float path. Reports mismatching quotes and time per quote.
+    '''
+
+    samples = _random_pools(n)
+    # The legacy path priced at 9975/10000
+    pool = UniswapV2Pool({'pool_address': '0x0', 'tokens': ['0x0', '0x1'], 'source': 'PancakeSwapV2'})
+
+    start = time.perf_counter()
+    legacy_out = [_legacy_get_amount_out(a, r_in, r_out) for r_in, r_out, a in samples]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact_out = [pool.get_amount_out(a, r_in, r_out)[1] for r_in, r_out, a in samples]
+    exact_time = time.perf_counter() - start
+
+    # amount in is checked for the amount out of the exact path
+    legacy_in = [_legacy_get_amount_in(o, r_in, r_out) for (r_in, r_out, _), o in zip(samples, exact_out)]
+    exact_in = [pool.get_amount_in(o, r_in, r_out)[1] for (r_in, r_out, _), o in zip(samples, exact_out)]
+
+    result = {
+        'n': n,
+        'amount_out_mismatches': sum(1 for l, e in zip(legacy_out, exact_out) if l != e),
+        'amount_in_mismatches': sum(1 for l, e in zip(legacy_in, exact_in) if l != e),
+        'legacy_us_per_quote': legacy_time / n * 1e6,
+        'exact_us_per_quote': exact_time / n * 1e6
+    }
+
+    print("### INFO: Benchmark -> quote paths:", result)
+
+    return result
+
+
+def bench_batch_quote(
+    n = 7000
+):
+    '''
+        Benchmark of the batch quoter against a per-pool get_amount_out loop.
+    '''
+
+    samples = _random_pools(n)
+    reserves_in = [s[0] for s in samples]
+    reserves_out = [s[1] for s in samples]
+    amounts_in = [s[2] for s in samples]
+    pool = UniswapV2Pool({'pool_address': '0x0', 'tokens': ['0x0', '0x1'], 'source': 'UniswapV2'})
+    quoter = UniswapV2Quoter()
+
+    start = time.perf_counter()
+    loop_out = [pool.get_amount_out(a, r_in, r_out)[1] for r_in, r_out, a in samples]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_out = quoter.get_amount_out_batch(amounts_in, reserves_in, reserves_out)
+    batch_time = time.perf_counter() - start
+
+    if loop_out != batch_out:
+        raise Exception("### ERROR: Batch quotes differ from get_amount_out.")
+
+    result = {
+        'n': n,
+        'loop_ms': loop_time * 1e3,
+        'batch_ms': batch_time * 1e3
+    }
+
+    print("### INFO: Benchmark -> batch quote:", result)
+
+    return result
+
+
+def bench_pool_memory(
+    n = 100000
+):
+    '''
+        Memory benchmark of n UniswapV2Pool objects against a PoolRegistry
+        holding the same pools. Input dicts are excluded from the measure.
+    '''
+
+    pools = _random_pool_dicts(n)
+
+    tracemalloc.start()
+    objects = [UniswapV2Pool(p) for p in pools]
+    objects_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+
+    tracemalloc.start()
+    registry = PoolRegistry()
+    registry.add_pools(pools)
+    registry_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        'n': n,
+        'objects_mb': objects_bytes / 2**20,
+        'registry_mb': registry_bytes / 2**20
+    }
+
+    print("### INFO: Benchmark -> pool memory:", result)
+
+    return result
+
+
+def bench_route_search(
+    n = 10000,
+    nr_routes = 100
+):
+    '''
+        Benchmark of the 1-3 hop route search on a random n pool universe.
+    '''
+
+    pools = _random_pool_dicts(n, nr_tokens = n // 5)
+    registry = PoolRegistry()
+    registry.add_pools(pools)
+    router = UniswapV2Router(registry)
+
+    rng = random.Random(1)
+    pairs = [(rng.choice(registry.tokens), rng.choice(registry.tokens)) for _ in range(nr_routes)]
+
+    found = 0
+    start = time.perf_counter()
+    for sell_token, buy_token in pairs:
+        if router.find_best_route(sell_token, buy_token, 10**18) is not None:
+            found += 1
+    search_time = time.perf_counter() - start
+
+    result = {
+        'n': n,
+        'routes_found': found,
+        'ms_per_route': search_time / nr_routes * 1e3
+    }
+
+    print("### INFO: Benchmark -> route search:", result)
+
+    return result
+
+
+def _legacy_encode_transfer(
+    to,
+    value
+):
+    '''
+        Generic encoding path (selector hashed per call, eth_abi.encode_abi)
+        used before the precomputed selectors.
+    '''
+    function_signature = Web3.keccak(text='transfer(address,uint256)').hex()[:10]
+    encoded_args = eth_abi.encode_abi(['address', 'uint256'], [Web3.toChecksumAddress(to), int(value)])
+    return function_signature + encoded_args.hex()
+
+
+def _legacy_encode_unoswap(
+    src_token,
+    amount,
+    min_return,
+    pools
+):
+    function_signature = Web3.keccak(text='unoswap(address,uint256,uint256,bytes32[])').hex()[:10]
+    encoded_args = eth_abi.encode_abi(
+                        ['address', 'uint256', 'uint256', 'bytes32[]'],
+                        [Web3.toChecksumAddress(src_token), amount, min_return, [Web3.toBytes(hexstr=p) for p in pools]]
+                    )
+    return function_signature + encoded_args.hex()
+
+
+def bench_encoder(
+    n = 10000
+):
+    '''
+        Microbenchmark of the precomputed selector and fixed-layout encoding
+        against the generic path, for transfer and a 3 pool unoswap.
+    '''
+
+    rng = random.Random(2)
+    samples = [
+        (
+            '0x' + rng.getrandbits(160).to_bytes(20, 'big').hex(),
+            rng.randrange(2**128),
+            ['0x' + rng.getrandbits(256).to_bytes(32, 'big').hex() for _ in range(3)]
+        )
+        for _ in range(n)
+    ]
+
+    start = time.perf_counter()
+    legacy = [
+        (_legacy_encode_transfer(a, v), _legacy_encode_unoswap(a, v, v // 2, p))
+        for a, v, p in samples
+    ]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = [
+        (
+            TRANSFER_SELECTOR + encode_address(a) + encode_uint256(v),
+            UNOSWAP_SELECTOR + encode_address(a) + encode_uint256(v) + encode_uint256(v // 2)
+            + encode_uint256(4 * 32) + encode_array([encode_bytes32(x) for x in p])
+        )
+        for a, v, p in samples
+    ]
+    fast_time = time.perf_counter() - start
+
+    if legacy != fast:
+        raise Exception("### ERROR: Fast encoding differs from eth_abi encoding.")
+
+    result = {
+        'n': n,
+        'legacy_us_per_call': legacy_time / n * 1e6,
+        'fast_us_per_call': fast_time / n * 1e6
+    }
+
+    print("### INFO: Benchmark -> encoder:", result)
+
+    return result
+
+
+def bench_pool_cache(
+    n = 100000
+):
+    '''
+        Startup from the memory-mapped pool cache: time to open it and read
+        one pool, and to load the full universe into a PoolRegistry.
+    '''
+
+    path = os.path.join(tempfile.mkdtemp(), 'pools.bin')
+    UniswapV2PoolCache.create(path, _random_pool_dicts(n), block = 1).close()
+
+    start = time.perf_counter()
+    cache = UniswapV2PoolCache(path)
+    cache.get_reserves(n - 1)
+    open_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    registry = PoolRegistry()
+    cache.load_registry(registry)
+    load_time = time.perf_counter() - start
+
+    cache.close()
+    file_size = os.path.getsize(path)
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+    result = {
+        'n': n,
+        'file_bytes': file_size,
+        'open_ms': open_time * 1e3,
+        'load_registry_ms': load_time * 1e3
+    }
+
+    print("### INFO: Benchmark -> pool cache:", result)
+
+    return result
+
+
+def bench_cycle_scan(
+    n = 10000,
+    nr_changed = 200
+):
+    '''
+        Full and incremental arbitrage cycle scans on an n pool universe priced
+        from random token prices (within 0.1%), so that few cycles are
+        profitable, as on-chain.
+    '''
+
+    rng = random.Random(3)
+    pools = _random_pool_dicts(n, nr_tokens = n // 25)
+    prices = dict()
+    for pool in pools:
+        token0, token1 = pool['tokens']
+        price0 = prices.setdefault(token0, rng.uniform(0.1, 10))
+        price1 = prices.setdefault(token1, rng.uniform(0.1, 10))
+        pool['reserve1'] = int(pool['reserve0'] * price0 / price1 * rng.uniform(0.999, 1.001))
+
+    registry = PoolRegistry()
+    registry.add_pools(pools)
+    finder = UniswapV2CycleFinder(registry)
+
+    start = time.perf_counter()
+    finder.scan()
+    scan_time = time.perf_counter() - start
+
+    # A block moving the price of nr_changed pools by up to 2%
+    changed = [registry[row] for row in rng.sample(range(len(registry)), nr_changed)]
+    for pool in changed:
+        pool.set_reserves(pool.reserve0, int(pool.reserve1 * rng.uniform(0.98, 1.02)))
+
+    start = time.perf_counter()
+    finder.update(changed)
+    update_time = time.perf_counter() - start
+
+    result = {
+        'n': n,
+        'cycles': len(finder.cycles),
+        'opportunities': len(finder.opportunities),
+        'scan_ms': scan_time * 1e3,
+        'update_ms': update_time * 1e3
+    }
+
+    print("### INFO: Benchmark -> cycle scan:", result)
+
+    return result
+
+
+def bench_curve_table(
+    n = 2000,
+    nr_amounts = 20
+):
+    '''
+        Curve table against the exact quote: build time, max error relative
+        to get_error_bound over random amounts, and evaluation time against
+        per-pool calls and the batch quoter.
+    '''
+
+    registry = PoolRegistry()
+    registry.add_pools(_random_pool_dicts(n))
+    pools = list(registry)
+
+    start = time.perf_counter()
+    table = UniswapV2CurveTable()
+    table.add_pools(pools)
+    build_time = time.perf_counter() - start
+
+    rng = random.Random(4)
+    requests = [
+        (pool, int(pool.reserve0 * 10 ** rng.uniform(-8, 1)))
+        for pool in pools for _ in range(nr_amounts)
+    ]
+
+    error_ratio = max(table.check(pool, pool.token0, [amount]) for pool, amount in requests)
+
+    rows = [table.get_row(pool.pool_address, pool.token0) for pool, _ in requests]
+    amounts_in = [amount for _, amount in requests]
+    reserves_in = [pool.reserve0 for pool, _ in requests]
+    reserves_out = [pool.reserve1 for pool, _ in requests]
+
+    start = time.perf_counter()
+    table.get_amount_out_rows(rows, amounts_in)
+    table_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table.get_marginal_price_rows(rows, amounts_in)
+    price_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    [pool.get_amount_out(amount, pool.reserve0, pool.reserve1) for pool, amount in requests]
+    pool_time = time.perf_counter() - start
+
+    quoter = UniswapV2Quoter()
+    start = time.perf_counter()
+    quoter.get_amount_out_batch(amounts_in, reserves_in, reserves_out)
+    batch_time = time.perf_counter() - start
+
+    result = {
+        'n': n,
+        'build_us_per_pool': build_time / n * 1e6,
+        'max_error_to_bound': error_ratio,
+        'table_us_per_eval': table_time / len(requests) * 1e6,
+        'price_us_per_eval': price_time / len(requests) * 1e6,
+        'pool_us_per_eval': pool_time / len(requests) * 1e6,
+        'batch_us_per_eval': batch_time / len(requests) * 1e6
+    }
+
+    print("### INFO: Benchmark -> curve table:", result)
+
+    return result
+
+
+def bench_liquidity_pruning(
+    n = 7000,
+    nr_routes = 100,
+    min_depth = 10**23
+):
+    '''
+        Route search with and without dust pool pruning, on a universe of
+        mostly dust pools and deep pools against a few hub tokens.
+    '''
+
+    pools = _random_pool_dicts(n, nr_tokens = n // 10)
+    tokens = sorted({token for pool in pools for token in pool['tokens']})
+    hubs = tokens[:5]
+
+    rng = random.Random(5)
+    prices = {token: 10 ** rng.uniform(-3, 3) for token in tokens}
+    for pool in pools:
+        deep = rng.random() < 0.15
+        if deep:
+            pool['tokens'] = sorted([rng.choice(hubs), rng.choice(tokens[5:])])
+
+        token0, token1 = pool['tokens']
+        value = 10 ** (rng.uniform(6, 8) if deep else rng.uniform(0, 3))
+        pool['reserve0'] = int(value / prices[token0] * 10**18) + 1
+        pool['reserve1'] = int(value / prices[token1] * 10**18) + 1
+
+    registry = PoolRegistry()
+    registry.add_pools(pools)
+    router = UniswapV2Router(registry)
+
+    start = time.perf_counter()
+    index = UniswapV2LiquidityIndex(hubs[0], min_depth = min_depth, pools = list(registry))
+    build_time = time.perf_counter() - start
+
+    pairs = [(rng.choice(tokens), rng.choice(tokens)) for _ in range(nr_routes)]
+
+    start = time.perf_counter()
+    pruned = [router.find_best_route(s, b, 10**18) for s, b in pairs]
+    pruned_time = time.perf_counter() - start
+
+    index.set_min_depth(0)
+    start = time.perf_counter()
+    full = [router.find_best_route(s, b, 10**18) for s, b in pairs]
+    full_time = time.perf_counter() - start
+
+    # Pruned routes that are within 0.1% of the unpruned best route
+    matched = sum(
+        1 for p, f in zip(pruned, full)
+        if p is not None and f is not None and p['amount_out'] * 1000 >= f['amount_out'] * 999
+    )
+
+    result = {
+        'n': n,
+        'liquid_pools': sum(1 for depth in index.depths.values() if depth >= min_depth),
+        'build_ms': build_time * 1e3,
+        'pruned_ms_per_route': pruned_time / nr_routes * 1e3,
+        'full_ms_per_route': full_time / nr_routes * 1e3,
+        'pruned_routes_found': sum(1 for p in pruned if p is not None),
+        'full_routes_found': sum(1 for f in full if f is not None),
+        'pruned_routes_matched': matched
+    }
+
+    print("### INFO: Benchmark -> liquidity pruning:", result)
+
+    return result
+
+
+def bench_metrics_overhead(
+    n = 100000
+):
+    '''
+        Cost of the timed instrumentation on UniswapV2Pool.get_amount_out,
+        the cheapest instrumented call. Disabled instrumentation is the bare
+        function.
+    '''
+
+    samples = _random_pools(n)
+    pool = UniswapV2Pool({'pool_address': '0x0', 'tokens': ['0x0', '0x1'], 'source': 'UniswapV2'})
+
+    bare = getattr(UniswapV2Pool.get_amount_out, '__wrapped__', UniswapV2Pool.get_amount_out)
+    registry = UniswapV2Metrics()
+    instrumented = _wrap('pool.get_amount_out', bare, registry)
+
+    start = time.perf_counter()
+    [bare(pool, a, r_in, r_out) for r_in, r_out, a in samples]
+    bare_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    [instrumented(pool, a, r_in, r_out) for r_in, r_out, a in samples]
+    instrumented_time = time.perf_counter() - start
+
+    histogram = registry.get_histogram('pool.get_amount_out')
+
+    result = {
+        'n': n,
+        'bare_us_per_call': bare_time / n * 1e6,
+        'instrumented_us_per_call': instrumented_time / n * 1e6,
+        'overhead_us_per_call': (instrumented_time - bare_time) / n * 1e6,
+        'p50_us': histogram.get_percentile(0.5),
+        'p99_us': histogram.get_percentile(0.99)
+    }
+
+    print("### INFO: Benchmark -> metrics overhead:", result)
+
+    return result
+
+
+def bench_worker_scaling(
+    n = 20000,
+    nr_requests = 200000,
+    processes = None
+):
+    '''
+        Quote throughput of UniswapV2QuoteWorkerPool against the number of
+        worker processes (1, 2, 4, ... up to the core count by default), and
+        the speedup over one worker.
+    '''
+
+    pools = _random_pool_dicts(n)
+    registry = PoolRegistry()
+    registry.add_pools(pools)
+
+    rng = random.Random(1)
+    requests = [(p['pool_address'], p['tokens'][rng.randrange(2)], 10**18) for p in rng.choices(pools, k = nr_requests)]
+
+    if processes is None:
+        cores = os.cpu_count() or 1
+        processes = sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+
+    result = {'n': n, 'nr_requests': nr_requests, 'cores': os.cpu_count(), 'quotes_per_s': dict(), 'speedup': dict()}
+    for nr_processes in processes:
+        workers = UniswapV2QuoteWorkerPool(registry, processes = nr_processes, chunk_size = 1024)
+
+        # Starts the workers outside the timed run
+        workers.get_amount_out_batch(requests[:nr_processes * 1024])
+
+        start = time.perf_counter()
+        workers.get_amount_out_batch(requests)
+        elapsed = time.perf_counter() - start
+        workers.close()
+
+        result['quotes_per_s'][nr_processes] = nr_requests / elapsed
+        result['speedup'][nr_processes] = result['quotes_per_s'][nr_processes] / result['quotes_per_s'][processes[0]]
+
+    print("### INFO: Benchmark -> worker scaling:", result)
+
+    return result
+
+
+if __name__ == '__main__':
+
+    bench_quote_paths()
+    bench_batch_quote()
+    bench_pool_memory()
+    bench_route_search()
+    bench_encoder()
+    bench_pool_cache()
+    bench_cycle_scan()
+    bench_curve_table()
+    bench_liquidity_pruning()
+    bench_metrics_overhead()
+    bench_worker_scaling()
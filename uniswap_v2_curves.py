@@ -0,0 +1,226 @@
+from array import array
+
+# NOTE:
+# Queries evaluate the constant-product curve in closed form on float copies
+# of the reserves and fee, out = g * a * y / (x + g * a), instead of
+# interpolating a grid: in CPython a lookup costs as much as the formula and
+# adds interpolation error. Every input conversion and operation rounds by at
+# most 2^-53 relative, so the float output is within RELATIVE_ERROR of the
+# real-valued curve, and the exact integer quote is its floor. Hence
+# |amount_out - exact| <= RELATIVE_ERROR * amount_out + 1, see get_error_bound.
+RELATIVE_ERROR = 8 * 2.0 ** -53
+
+
+'''
+Per-pool output and marginal price curves of Uniswap V2 pools
+'''
+class UniswapV2CurveTable:
+
+    def __init__(
+        self
+    ):
+
+        # NOTE:
+        # Curves of all pools live in flat array('d') columns, one row per
+        # pool direction, row = 2 * pool + direction (0 sells token0). Rows of
+        # pools without reserves hold 0 and quote 0.
+        self.pool_ids = dict()
+        self.pools = list()
+
+        self.reserves_in = array('d')
+        self.reserves_out = array('d')
+        self.fees = array('d')
+
+    def __len__(
+        self
+    ):
+        return len(self.pools)
+
+    def add_pools(
+        self,
+        pools
+    ):
+        return [self.add_pool(pool) for pool in pools]
+
+    def add_pool(
+        self,
+        pool
+    ):
+        '''
+            Adds (or recomputes) the curves of both directions of a pool and
+            returns its index.
+        '''
+        pool_address = pool.pool_address.lower()
+        index = self.pool_ids.get(pool_address)
+        if index is None:
+            index = len(self.pools)
+            self.pool_ids[pool_address] = index
+            self.pools.append(pool)
+            self.reserves_in.extend((0.0, 0.0))
+            self.reserves_out.extend((0.0, 0.0))
+            self.fees.extend((0.0, 0.0))
+        else:
+            self.pools[index] = pool
+
+        reserve0 = pool.reserve0 or 0
+        reserve1 = pool.reserve1 or 0
+        if not reserve0 or not reserve1:
+            reserve0 = reserve1 = 0
+
+        fee = pool.fork.fee_numerator / pool.fork.fee_denominator
+        row = 2 * index
+        self.reserves_in[row] = reserve0
+        self.reserves_out[row] = reserve1
+        self.reserves_in[row + 1] = reserve1
+        self.reserves_out[row + 1] = reserve0
+        self.fees[row] = self.fees[row + 1] = fee
+
+        return index
+
+    def update_pools(
+        self,
+        pools
+    ):
+        '''
+            Recomputes the curves of pools whose reserves changed.
+        '''
+        for pool in pools:
+            self.add_pool(pool)
+
+    def get_row(
+        self,
+        pool_address,
+        token_in
+    ):
+        '''
+            Returns the curve row of a pool direction, for the *_rows methods.
+        '''
+        index = self.pool_ids.get(pool_address.lower())
+        if index is None:
+            raise Exception(f"### ERROR: Pool {pool_address} has no curve.")
+
+        pool = self.pools[index]
+
+        return 2 * index if pool.token0.lower() == token_in.lower() else 2 * index + 1
+
+    def get_amount_out(
+        self,
+        pool_address,
+        token_in,
+        amount_in
+    ):
+        '''
+            Amount out (float) of selling amount_in of token_in, within
+            get_error_bound of the exact integer quote.
+        '''
+        return self.get_amount_out_rows([self.get_row(pool_address, token_in)], [amount_in])[0]
+
+    def get_marginal_price(
+        self,
+        pool_address,
+        token_in,
+        amount_in
+    ):
+        '''
+            Marginal price d amount_out / d amount_in after selling amount_in,
+            within RELATIVE_ERROR of the real-valued curve.
+        '''
+        return self.get_marginal_price_rows([self.get_row(pool_address, token_in)], [amount_in])[0]
+
+    def get_amount_out_batch(
+        self,
+        pool_addresses,
+        tokens_in,
+        amounts_in
+    ) -> list:
+        '''
+            Amounts out for aligned lists of pools, tokens in and amounts in.
+        '''
+        rows = [self.get_row(p, t) for p, t in zip(pool_addresses, tokens_in)]
+
+        return self.get_amount_out_rows(rows, amounts_in)
+
+    def get_amount_out_rows(
+        self,
+        rows,
+        amounts_in
+    ) -> list:
+        '''
+            Amounts out for rows resolved once with get_row, the fast path for
+            many evaluations of the same pools.
+        '''
+        reserves_in = self.reserves_in
+        reserves_out = self.reserves_out
+        fees = self.fees
+
+        amounts_out = list()
+        for row, amount_in in zip(rows, amounts_in):
+            x = reserves_in[row]
+            if amount_in <= 0 or not x:
+                amounts_out.append(0.0)
+                continue
+
+            a = fees[row] * amount_in
+            amounts_out.append(a * reserves_out[row] / (x + a))
+
+        return amounts_out
+
+    def get_marginal_price_rows(
+        self,
+        rows,
+        amounts_in
+    ) -> list:
+        '''
+            Marginal prices g * x * y / (x + g * a)^2 for rows resolved with
+            get_row, 0 for pools without reserves.
+        '''
+        reserves_in = self.reserves_in
+        reserves_out = self.reserves_out
+        fees = self.fees
+
+        prices = list()
+        for row, amount_in in zip(rows, amounts_in):
+            x = reserves_in[row]
+            if not x:
+                prices.append(0.0)
+                continue
+
+            g = fees[row]
+            d = x + g * amount_in if amount_in > 0 else x
+            prices.append(g * x / d * reserves_out[row] / d)
+
+        return prices
+
+    def get_error_bound(
+        self,
+        amount_out
+    ):
+        '''
+            Max absolute difference between an amount out of this table and
+            the exact integer get_amount_out.
+        '''
+        return RELATIVE_ERROR * amount_out + 1
+
+    def check(
+        self,
+        pool,
+        token_in,
+        amounts_in
+    ):
+        '''
+            Returns the max ratio of the error against the exact integer
+            get_amount_out of the pool to get_error_bound, over amounts_in.
+            At most 1 by construction.
+        '''
+        if pool.token0.lower() == token_in.lower():
+            reserve_in, reserve_out = pool.reserve0, pool.reserve1
+        else:
+            reserve_in, reserve_out = pool.reserve1, pool.reserve0
+
+        ratio = 0.0
+        for amount_in in amounts_in:
+            _, exact = pool.get_amount_out(amount_in, reserve_in, reserve_out)
+            approx = self.get_amount_out(pool.pool_address, token_in, amount_in)
+            ratio = max(ratio, abs(approx - exact) / self.get_error_bound(approx))
+
+        return ratio
@@ -1,8 +1,18 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_gas_model import UniswapV2GasModel
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_forks import FORKS, get_fork
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_metrics import ENABLED as METRICS_ENABLED, increment, timed
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_abi import (
+    TRANSFER_SELECTOR, SWAP_SELECTOR, UNOSWAP_SELECTOR, SELL_TO_UNISWAP_SELECTOR,
+    encode_uint256, encode_bool, encode_address, encode_bytes32, encode_array, encode_bytes
+)
 from eth_utils import keccak, to_bytes
 import eth_abi
 from web3 import Web3
 from typing import NamedTuple
 from eth_abi.packed import encode_abi_packed
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import datetime
 import json
 
@@ -17,8 +27,9 @@ class UniswapV2Encoder:
     ):
         
         # UniV2 addresses:
-        self.factory_address = '0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f'
-        self.router_address = '0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D'
+        # Other forks are resolved from the hop's source, see get_fork
+        self.factory_address = FORKS['UniswapV2'].factory_address
+        self.router_address = FORKS['UniswapV2'].router_address
 
         # Targets
         self._zeroex = {'target': 'zeroex', 'address': '0xdef1c0ded9bec7f1a1670819833240f027b25eff'}
@@ -35,39 +46,96 @@ class UniswapV2Encoder:
         # Targets ranking single swap
         self.target_ranking = ['otex', '1inch', 'zeroex']
 
+        # Gas model used to pick the cheapest target per hop
+        self.gas_model = UniswapV2GasModel()
+
         # Encoding dependencies
         self.resolver_contract = '0x7a359544e4031703a6149db2994afb4e324bb242'
-        self.pool_init_code_hash = '0x96e8ac4277198ff8b6f785478aa9a39f403cb768dd02cbee326c3e7da348845f'
+        self.pool_init_code_hash = FORKS['UniswapV2'].init_code_hash
         self.min_buy_precision = 9
 
+        # Pair address caches
+        # pair_address_table is an optional precomputed (token0, token1) => pair address
+        # table, _pool_cache a bounded LRU of packed pools by (token_in, token_out).
+        self.pair_address_table = dict()
+        self.pool_cache_size = 65536
+        self._pool_cache = OrderedDict()
+
+        # Direct transfer + flash swap for single pool hops
+        self.direct_swaps = True
+
         self.test = True
     
+    @timed('encoder.encode_hop')
     def encode_hop(
         self,
         hop,
-        allowances
+        allowances,
+        verbose = True,
+        pool = None
     ):
+        '''
+            Encodes a hop. Single pool hops are settled directly against the pool
+            (transfer + flash swap, no router) when the modeled UniswapV2Pool of the
+            hop is given and the direct path is the cheapest target.
+        '''
 
         it_pre = dict()
         approval = dict()
         it = dict()
-        # if len(hop.pools_addresses) == 1:
-            
-        #     # Simulation:
-        #     # https://dashboard.tenderly.co/felixjff/project/simulator/26f3c434-81e2-4f7c-b137-7977935affd9/gas-usage
 
-        #     it_pre = self.encode_sell_transfer(hop)
-        #     it = self.encode_hop_single_pool(hop)
+        if self.direct_swaps and pool is not None and len(hop.pools_addresses) == 1 \
+                and pool.pool_address.lower() == hop.pools_addresses[0].lower() \
+                and pool.has_complete_data():
 
-        #     if self.test:
-        #         print("### INFO: Encoder -> Encoded UniswapV2 interaction for settlement.")
-        
-        # else:
+            target, (it_pre, it) = self.select_encoding(hop, direct = True, pool = pool)
+
+            if verbose and target == 'uniswap_v2':
+                print("### INFO: Encoder -> Encoded UniswapV2 interaction for settlement.")
+            elif verbose:
+                print("### INFO: Encoder -> Encoded UniswapV2 interaction.")
+
+        else:
             
-        approval, it = self.encode_hop_multiple_pools(hop, allowances)
+            approval, it = self.encode_hop_multiple_pools(hop, allowances, verbose = verbose)
         
         return it_pre, approval, it
+
+    @timed('encoder.encode_batch')
+    def encode_batch(
+        self,
+        hops,
+        allowances = None,
+        processes = None,
+        chunk_size = 256,
+        pools = None
+    ) -> list:
+        '''
+            Encodes many hops (e.g. of many candidate solutions) in one call and
+            returns the (it_pre, approval, it) of encode_hop per hop.
+
+            Selectors and pool addresses are shared across hops and nothing is
+            printed. pools is an optional (pool address) => UniswapV2Pool dict
+            for direct single pool swaps. With processes, batches larger than
+            chunk_size are split in chunks encoded on a process pool.
+        '''
+
+        hops = list(hops)
+
+        if not processes or len(hops) <= chunk_size:
+            return _encode_chunk(self, hops, allowances, pools)
+
+        # NOTE:
+        # Each worker process gets a copy of the encoder with its caches, so
+        # pair addresses are only shared within a chunk's worker.
+        chunks = [hops[i:i + chunk_size] for i in range(0, len(hops), chunk_size)]
+
+        with ProcessPoolExecutor(max_workers = processes) as executor:
+            results = executor.map(_encode_chunk, [self] * len(chunks), chunks, [allowances] * len(chunks), [pools] * len(chunks))
+
+            return [it for chunk in results for it in chunk]
     
+    @timed('encoder.encode_sell_transfer')
     def encode_sell_transfer(
         self,
         hop
@@ -106,92 +174,92 @@ class UniswapV2Encoder:
         to
     ):
 
-        # Field types
-        types = ['address', 'uint256'] # (to, value)
-
-        # Fields
-        fields = f'{",".join(types)}'
-
-        # Function
-        function_definition = f'transfer({fields})'
-
-        # Function signature
-        function_signature = Web3.keccak(text=function_definition).hex()[:10]
-
-        # Prepare inputs
-        order_paramters = [
-            Web3.toChecksumAddress(to),
-            int(value)
-        ]
-
-
-        # Encode inputs
-        encoded_args = eth_abi.encode_abi(
-                            ['address', 'uint256'], 
-                            [Web3.toChecksumAddress(to), int(value)]
-                        )
+        # Encode inputs (to, value)
+        encoded_args = encode_address(to) + encode_uint256(int(value))
 
         # Get call data
-        calldata = function_signature + encoded_args.hex() 
+        calldata = TRANSFER_SELECTOR + encoded_args
 
         return calldata
     
+    @timed('encoder.uniswap_v2')
     def encode_hop_single_pool(
         self,
-        hop
+        hop,
+        pool = None
     ):
         '''
             Function implements new method to encode UniV2 swaps based on the Flash Swap
             functionality:
             https://docs.uniswap.org/contracts/v2/guides/smart-contract-integration/using-flash-swaps
-        '''
-
-        # Field types
-        types = ['uint256', 'uint256', 'address', 'bytes']
 
-        # Fields
-        fields = f'{",".join(types)}'
-
-        # Function
-        function_definition = f'swap({fields})'
-
-        # Function signature
-        function_signature = Web3.keccak(text=function_definition).hex()[:10]
-        
-        tokens = sorted(hop.pools_utils)
+            With the modeled UniswapV2Pool, the amount out is computed from its
+            reserves at the fee the pair enforces, less the hop's slippage as a
+            buffer against reserve changes before inclusion, and must satisfy
+            the hop's minimum buy amount.
+        '''
 
         # Tokens
-        token0 = Web3.toChecksumAddress(tokens[0])
-        token1 = Web3.toChecksumAddress(tokens[1])
+        # NOTE:
+        # token0 is the token with the lower address as a number, a string sort
+        # of checksum addresses can differ.
+        if pool is not None:
+            token0 = pool.token0
+        else:
+            token0 = min(hop.pools_utils[:2], key = lambda t: int(t,16))
 
         # Pool
         pool_address = hop.pools_addresses[0]
 
+        # Amount out
+        sell_token0 = token0.lower() == hop.sell_token.lower()
+        if pool is not None:
+
+            # NOTE:
+            # The pair checks K at its own fee (fork.pair_fee_numerator), so
+            # the request is bounded by get_pair_amount_out rather than the
+            # hop's buy amount. Requesting more makes swap() revert, so the
+            # request is that quote less slippage, but never below the minimum
+            # buy amount.
+            if sell_token0:
+                pair_amount_out = pool.get_pair_amount_out(hop.exec_sell_amount, pool.reserve0, pool.reserve1)
+            else:
+                pair_amount_out = pool.get_pair_amount_out(hop.exec_sell_amount, pool.reserve1, pool.reserve0)
+
+            buy_amount = int(hop.exec_buy_amount)
+            min_buy_amount = int(round(buy_amount - (buy_amount * hop.slippage),0))
+            if pair_amount_out < min_buy_amount:
+                raise Exception(f"### ERROR: Pool {pool_address} quotes {pair_amount_out}, below minimum buy amount {min_buy_amount}.")
+
+            amount_out = min(pair_amount_out, int(pair_amount_out * (1 - hop.slippage)))
+            amount_out = max(amount_out, min_buy_amount)
+        else:
+            # Without reserves only the minimum buy amount is requested
+            buy_amount = int(hop.exec_buy_amount)
+            amount_out = int(round(buy_amount - (buy_amount * hop.slippage),0))
+
         # Amounts
-        if token0.lower() == hop.sell_token.lower():
-            amount_1_out = int(hop.exec_buy_amount)
+        if sell_token0:
+            amount_1_out = amount_out
             amount_0_out = 0
         else:
-            amount_0_out = int(hop.exec_buy_amount)
+            amount_0_out = amount_out
             amount_1_out = 0
         
-        data = '0x'
-        
-        # Field encoding
-        encodes = [
-            fields
-        ]
-
         # Encode parameters
-        encoded_args = eth_abi.encode_abi(types, [
-            amount_0_out,                   # amout0Oout
-            amount_1_out,                   # amout1Oout
-            Web3.toChecksumAddress(self.resolver_contract),     # receiver
-            Web3.toBytes(hexstr=data)       # data
-        ])
+        # NOTE:
+        # data is empty, so it is encoded as the offset of its tail (4 words)
+        # followed by a zero length, see encode_bytes.
+        encoded_args = (
+            encode_uint256(amount_0_out)                    # amout0Oout
+            + encode_uint256(amount_1_out)                  # amout1Oout
+            + encode_address(self.resolver_contract)        # receiver
+            + encode_uint256(4 * 32)                        # data offset
+            + encode_bytes(b'')                             # data
+        )
 
         # Encoded function + paramters
-        calldata = function_signature + encoded_args.hex()
+        calldata = SWAP_SELECTOR + encoded_args
 
         # Get input(s) for tx record
         inputs = list()
@@ -200,7 +268,7 @@ class UniswapV2Encoder:
 
         # Get output(s)
         outputs = list()
-        outp = {'token': hop.buy_token, 'amount': str(hop.exec_buy_amount)}
+        outp = {'token': hop.buy_token, 'amount': str(amount_out)}
         outputs.append(outp)
 
         tx = {
@@ -215,19 +283,84 @@ class UniswapV2Encoder:
     def encode_hop_multiple_pools(
         self,
         hop,
-        allowances
+        allowances,
+        verbose = True
     ):
 
-        ranking = self.target_ranking
-
         approval = dict()
-        it = self.encode(target = '1inch', hop = hop)
+        _ , (_ , it) = self.select_encoding(hop)
         
 
-        print("### INFO: Encoder -> Encoded UniswapV2 interaction.")
+        if verbose:
+            print("### INFO: Encoder -> Encoded UniswapV2 interaction.")
         
         return approval, it
 
+    def select_target(
+        self,
+        hop,
+        direct = False,
+        pool = None
+    ):
+        '''
+            Returns the deployed target of target_ranking with the lowest
+            estimated gas for the hop, see select_encoding.
+        '''
+        target, _ = self.select_encoding(hop, direct = direct, pool = pool)
+
+        return target
+
+    def select_encoding(
+        self,
+        hop,
+        direct = False,
+        pool = None
+    ):
+        '''
+            Encodes the hop with every deployed target of target_ranking that
+            can execute its number of pools and returns (target, (it_pre, it))
+            of the one with the lowest estimated gas, scored on its calldata
+            and hop count. With direct, the direct pool swap ('uniswap_v2',
+            with the modeled pool if given) is a candidate too.
+        '''
+
+        nr_hops = len(hop.pools_utils) - 1
+
+        # Targets without a deployed address are skipped
+        targets = [t for t in self.target_ranking if self.targets.get(t, '####') != '####']
+        if direct:
+            targets = ['uniswap_v2'] + targets
+        targets = [t for t in targets if self.gas_model.can_execute(t, nr_hops)]
+
+        if not targets:
+            raise Exception(f"### ERROR: No encoding target for a {nr_hops} pool hop.")
+
+        # NOTE:
+        # Calldata gas depends on the amounts and pools of the hop, e.g. the
+        # direct swap sends the amount in and out in full while unoswap rounds
+        # minReturn to min_buy_precision, so each candidate is encoded and
+        # scored on its own calldata. The winner's encoding is returned.
+        encodings = dict()
+        calldata = dict()
+        for target in targets:
+            if target == 'uniswap_v2':
+                # it_pre and it must be executed together and in this order: the
+                # swap pays out against the tokens transferred to the pool.
+                # Simulation:
+                # https://dashboard.tenderly.co/felixjff/project/simulator/26f3c434-81e2-4f7c-b137-7977935affd9/gas-usage
+                it_pre = self.encode_sell_transfer(hop)
+                it = self.encode_hop_single_pool(hop, pool = pool)
+                calldata[target] = [it_pre['data'], it['data']]
+            else:
+                it_pre = dict()
+                it = self.encode(target = target, hop = hop)
+                calldata[target] = it['data']
+            encodings[target] = (it_pre, it)
+
+        target = self.gas_model.rank(targets, nr_hops, calldata)[0]
+
+        return target, encodings[target]
+
     def encode(
         self,
         target,
@@ -243,6 +376,7 @@ class UniswapV2Encoder:
         
         return it
     
+    @timed('encoder.otex')
     def encode_otex(
         self,
         hop
@@ -252,6 +386,7 @@ class UniswapV2Encoder:
 
         return it
     
+    @timed('encoder.zeroex')
     def encode_zeroex(
         self,
         hop
@@ -260,6 +395,7 @@ class UniswapV2Encoder:
 
         return it
     
+    @timed('encoder.1inch')
     def encode_oneinch(
         self,
         hop
@@ -278,18 +414,6 @@ class UniswapV2Encoder:
         Source: https://etherscan.io/address/0x1111111254fb6c44bac0bed2854e76f90643097d
         '''
 
-        # Field types
-        types = ['address', 'uint256', 'uint256', 'bytes32[]']
-
-        # Fields
-        fields = f'{",".join(types)}'
-
-        # Function
-        function_definition = f'unoswap({fields})'
-
-        # Function signature
-        function_signature = Web3.keccak(text=function_definition).hex()[:10]
-
         # Field value pre-process
         # Source token
         src_token = Web3.toChecksumAddress(hop.sell_token)
@@ -315,28 +439,23 @@ class UniswapV2Encoder:
         i = 1
         pools = list()
         while i < len(hop.pools_utils):
-            tokenA = Web3.toChecksumAddress(hop.pools_utils[i-1])
-            tokenB = Web3.toChecksumAddress(hop.pools_utils[i])
-            pool_address = self._to_pool(tokenA, tokenB)
-            pool_bytes = Web3.toBytes(hexstr=pool_address)
-            pools.append(pool_bytes)
+            tokenA = hop.pools_utils[i-1]
+            tokenB = hop.pools_utils[i]
+            pool_address = self._to_pool(tokenA, tokenB, getattr(hop, 'source', None))
+            pools.append(encode_bytes32(pool_address))
             i+=1
-        
-        # Field encoding
-        encodes = [
-            fields
-        ]
 
         # Encode parameters
-        encoded_args = eth_abi.encode_abi(types, [
-            src_token,          # srcToken
-            amount,             # Amount
-            min_buy_amount,         # minReturn
-            pools               # pools
-        ])
+        encoded_args = (
+            encode_address(src_token)           # srcToken
+            + encode_uint256(amount)            # Amount
+            + encode_uint256(min_buy_amount)    # minReturn
+            + encode_uint256(4 * 32)            # pools offset
+            + encode_array(pools)               # pools
+        )
 
         # Encoded function + paramters
-        calldata = function_signature + encoded_args.hex()
+        calldata = UNOSWAP_SELECTOR + encoded_args
 
         # Get input(s) for tx record
         inputs = list()
@@ -367,18 +486,6 @@ class UniswapV2Encoder:
         Source: https://etherscan.io/address/0x1111111254fb6c44bac0bed2854e76f90643097d
         '''
 
-        # Field types
-        types = ['address', 'uint256', 'uint256', 'bytes32[]']
-
-        # Fields
-        fields = f'{",".join(types)}'
-
-        # Function
-        function_definition = f'unoswap({fields})'
-
-        # Function signature
-        function_signature = Web3.keccak(text=function_definition).hex()[:10]
-
         # Field value pre-process
         # Source token
         src_token = Web3.toChecksumAddress(hop.sell_token)
@@ -404,28 +511,23 @@ class UniswapV2Encoder:
         i = 1
         pools = list()
         while i < len(hop.pools_utils):
-            tokenA = Web3.toChecksumAddress(hop.pools_utils[i-1])
-            tokenB = Web3.toChecksumAddress(hop.pools_utils[i])
-            pool_address = self._to_pool(tokenA, tokenB)
-            pool_bytes = Web3.toBytes(hexstr=pool_address)
-            pools.append(pool_bytes)
+            tokenA = hop.pools_utils[i-1]
+            tokenB = hop.pools_utils[i]
+            pool_address = self._to_pool(tokenA, tokenB, getattr(hop, 'source', None))
+            pools.append(encode_bytes32(pool_address))
             i+=1
-        
-        # Field encoding
-        encodes = [
-            fields
-        ]
 
         # Encode parameters
-        encoded_args = eth_abi.encode_abi(types, [
-            src_token,          # srcToken
-            amount,             # Amount
-            min_buy_amount,         # minReturn
-            pools               # pools
-        ])
+        encoded_args = (
+            encode_address(src_token)           # srcToken
+            + encode_uint256(amount)            # Amount
+            + encode_uint256(min_buy_amount)    # minReturn
+            + encode_uint256(4 * 32)            # pools offset
+            + encode_array(pools)               # pools
+        )
 
         # Encoded function + paramters
-        calldata = function_signature + encoded_args.hex()
+        calldata = UNOSWAP_SELECTOR + encoded_args
 
         # Get input(s) for tx record
         inputs = list()
@@ -457,18 +559,6 @@ class UniswapV2Encoder:
         Source: https://etherscan.io/address/0xf9b30557afcf76ea82c04015d80057fa2147dfa9
         '''
 
-        # Field types
-        types = ['address[]', 'uint256', 'uint256', 'bool']
-
-        # Fields
-        fields = f'{",".join(types)}'
-
-        # Function
-        function_definition = f'sellToUniswap({fields})'
-
-        # Function signature
-        function_signature = Web3.keccak(text=function_definition).hex()[:10]
-
         # Fields values prepocessing
         # Addresses
         address_input = hop.pools_utils
@@ -489,21 +579,22 @@ class UniswapV2Encoder:
             # Get new min buy amount
             min_buy_amount = int(hex_new, 16)
 
-        # Field encoding
-        encodes = [
-            fields
-        ]
+        # sellToUniswap only routes through UniswapV2 or SushiSwap pairs
+        source = getattr(hop, 'source', None) or 'UniswapV2'
+        if source not in ('UniswapV2', 'SushiSwap'):
+            raise Exception(f"### ERROR: sellToUniswap does not support {source} pools.")
 
         # Encode parameters
-        encoded_args = eth_abi.encode_abi(types, [
-            address_input,          # tokens
-            int(hop.exec_sell_amount), # sellAmount
-            min_buy_amount,         # minBuyAmount
-            False                   # isSushi
-        ])
+        encoded_args = (
+            encode_uint256(4 * 32)                          # tokens offset
+            + encode_uint256(int(hop.exec_sell_amount))     # sellAmount
+            + encode_uint256(min_buy_amount)                # minBuyAmount
+            + encode_bool(source == 'SushiSwap')            # isSushi
+            + encode_array([encode_address(a) for a in address_input])     # tokens
+        )
 
         # Encoded function + paramters
-        calldata = function_signature + encoded_args.hex()
+        calldata = SELL_TO_UNISWAP_SELECTOR + encoded_args
 
         # Get input(s) for tx record
         inputs = list()
@@ -527,7 +618,8 @@ class UniswapV2Encoder:
     def _to_pool(
         self,
         token0,
-        token1
+        token1,
+        source = None
     ):
         '''
         Gets an UniV2 pool address from pool information. 
@@ -538,22 +630,25 @@ class UniswapV2Encoder:
         https://stackoverflow.com/questions/66710238/compute-uniswap-pair-address-via-python
         '''
         # NOTE:
-        # The function expects checksum adresses, not strings.
-        one_to_zero = False
-        if int(token0,16)<int(token1,16):
-            abiEncoded_1 = encode_abi_packed(['address', 'address'], (token0.lower(), token1.lower()))
-        else:
-            one_to_zero = True
-            abiEncoded_1 = encode_abi_packed(['address', 'address'], (token1.lower(), token0.lower() ))
+        # Token case does not matter. The pair address is computed once per
+        # pair (see get_pair_address) and the packed form once per direction.
+        token0 = token0.lower()
+        token1 = token1.lower()
 
-        salt = Web3.solidityKeccak(['bytes'], ['0x' + abiEncoded_1.hex()])
+        resPair = self._pool_cache.get((token0, token1, source))
+        if resPair is not None:
+            if METRICS_ENABLED:
+                increment('encoder.pool_cache_hits')
+            self._pool_cache.move_to_end((token0, token1, source))
+            return resPair
 
-        abiEncoded_2 = encode_abi_packed(['address', 'bytes32'], (self.factory_address, salt))
-        
-        resPair = Web3.solidityKeccak(['bytes','bytes'], ['0xff' + abiEncoded_2.hex(), self.pool_init_code_hash])[12:]
+        if METRICS_ENABLED:
+            increment('encoder.pool_cache_misses')
 
-        resPair = Web3.toChecksumAddress(resPair)
+        one_to_zero = not int(token0,16)<int(token1,16)
 
+        pair_address = self.get_pair_address(token0, token1, source)
+        numerator = _get_unoswap_numerator(FORKS['UniswapV2'] if source is None else get_fork(source, strict = True))
 
         if one_to_zero:
 
@@ -562,7 +657,7 @@ class UniswapV2Encoder:
             # hex component.
             # Source: https://dashboard.tenderly.co/felixjff/project/simulator/1752ed64-20a8-4634-98db-c0c8709c3310/debugger?trace=0.6.0
 
-            resPair = '0x' + '80000000000000003b6d0340' +  Web3.toChecksumAddress(resPair)[2:]
+            resPair = '0x' + '8000000000000000' + numerator + pair_address[2:]
         
         else:
 
@@ -571,10 +666,131 @@ class UniswapV2Encoder:
             # hex component.
             # Source: https://dashboard.tenderly.co/felixjff/project/simulator/f66546e6-47f8-40bf-afe7-aff195cfa82b/debugger?trace=0.8.0
 
-            resPair = '0x' + '00000000000000003b6d0340' +  Web3.toChecksumAddress(resPair)[2:]
+            resPair = '0x' + '0000000000000000' + numerator + pair_address[2:]
+
+        self._pool_cache[(token0, token1, source)] = resPair
+        if len(self._pool_cache) > self.pool_cache_size:
+            self._pool_cache.popitem(last = False)
 
         return resPair
 
+    def get_pair_address(
+        self,
+        tokenA,
+        tokenB,
+        source = None
+    ):
+        '''
+        Returns the checksum UniV2 pair address of two tokens, from the loaded
+        pair address table if present, otherwise computed (CREATE2) and cached.
+        With source, the pair of that fork's factory.
+        '''
+        tokenA = tokenA.lower()
+        tokenB = tokenB.lower()
+        if int(tokenB,16)<int(tokenA,16):
+            tokenA, tokenB = tokenB, tokenA
+
+        if source is not None:
+            fork = get_fork(source, strict = True)
+            if fork.factory_address.lower() != self.factory_address.lower():
+                return _compute_pair_address(fork.factory_address, fork.init_code_hash, tokenA, tokenB)
+
+        pair_address = self.pair_address_table.get((tokenA, tokenB))
+        if pair_address is not None:
+            return pair_address
+
+        return _compute_pair_address(self.factory_address, self.pool_init_code_hash, tokenA, tokenB)
+
+    def save_pair_address_table(
+        self,
+        path,
+        token_pairs
+    ):
+        '''
+        Precomputes the pair addresses of token_pairs (e.g. the tokens of the
+        known pool universe) and writes them to a JSON table.
+        '''
+        pairs = dict()
+        for tokenA, tokenB in token_pairs:
+            key = ','.join(sorted((tokenA.lower(), tokenB.lower()), key = lambda t: int(t,16)))
+            pairs[key] = self.get_pair_address(tokenA, tokenB)
+
+        table = {
+            'factory_address': self.factory_address,
+            'init_code_hash': self.pool_init_code_hash,
+            'pairs': pairs
+        }
+
+        with open(path, 'w') as f:
+            json.dump(table, f)
+
+    def load_pair_address_table(
+        self,
+        path
+    ):
+        '''
+        Loads a pair address table written by save_pair_address_table.
+        '''
+        with open(path) as f:
+            table = json.load(f)
+
+        if table['factory_address'].lower() != self.factory_address.lower() or table['init_code_hash'].lower() != self.pool_init_code_hash.lower():
+            raise Exception("### ERROR: Pair address table was computed for another factory.")
+
+        for key, pair_address in table['pairs'].items():
+            tokenA, tokenB = key.split(',')
+            self.pair_address_table[(tokenA, tokenB)] = pair_address
+
+        self._pool_cache.clear()
+
+
+def _encode_chunk(
+    encoder,
+    hops,
+    allowances,
+    pools = None
+):
+    '''
+    Encodes a chunk of UniswapV2Encoder.encode_batch, also the process pool
+    entry point.
+    '''
+    pools = pools or dict()
+    return [
+        encoder.encode_hop(hop, allowances, verbose = False, pool = pools.get(hop.pools_addresses[0]) if len(hop.pools_addresses) == 1 else None)
+        for hop in hops
+    ]
+
+
+@lru_cache(maxsize = 65536)
+def _get_unoswap_numerator(
+    fork
+):
+    '''
+    Returns the 8 hex digit fee numerator of a packed unoswap pool word, the
+    fee the pair charges over a 1e9 denominator (0x3b6d0340 for 997/1000).
+    '''
+    numerator, remainder = divmod(fork.pair_fee_numerator * 10**9, fork.pair_fee_denominator)
+    if remainder:
+        raise Exception(f"### ERROR: Fee of fork {fork.name} has no exact unoswap numerator.")
+
+    return '%08x' % numerator
+
+
+def _compute_pair_address(
+    factory_address,
+    init_code_hash,
+    tokenA,
+    tokenB
+):
+    '''
+    CREATE2 address of the pair of two sorted, lower case tokens.
+    '''
+    salt = keccak(bytes.fromhex(tokenA[2:] + tokenB[2:]))
+
+    resPair = keccak(b'\xff' + bytes.fromhex(factory_address[2:]) + salt + bytes.fromhex(init_code_hash[2:]))[12:]
+
+    return Web3.toChecksumAddress('0x' + resPair.hex())
+
 
 '''
 ### TESTS ###
@@ -621,6 +837,13 @@ Result:
 Success
 
 
+IV. Direct flash swap
+
+Description:
+The golden calldata of the direct single pool path and the pair's K check on
+the encoded amounts are executable tests, see tests/test_encoder.py.
+
+
 
 APPENDIX
 
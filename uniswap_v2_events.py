@@ -0,0 +1,240 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_abi import SYNC_TOPIC, SWAP_TOPIC
+import json
+
+'''
+Incremental reserve updates of Uniswap V2 pools from Sync and Swap event logs
+'''
+class UniswapV2EventProcessor:
+
+    def __init__(
+        self,
+        pools = None
+    ):
+
+        # (pool address) => pool, lower case addresses
+        self.pools = dict()
+        if pools is not None:
+            self.add_pools(pools)
+
+        # NOTE:
+        # changed holds pools whose reserves were updated from a Sync since the
+        # last get_changed call. stale holds pools whose reserves came from a
+        # removed (reorged) block, which need a full getReserves refresh, see
+        # get_stale_calls and refresh_stale.
+        self.changed = set()
+        self.stale = set()
+
+        # (pool address) => blockHash of the last applied Sync
+        self.sync_hashes = dict()
+
+        self.last_block = None
+
+    def add_pools(
+        self,
+        pools
+    ):
+        for pool in pools:
+            self.pools[pool.pool_address.lower()] = pool
+
+    def decode_sync(
+        self,
+        log
+    ):
+        '''
+            Returns (reserve0, reserve1) of a Sync log.
+        '''
+        data = log['data'][2:]
+
+        return int(data[0:64], 16), int(data[64:128], 16)
+
+    def decode_swap(
+        self,
+        log
+    ):
+        '''
+            Returns the decoded fields of a Swap log.
+        '''
+        data = log['data'][2:]
+
+        swap = {
+            'pool_address': log['address'].lower(),
+            'sender': '0x' + log['topics'][1][-40:],
+            'to': '0x' + log['topics'][2][-40:],
+            'amount0In': int(data[0:64], 16),
+            'amount1In': int(data[64:128], 16),
+            'amount0Out': int(data[128:192], 16),
+            'amount1Out': int(data[192:256], 16),
+            'block_number': log.get('blockNumber')
+        }
+
+        return swap
+
+    def process_log(
+        self,
+        log
+    ):
+        '''
+            Applies one log. Sync logs set the pool reserves (and mark its
+            reference_bids dirty), Swap logs are decoded and returned. Logs of
+            unknown pools or other events are ignored and return None.
+        '''
+
+        if not log.get('topics'):
+            return None
+
+        pool_address = log['address'].lower()
+        pool = self.pools.get(pool_address)
+        if pool is None:
+            return None
+
+        topic = log['topics'][0].lower()
+
+        if log.get('removed'):
+            # A pool is only stale if its reserves came from the removed block.
+            # Reserves of a Sync from another block (e.g. the new chain) hold.
+            # Without block hashes every removed Sync marks its pool stale.
+            if topic == SYNC_TOPIC:
+                block_hash = self.sync_hashes.get(pool_address)
+                if block_hash is None or log.get('blockHash') in (None, block_hash):
+                    self.stale.add(pool_address)
+            return None
+
+        block = log.get('blockNumber')
+        if block is not None:
+            block = int(block, 16) if isinstance(block, str) else block
+            if self.last_block is None or block > self.last_block:
+                self.last_block = block
+
+        if topic == SYNC_TOPIC:
+            reserve0, reserve1 = self.decode_sync(log)
+            pool.set_reserves(reserve0, reserve1)
+            self.changed.add(pool_address)
+            self.stale.discard(pool_address)
+            self.sync_hashes[pool_address] = log.get('blockHash')
+            return None
+
+        if topic == SWAP_TOPIC:
+            return self.decode_swap(log)
+
+        return None
+
+    def process_logs(
+        self,
+        logs
+    ) -> list:
+        '''
+            Applies logs in chain order and returns the decoded swaps.
+        '''
+
+        # NOTE:
+        # A log removed within the same batch cancels its original, which is
+        # then never applied. Removed logs go first, as the node sends them
+        # before the logs of the new chain. The last Sync of a pool in a block
+        # carries its final reserves, so the other logs are applied in
+        # (blockNumber, logIndex) order when available. Sorting before the
+        # cancellation would interleave the removed block with the new block
+        # of the same number.
+        removed = [log for log in logs if log.get('removed')]
+        if removed:
+            cancelled = {(l['blockHash'], l.get('logIndex')) for l in removed if l.get('blockHash')}
+            logs = removed + [
+                log for log in logs
+                if not log.get('removed') and (log.get('blockHash'), log.get('logIndex')) not in cancelled
+            ]
+
+        if logs and 'logIndex' in logs[-1] and 'blockNumber' in logs[-1]:
+            logs = removed + sorted(logs[len(removed):], key = lambda l: (_to_int(l['blockNumber']), _to_int(l['logIndex'])))
+
+        swaps = list()
+        for log in logs:
+            swap = self.process_log(log)
+            if swap is not None:
+                swaps.append(swap)
+
+        return swaps
+
+    def process_receipts(
+        self,
+        receipts
+    ) -> list:
+        '''
+            Applies the logs of transaction receipts.
+        '''
+        logs = [log for receipt in receipts for log in receipt['logs']]
+
+        return self.process_logs(logs)
+
+    def process_rpc_data(
+        self,
+        data
+    ):
+        '''
+            Applies the result of a get_logs_call response.
+        '''
+        if data['attribute'] == 'logs' and data['result'] is not None:
+            return self.process_logs(data['result'])
+
+        raise Exception("### ERROR: Uknown rpc data attribute for Uni v2 events")
+
+    def replay_log_file(
+        self,
+        path
+    ) -> list:
+        '''
+            Replays logs recorded in a file, either a JSON list of logs or one
+            JSON log per line.
+        '''
+        with open(path) as f:
+            content = f.read().strip()
+
+        if content.startswith('['):
+            logs = json.loads(content)
+        else:
+            logs = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+        return self.process_logs(logs)
+
+    def get_changed(
+        self
+    ) -> list:
+        '''
+            Returns the pools changed since the last call and resets the set.
+        '''
+        changed = [self.pools[a] for a in self.changed]
+        self.changed = set()
+
+        return changed
+
+    def get_stale_calls(
+        self
+    ) -> list:
+        '''
+            Returns (pool_address, getReserves call) of the stale pools. The
+            result of each call goes to refresh_stale.
+        '''
+        return [(a, call) for a in sorted(self.stale) for call in self.pools[a].get_state_calls()]
+
+    def refresh_stale(
+        self,
+        pool_address,
+        data
+    ):
+        '''
+            Applies a getReserves result (as in process_balances_call) to a
+            pool, clears it from stale and marks it changed.
+        '''
+        pool_address = pool_address.lower()
+        self.pools[pool_address].process_balances_call(data)
+
+        # NOTE:
+        # The refreshed reserves are not tied to a Sync, so any later removed
+        # Sync of the pool marks it stale again.
+        self.sync_hashes.pop(pool_address, None)
+        self.stale.discard(pool_address)
+        self.changed.add(pool_address)
+
+
+def _to_int(
+    value
+):
+    return int(value, 16) if isinstance(value, str) else value
@@ -0,0 +1,92 @@
+from typing import NamedTuple
+
+'''
+Uniswap V2 fork parameters, keyed by pool['source']
+'''
+class UniswapV2Fork(NamedTuple):
+    name: str
+    # Fee the pair charges, as fee_numerator / fee_denominator of the amount
+    # in that is kept
+    fee_numerator: int
+    fee_denominator: int
+    factory_address: str
+    init_code_hash: str
+    router_address: str
+    # Fee enforced by the pair contract's K check in swap(), the bound for
+    # amounts requested by direct pool swaps
+    pair_fee_numerator: int = 997
+    pair_fee_denominator: int = 1000
+
+
+# NOTE:
+# Pricing fees are the fees the pair contracts enforce, so quotes match what
+# swap() pays out. A venue charging another fee is its own fork, e.g.
+# PancakeSwapV2 at 9975/10000. Forks sharing a fee share a batch in
+# UniswapV2Quoter.get_amount_out_pools.
+FORKS = {
+    'UniswapV2': UniswapV2Fork(
+        name = 'UniswapV2',
+        fee_numerator = 997,
+        fee_denominator = 1000,
+        factory_address = '0x5C69bEe701ef814a2B6a3EDD4B1652CB9cc5aA6f',
+        init_code_hash = '0x96e8ac4277198ff8b6f785478aa9a39f403cb768dd02cbee326c3e7da348845f',
+        router_address = '0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D'
+    ),
+    'SushiSwap': UniswapV2Fork(
+        name = 'SushiSwap',
+        fee_numerator = 997,
+        fee_denominator = 1000,
+        factory_address = '0xC0AEe478e3658e2610c5F7A4A2E1777cE9e4f2Ac',
+        init_code_hash = '0xe18a34eb0e04b04f7a0ac29a6e80748dca96319b42c54d679cb821dca90c6303',
+        router_address = '0xd9e1cE17f2641f24aE83637ab66a2cca9C378B9F'
+    ),
+    'PancakeSwapV2': UniswapV2Fork(
+        name = 'PancakeSwapV2',
+        fee_numerator = 9975,
+        fee_denominator = 10000,
+        factory_address = '0x1097053Fd2ea711dad45caCcc45EfF7548fCB362',
+        init_code_hash = '0x57224589c67f3f30a6b0d7a1b54cf3153ab84563bc609ef41dfb34f8b2974d2d',
+        router_address = '0xEfF92A263d31888d860bD50809A8D171709b7b1c',
+        pair_fee_numerator = 9975,
+        pair_fee_denominator = 10000
+    )
+}
+
+
+# Unknown sources already warned about by get_fork
+_unknown_sources = set()
+
+
+def get_fork(
+    source,
+    strict = False
+):
+    '''
+        Returns the UniswapV2Fork of a pool source. Unknown sources get the
+        UniswapV2 fork, with a warning once per source, unless strict.
+    '''
+    fork = FORKS.get(source)
+    if fork is not None:
+        return fork
+
+    # NOTE:
+    # Pools of any source used to quote at the default fee, so subgraph or
+    # cache rows with a new source label still load and quote. Callers that
+    # derive addresses from the fork (e.g. pair addresses) pass strict.
+    if strict:
+        raise Exception(f"### ERROR: Unknown Uniswap V2 fork {source}, register it with add_fork.")
+
+    if source not in _unknown_sources:
+        _unknown_sources.add(source)
+        print(f"### WARNING: Unknown Uniswap V2 fork {source}, using UniswapV2 parameters. Register it with add_fork.")
+
+    return FORKS['UniswapV2']
+
+
+def add_fork(
+    fork
+):
+    '''
+        Registers a UniswapV2Fork, pools with source fork.name use it.
+    '''
+    FORKS[fork.name] = fork
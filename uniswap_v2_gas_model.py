@@ -0,0 +1,136 @@
+'''
+Offline gas estimation of the Uniswap V2 encoding paths
+'''
+class UniswapV2GasModel:
+
+    def __init__(
+        self
+    ):
+
+        # NOTE:
+        # Execution gas is modeled as base + per_hop * nr_hops, calldata gas as
+        # 16 per non-zero byte and 4 per zero byte (EIP-2028). per_hop covers one
+        # pair swap (output transfer, reserve update, Sync/Swap events).
+        # Relative costs follow the simulations recorded in the encoder notes:
+        # 1inch unoswap is cheaper than sellToUniswap, and calling
+        # sellToUniswap through the ZeroEx proxy costs ~6k more than directly.
+        self.per_hop = 60000
+
+        self.base = {
+            # input transfer to the pool + swap, as two interactions
+            'uniswap_v2': 36000,
+            # unoswap: transferFrom into the first pool + dispatch
+            '1inch': 38000,
+            # same contract logic as 1inch
+            'otex': 38000,
+            # sellToUniswap (~3k above unoswap) through the proxy (~6k)
+            'zeroex': 47000
+        }
+
+        # Maximum number of hops per target
+        self.max_hops = {
+            'uniswap_v2': 1
+        }
+
+        self.calldata_zero_gas = 4
+        self.calldata_nonzero_gas = 16
+
+        # Typical (non-zero, zero) bytes of calldata words
+        self._selector = (4, 0)
+        self._word_address = (20, 12)
+        self._word_amount = (14, 18)
+        self._word_small = (1, 31)
+        self._word_pool = (24, 8)
+
+    def calldata_gas(
+        self,
+        calldata
+    ):
+        '''
+            Exact calldata gas of a '0x' prefixed hex calldata.
+        '''
+        data = bytes.fromhex(calldata[2:])
+        zeros = data.count(0)
+
+        return zeros * self.calldata_zero_gas + (len(data) - zeros) * self.calldata_nonzero_gas
+
+    def get_calldata_layout(
+        self,
+        target,
+        nr_hops
+    ) -> list:
+        '''
+            Returns the (non-zero, zero) bytes of each calldata part of a target.
+        '''
+
+        if target in ('1inch', 'otex'):
+            # unoswap(srcToken, amount, minReturn, pools)
+            return [self._selector, self._word_address, self._word_amount, self._word_amount,
+                    self._word_small, self._word_small] + [self._word_pool] * nr_hops
+
+        if target == 'zeroex':
+            # sellToUniswap(tokens, sellAmount, minBuyAmount, isSushi)
+            return [self._selector, self._word_small, self._word_amount, self._word_amount,
+                    self._word_small, self._word_small] + [self._word_address] * (nr_hops + 1)
+
+        if target == 'uniswap_v2':
+            # transfer(to, value) + swap(amount0Out, amount1Out, to, data)
+            return [self._selector, self._word_address, self._word_amount,
+                    self._selector, self._word_amount, self._word_small, self._word_address,
+                    self._word_small, self._word_small]
+
+        raise Exception(f"### ERROR: Unknown gas model target {target}.")
+
+    def estimate(
+        self,
+        target,
+        nr_hops,
+        calldata = None
+    ):
+        '''
+            Estimated gas of a target for nr_hops pools. calldata ('0x' hex, or a
+            list of them for multiple interactions) gives exact calldata gas,
+            otherwise the target's static layout is used. Returns None if the
+            target cannot execute nr_hops.
+        '''
+
+        if not self.can_execute(target, nr_hops):
+            return None
+
+        gas = self.base[target] + self.per_hop * nr_hops
+
+        if calldata is None:
+            for nonzero, zero in self.get_calldata_layout(target, nr_hops):
+                gas += nonzero * self.calldata_nonzero_gas + zero * self.calldata_zero_gas
+        elif isinstance(calldata, (list, tuple)):
+            gas += sum(self.calldata_gas(c) for c in calldata)
+        else:
+            gas += self.calldata_gas(calldata)
+
+        return gas
+
+    def can_execute(
+        self,
+        target,
+        nr_hops
+    ):
+        '''
+            True if target is modeled and can execute nr_hops pools.
+        '''
+        return target in self.base and nr_hops <= self.max_hops.get(target, nr_hops)
+
+    def rank(
+        self,
+        targets,
+        nr_hops,
+        calldata = None
+    ) -> list:
+        '''
+            Returns the targets able to execute nr_hops, cheapest first. Ties
+            keep the order of targets. calldata is an optional (target) =>
+            calldata dict of the encoded candidates, see estimate.
+        '''
+        calldata = calldata or dict()
+        estimates = [(self.estimate(t, nr_hops, calldata.get(t)), i, t) for i, t in enumerate(targets) if t in self.base]
+
+        return [t for gas, _, t in sorted(e for e in estimates if e[0] is not None)]
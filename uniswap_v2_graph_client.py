@@ -0,0 +1,217 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_helper import UniswapV2Helper
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_rpc import UniswapV2HttpClient, UniswapV2AsyncHttpClient
+import asyncio
+import time
+
+'''
+Uniswap V2 Helper with an asyncio client for subgraph queries
+'''
+class UniswapV2AsyncHelper(UniswapV2Helper):
+
+    def __init__(
+        self,
+        graph_endpoint = None,
+        http_client = None,
+        async_http_client = None,
+        concurrency = 4,
+        retries = 3,
+        backoff = 0.5,
+        max_pending = 5000
+    ):
+
+        super().__init__()
+
+        if graph_endpoint is not None:
+            self.graph_endpoint = graph_endpoint
+
+        # NOTE:
+        # concurrency bounds the pages in flight, retries/backoff apply per page
+        # and max_pending bounds parsed pools not yet consumed (backpressure).
+        # The blocking methods (execute_query, iter_pools) use http_client,
+        # the coroutines use async_http_client, so pages are fetched
+        # concurrently on the event loop without threads.
+        self.http_client = http_client or UniswapV2HttpClient(max_connections = concurrency)
+        self.async_http_client = async_http_client or UniswapV2AsyncHttpClient(max_connections = concurrency)
+        self.owns_async_http_client = async_http_client is None
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_pending = max_pending
+
+        # Discovery state for cursor paging and incremental re-sync
+        self.cursor = ''
+        self.last_block = None
+
+    def execute_query(
+        self,
+        query
+    ):
+        '''
+            Blocking version of fetch_query.
+        '''
+
+        for attempt in range(self.retries + 1):
+            try:
+                resp = self.http_client.post(query['url'], {'query': query['query']})
+                if 'errors' in resp or 'data' not in resp:
+                    raise Exception(f"### ERROR: Subgraph query failed: {resp.get('errors')}")
+
+                return resp['data']
+
+            except Exception:
+                if attempt == self.retries:
+                    raise
+
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def iter_pools(
+        self,
+        cursor = '',
+        created_after_block = None,
+        page_size = 1000
+    ):
+        '''
+            Generator over all pools as UniswapV2Pool objects, paging by id
+            cursor. Only one page is held in memory at a time. self.cursor and
+            self.last_block are updated as pages are consumed.
+        '''
+
+        while True:
+            query = self.get_pools_cursor_query(
+                                    cursor = cursor,
+                                    first = page_size,
+                                    created_after_block = created_after_block
+                                )
+
+            pairs = self.execute_query(query)['pairs']
+
+            for resp in pairs:
+                block = resp.get('createdAtBlockNumber')
+                if block is not None and (self.last_block is None or int(block) > self.last_block):
+                    self.last_block = int(block)
+
+                yield UniswapV2Pool(self.parse_pool_query(resp))
+
+            if pairs:
+                cursor = pairs[-1]['id']
+                self.cursor = cursor
+
+            if len(pairs) < page_size:
+                break
+
+    def resync(
+        self,
+        page_size = 1000
+    ):
+        '''
+            Generator over pools created since the last discovery.
+        '''
+
+        # NOTE:
+        # Pair ids are CREATE2 addresses, so new pairs do not sort after the
+        # id cursor. New pairs are selected by creation block instead and paged
+        # by id from the start.
+
+        if self.last_block is None:
+            return self.iter_pools(page_size = page_size)
+
+        return self.iter_pools(created_after_block = self.last_block, page_size = page_size)
+
+    async def fetch_query(
+        self,
+        query
+    ):
+        '''
+            Executes a GraphQL query dict (as returned by get_pools_query) and
+            returns the response data. Retries with exponential backoff on
+            transport or GraphQL errors.
+        '''
+
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self.async_http_client.post(query['url'], {'query': query['query']})
+                if 'errors' in resp or 'data' not in resp:
+                    raise Exception(f"### ERROR: Subgraph query failed: {resp.get('errors')}")
+
+                return resp['data']
+
+            except Exception:
+                if attempt == self.retries:
+                    raise
+
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def stream_pools(
+        self,
+        queries = None
+    ):
+        '''
+            Fetches the pages of queries (get_pools_query by default) concurrently
+            and yields pools parsed with parse_pool_query as pages arrive.
+        '''
+
+        queries = self.get_pools_query() if queries is None else queries
+
+        done = object()
+        pending = asyncio.Queue(maxsize = self.max_pending)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_page(query):
+            async with semaphore:
+                data = await self.fetch_query(query)
+
+            for resp in data['pairs']:
+                await pending.put(self.parse_pool_query(resp))
+
+        async def fetch_all(tasks):
+            # Page errors are passed to the consumer once retries are exhausted
+            try:
+                await asyncio.gather(*tasks)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await pending.put(e)
+            else:
+                await pending.put(done)
+
+        tasks = [asyncio.ensure_future(fetch_page(q)) for q in queries]
+        runner = asyncio.ensure_future(fetch_all(tasks))
+
+        try:
+            while True:
+                pool = await pending.get()
+                if pool is done:
+                    break
+                if isinstance(pool, Exception):
+                    raise pool
+
+                yield pool
+
+        finally:
+            for task in tasks + [runner]:
+                if not task.done():
+                    task.cancel()
+
+    async def get_pools(
+        self,
+        queries = None
+    ) -> list:
+        '''
+            Returns all pools of queries, fetched concurrently. Closes the
+            async HTTP client the helper created, as get_pools is usually the
+            whole lifetime of its event loop (asyncio.run).
+        '''
+        try:
+            return [pool async for pool in self.stream_pools(queries)]
+        finally:
+            if self.owns_async_http_client:
+                await self.async_http_client.close()
+
+    async def close(
+        self
+    ):
+        '''
+            Closes the async HTTP client, call before the event loop ends.
+        '''
+        await self.async_http_client.close()
@@ -1,3 +1,9 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_abi import (
+    GET_RESERVES_SELECTOR, GET_AMOUNTS_OUT_SELECTOR, AGGREGATE3_SELECTOR, SYNC_TOPIC, SWAP_TOPIC,
+    encode_uint256, encode_address, encode_array
+)
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_forks import get_fork
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_metrics import ENABLED as METRICS_ENABLED, increment, timed
 from eth_abi.packed import encode_abi_packed
 import eth_abi
 from web3 import Web3
@@ -14,7 +20,9 @@ class UniswapV2Helper:
         self
     ):
 
-        self.router_address = '0xEfF92A263d31888d860bD50809A8D171709b7b1c'
+        # Router of pools without a source, other forks use their own
+        self.router_address = get_fork('UniswapV2').router_address
+        self.multicall_address = '0xcA11bde05977b3631167028862bE2a173976CA11'
 
         # Dependencies
         self.graph_endpoint = "https://api.thegraph.com/subgraphs/name/Uniswap/exhange-eth"
@@ -48,6 +56,35 @@ class UniswapV2Helper:
         
         return queries
 
+    def get_pools_cursor_query(
+        self,
+        cursor = '',
+        first = 1000,
+        created_after_block = None
+    ):
+        '''
+            Returns the query for the page of pools after cursor, ordered by id.
+            With created_after_block, only pools created after that block.
+        '''
+
+        # NOTE:
+        # Pages by id_gt cursor instead of skip, so that the indexer cost per
+        # page is constant and the whole pair universe can be paged.
+
+        where = '''id_gt:"''' + cursor + '''"'''
+        if created_after_block is not None:
+            where += ''',createdAtBlockNumber_gt:''' + str(created_after_block)
+
+        query = '''{pairs(first:''' + str(first) + ''',orderBy:id,orderDirection:asc,where:{''' + where + '''}){id,token0{id},token1{id},createdAtBlockNumber}}'''
+
+        query_ = {
+            'url': self.graph_endpoint,
+            'query': query,
+            'source': 'UniswapV2'
+        }
+
+        return query_
+
     def get_pair_pools_query(
         self,
         token0,
@@ -86,6 +123,7 @@ class UniswapV2Helper:
     ##    RPC EXECUTION FUNCTION     ##
     ###                             ###
 
+    @timed('helper.process_amounts_out_call')
     def process_amounts_out_call(
         self,
         data
@@ -97,12 +135,15 @@ class UniswapV2Helper:
         return decoded_result
     
     
+    @timed('helper.process_balances_call')
     def process_balances_call(
         self,
         data
     ):
         # Decode hex response
         if data == '0x':
+            if METRICS_ENABLED:
+                increment('helper.empty_balances')
             return [0,0]
             
         decoded_result = eth_abi.decode_abi(['uint112', 'uint112', 'uint32'], bytes.fromhex(data[2:]))
@@ -110,15 +151,125 @@ class UniswapV2Helper:
         # Modify step info 
         return decoded_result
     
+    @timed('helper.get_balances_call')
     def get_balances_call(
         self,
-        pool_address
+        pool_address,
+        request_id = 1
     ):
 
         data = self._get_balances_call()
 
         params = {
-                    "jsonrpc": "2.0", "id": 1, "method": "eth_call", 
+                    "jsonrpc": "2.0", "id": request_id, "method": "eth_call", 
+                    "params": [
+                        {
+                            "to": pool_address,
+                            "data": data
+                        },
+                        "latest"
+                    ]}
+
+        url = {'url': rpc, 'params': params, 'query_type': 'post', 'request_type': 'fill_data', 'attribute': 'balances'}
+
+        return url
+
+    @timed('helper.process_reserves_multicall')
+    def process_reserves_multicall(
+        self,
+        data
+    ):
+        '''
+        Decodes an aggregate3 response of getReserves calls into reserve lists
+        aligned with the calls. Failed calls, like '0x' in process_balances_call,
+        get reserves 0 and success False.
+        '''
+
+        # Decode hex response
+        decoded_result = eth_abi.decode_abi(['(bool,bytes)[]'], bytes.fromhex(data[2:]))[0]
+
+        reserves0 = list()
+        reserves1 = list()
+        success = list()
+        for ok, return_data in decoded_result:
+            # NOTE:
+            # getReserves returns three static words, so reserves are read
+            # straight from the return data without a second decode.
+            if ok and len(return_data) >= 96:
+                reserves0.append(int.from_bytes(return_data[0:32], 'big'))
+                reserves1.append(int.from_bytes(return_data[32:64], 'big'))
+                success.append(True)
+            else:
+                reserves0.append(0)
+                reserves1.append(0)
+                success.append(False)
+
+        return reserves0, reserves1, success
+
+    @timed('helper.get_reserves_multicall_call')
+    def get_reserves_multicall_call(
+        self,
+        pool_addresses,
+        request_id = 1
+    ):
+        '''
+        Returns a single eth_call to Multicall3 aggregate3 that fetches
+        getReserves of all pools. Failing pools do not revert the call.
+        '''
+
+        data = self._get_reserves_multicall_call(pool_addresses = pool_addresses)
+
+        params = {
+                    "jsonrpc": "2.0", "id": request_id, "method": "eth_call", 
+                    "params": [
+                        {
+                            "to": self.multicall_address,
+                            "data": data
+                        },
+                        "latest"
+                    ]}
+
+        url = {'url': rpc, 'params': params, 'query_type': 'post', 'request_type': 'fill_data', 'attribute': 'multicall_balances'}
+
+        return url
+
+    def _get_reserves_multicall_call(
+        self,
+        pool_addresses
+    ):
+        '''
+        Low level call encoding to aggregate3 with getReserves calls
+        '''
+
+        types = ['(address,bool,bytes)[]']
+
+        call_data = bytes.fromhex(self._get_balances_call()[2:])
+
+        # (target, allowFailure, callData)
+        calls = [(Web3.toChecksumAddress(a), True, call_data) for a in pool_addresses]
+
+        encoded_args = eth_abi.encode_abi(types, [calls])
+
+        data = AGGREGATE3_SELECTOR + encoded_args.hex()
+
+        return data
+
+    @timed('helper.get_balances_batch_call')
+    def get_balances_batch_call(
+        self,
+        pool_addresses,
+        start_id = 1
+    ):
+        '''
+        Returns a JSON-RPC batch of getReserves calls, one per pool, with
+        unique ids start_id, start_id + 1, ... aligned with pool_addresses.
+        '''
+
+        data = self._get_balances_call()
+
+        params = [
+                    {
+                    "jsonrpc": "2.0", "id": start_id + i, "method": "eth_call", 
                     "params": [
                         {
                             "to": pool_address,
@@ -126,6 +277,8 @@ class UniswapV2Helper:
                         },
                         "latest"
                     ]}
+                    for i, pool_address in enumerate(pool_addresses)
+                ]
 
         url = {'url': rpc, 'params': params, 'query_type': 'post', 'request_type': 'fill_data', 'attribute': 'balances'}
 
@@ -138,26 +291,48 @@ class UniswapV2Helper:
         Low level call encoding to getReserves
         '''
 
-        function_definition = f'getReserves()'
-        function_signature = Web3.keccak(text=function_definition).hex()[:10]
-        
-        encodes = [
-            
-        ]
-
-        encoded_args = eth_abi.encode_abi([], [])
-
-        data = function_signature + encoded_args.hex()
+        # NOTE:
+        # getReserves has no arguments, so the call data is the selector.
+        data = GET_RESERVES_SELECTOR
 
         return data  
     
+    def get_logs_call(
+        self,
+        from_block,
+        to_block = 'latest',
+        pool_addresses = None,
+        request_id = 1
+    ):
+        '''
+        Returns an eth_getLogs call for Sync and Swap events of pools (all
+        pools if pool_addresses is None) between two blocks.
+        '''
+
+        log_filter = {
+            "fromBlock": hex(from_block) if isinstance(from_block, int) else from_block,
+            "toBlock": hex(to_block) if isinstance(to_block, int) else to_block,
+            "topics": [[SYNC_TOPIC, SWAP_TOPIC]]
+        }
+        if pool_addresses is not None:
+            log_filter["address"] = list(pool_addresses)
+
+        params = {"jsonrpc": "2.0", "id": request_id, "method": "eth_getLogs", "params": [log_filter]}
+
+        url = {'url': rpc, 'params': params, 'query_type': 'post', 'request_type': 'fill_data', 'attribute': 'logs'}
+
+        return url
+
+    @timed('helper.get_best_bid_call')
     def get_best_bid_call(
         self,
         amount_in,
-        path
+        path,
+        source = None
     ):
         '''
-        Returns the amounts out from a UniV3 path
+        Returns the amounts out from a UniV3 path. With source, the call goes to
+        the router of that fork.
         '''
 
         data = self._get_amounts_out_call(
@@ -169,7 +344,7 @@ class UniswapV2Helper:
                     "jsonrpc": "2.0", "id": 1, "method": "eth_call", 
                     "params": [
                         {
-                            "to": self.router_address,
+                            "to": self._get_router_address(source),
                             "data": data
                         },
                         "latest"
@@ -180,13 +355,16 @@ class UniswapV2Helper:
         return url
 
 
+    @timed('helper.get_amounts_out_call')
     def get_amounts_out_call(
         self,
         amount_in,
-        path
+        path,
+        source = None
     ):
         '''
-        Returns the amounts out from a UniV3 path
+        Returns the amounts out from a UniV3 path. With source, the call goes to
+        the router of that fork.
         '''
 
         data = self._get_amounts_out_call(
@@ -198,7 +376,7 @@ class UniswapV2Helper:
                     "jsonrpc": "2.0", "id": 1, "method": "eth_call", 
                     "params": [
                         {
-                            "to": self.router_address,
+                            "to": self._get_router_address(source),
                             "data": data
                         },
                         "latest"
@@ -208,6 +386,15 @@ class UniswapV2Helper:
 
         return url
 
+    def _get_router_address(
+        self,
+        source
+    ):
+        if source is None:
+            return self.router_address
+
+        return get_fork(source).router_address
+
     def _get_amounts_out_call(
         self,
         amount_in,
@@ -216,21 +403,13 @@ class UniswapV2Helper:
         '''
         Low level call encoding to getAmounts
         '''
-        types = ['uint256', 'address[]']
-
-        fields = f'{",".join(types)}'
-        function_definition = f'getAmountsOut({fields})'
-        function_signature = Web3.keccak(text=function_definition).hex()[:10]
-        
-        encodes = [
-            fields
-        ]
-
-        encoded_args = eth_abi.encode_abi(types, [
-            amount_in,
-            path
-        ])
-
-        data = function_signature + encoded_args.hex()
+        # (amountIn, path)
+        encoded_args = (
+            encode_uint256(amount_in)
+            + encode_uint256(2 * 32)        # path offset
+            + encode_array([encode_address(a) for a in path])
+        )
+
+        data = GET_AMOUNTS_OUT_SELECTOR + encoded_args
 
         return data
\ No newline at end of file
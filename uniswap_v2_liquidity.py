@@ -0,0 +1,177 @@
+'''
+Liquidity depth index of Uniswap V2 pools, normalized to a reference token
+'''
+class UniswapV2LiquidityIndex:
+
+    def __init__(
+        self,
+        reference_token,
+        min_depth = 0,
+        pools = None
+    ):
+
+        # NOTE:
+        # Tokens are priced in reference token units (raw amounts, so token
+        # decimals cancel out) by walking the pool graph outwards from the
+        # reference token, each token priced through its deepest pool to an
+        # already priced token. The depth of a pool is the smaller value of
+        # its two reserves, times two. Pools below min_depth get
+        # has_liquidity = False, which the router and the quoter skip.
+        # Prices are rebuilt with update_prices, depths of changed pools are
+        # refreshed with update.
+        self.reference_token = reference_token.lower()
+        self.min_depth = min_depth
+
+        # (pool address) => pool, (token) => [pools], lower case
+        self.pools = dict()
+        self.token_pools = dict()
+
+        # (token) => price in reference token units, (pool address) => depth
+        self.prices = dict()
+        self.depths = dict()
+
+        if pools is not None:
+            self.add_pools(pools)
+            self.rebuild()
+
+    def __len__(
+        self
+    ):
+        return len(self.pools)
+
+    def add_pools(
+        self,
+        pools
+    ):
+        for pool in pools:
+            pool_address = pool.pool_address.lower()
+            if pool_address in self.pools:
+                continue
+
+            self.pools[pool_address] = pool
+            for token in (pool.token0.lower(), pool.token1.lower()):
+                self.token_pools.setdefault(token, list()).append(pool)
+
+    def update_prices(
+        self
+    ):
+        '''
+            Reprices all tokens reachable from the reference token.
+        '''
+
+        prices = {self.reference_token: 1.0}
+        frontier = [self.reference_token]
+
+        while frontier:
+
+            # (token) => (depth of the priced side, price)
+            candidates = dict()
+            for token in frontier:
+                price = prices[token]
+                for pool in self.token_pools.get(token, ()):
+                    if not pool.reserve0 or not pool.reserve1:
+                        continue
+
+                    if pool.token0.lower() == token:
+                        other, reserve, reserve_other = pool.token1.lower(), pool.reserve0, pool.reserve1
+                    else:
+                        other, reserve, reserve_other = pool.token0.lower(), pool.reserve1, pool.reserve0
+
+                    if other in prices:
+                        continue
+
+                    depth = reserve * price
+                    if other not in candidates or depth > candidates[other][0]:
+                        candidates[other] = (depth, price * reserve / reserve_other)
+
+            for token, (_, price) in candidates.items():
+                prices[token] = price
+            frontier = list(candidates.keys())
+
+        self.prices = prices
+
+    def get_depth(
+        self,
+        pool
+    ):
+        '''
+            Depth of a pool in reference token units, 0 if it has no reserves
+            or its tokens are not priced.
+        '''
+        if not pool.reserve0 or not pool.reserve1:
+            return 0.0
+
+        price0 = self.prices.get(pool.token0.lower())
+        price1 = self.prices.get(pool.token1.lower())
+        if price0 is None or price1 is None:
+            return 0.0
+
+        return 2 * min(pool.reserve0 * price0, pool.reserve1 * price1)
+
+    def update(
+        self,
+        pools = None
+    ) -> int:
+        '''
+            Refreshes the depth and has_liquidity flag of changed pools (all
+            pools by default), e.g. after a reserve refresh or
+            UniswapV2EventProcessor.get_changed. Returns the number of pools
+            whose flag changed.
+        '''
+        if pools is None:
+            pools = self.pools.values()
+
+        flipped = 0
+        for pool in pools:
+            pool_address = pool.pool_address.lower()
+            if pool_address not in self.pools:
+                continue
+
+            depth = self.get_depth(pool)
+            self.depths[pool_address] = depth
+
+            has_liquidity = depth >= self.min_depth
+            if pool.has_liquidity != has_liquidity:
+                pool.has_liquidity = has_liquidity
+                flipped += 1
+
+        return flipped
+
+    def rebuild(
+        self
+    ) -> int:
+        '''
+            Reprices tokens and refreshes all depths.
+        '''
+        self.update_prices()
+
+        return self.update()
+
+    def set_min_depth(
+        self,
+        min_depth
+    ) -> int:
+        self.min_depth = min_depth
+
+        return self.update()
+
+    def get_ranked(
+        self,
+        n = None
+    ) -> list:
+        '''
+            Returns (pool, depth) of the n deepest pools, deepest first.
+        '''
+        ranked = sorted(self.depths.items(), key = lambda d: d[1], reverse = True)
+        if n is not None:
+            ranked = ranked[:n]
+
+        return [(self.pools[pool_address], depth) for pool_address, depth in ranked]
+
+    def get_liquid_pools(
+        self
+    ) -> list:
+        '''
+            Returns the pools at or above min_depth.
+        '''
+        return [pool for pool in self.pools.values() if pool.has_liquidity]
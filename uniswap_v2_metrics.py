@@ -0,0 +1,275 @@
+import functools
+import json
+import os
+import time
+
+# NOTE:
+# Instrumentation is compiled in at import time: with UNISWAP_V2_METRICS
+# unset (or '0') timed returns the decorated function itself, so disabled
+# instrumentation costs nothing on the hot path, not even a flag check.
+# Counters at call sites are guarded by `if ENABLED:`. Metrics are per
+# process, worker processes (UniswapV2QuoteWorkerPool, encode_batch) keep
+# their own.
+ENABLED = os.environ.get('UNISWAP_V2_METRICS', '0') not in ('', '0')
+
+# Latency buckets: bucket 0 is < 1 us, bucket k is [2^(k-1), 2^k) us, the
+# last bucket takes everything above ~16 s.
+NR_BUCKETS = 26
+
+
+'''
+Latency histogram with log2 microsecond buckets
+'''
+class UniswapV2Histogram:
+
+    __slots__ = ('count', 'errors', 'total', 'max', 'buckets')
+
+    def __init__(
+        self
+    ):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * NR_BUCKETS
+
+    def observe(
+        self,
+        seconds
+    ):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+        bucket = int(seconds * 1e6).bit_length()
+        self.buckets[bucket if bucket < NR_BUCKETS else NR_BUCKETS - 1] += 1
+
+    def get_percentile(
+        self,
+        q
+    ):
+        '''
+            Upper bound in microseconds of the bucket holding the q quantile
+            (0 < q <= 1), 0 without observations.
+        '''
+        if not self.count:
+            return 0
+
+        rank = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return 2 ** bucket
+
+        return 2 ** (NR_BUCKETS - 1)
+
+    def to_dict(
+        self
+    ):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_s': self.total,
+            'mean_us': self.total / self.count * 1e6 if self.count else 0,
+            'p50_us': self.get_percentile(0.5),
+            'p99_us': self.get_percentile(0.99),
+            'max_us': self.max * 1e6,
+            'buckets': list(self.buckets)
+        }
+
+
+'''
+Counters and latency histograms of the Uniswap V2 hot paths
+'''
+class UniswapV2Metrics:
+
+    def __init__(
+        self
+    ):
+
+        # (name) => int, (name) => UniswapV2Histogram
+        self.counters = dict()
+        self.histograms = dict()
+
+        # Callables taking the get_snapshot dict. Nothing is exported on the
+        # hot path, the owner calls export (e.g. once per block).
+        self.sinks = list()
+
+    def add_sink(
+        self,
+        sink
+    ):
+        self.sinks.append(sink)
+
+    def remove_sink(
+        self,
+        sink
+    ):
+        self.sinks.remove(sink)
+
+    def get_histogram(
+        self,
+        name
+    ):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = UniswapV2Histogram()
+
+        return histogram
+
+    def increment(
+        self,
+        name,
+        n = 1
+    ):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(
+        self,
+        name,
+        seconds
+    ):
+        self.get_histogram(name).observe(seconds)
+
+    def get_snapshot(
+        self
+    ) -> dict:
+        return {
+            'time': time.time(),
+            'pid': os.getpid(),
+            'counters': dict(self.counters),
+            'histograms': {name: h.to_dict() for name, h in self.histograms.items()}
+        }
+
+    def reset(
+        self
+    ):
+        # Histograms are reset in place, instrumented functions hold them
+        self.counters = dict()
+        for histogram in self.histograms.values():
+            histogram.count = 0
+            histogram.errors = 0
+            histogram.total = 0.0
+            histogram.max = 0.0
+            histogram.buckets[:] = [0] * NR_BUCKETS
+
+    def export(
+        self,
+        reset = False
+    ) -> dict:
+        '''
+            Sends a snapshot to every sink and returns it. With reset, the
+            next snapshot only covers what happens after this one.
+        '''
+        snapshot = self.get_snapshot()
+        for sink in self.sinks:
+            sink(snapshot)
+
+        if reset:
+            self.reset()
+
+        return snapshot
+
+
+def print_sink(
+    snapshot
+):
+    '''
+        Prints one line per histogram and the counters.
+    '''
+    for name, histogram in sorted(snapshot['histograms'].items()):
+        if histogram['count']:
+            print(
+                f"### INFO: Metrics -> {name}: count {histogram['count']}, errors {histogram['errors']}, "
+                f"mean {histogram['mean_us']:.1f} us, p50 < {histogram['p50_us']} us, p99 < {histogram['p99_us']} us"
+            )
+
+    if snapshot['counters']:
+        print("### INFO: Metrics -> counters:", snapshot['counters'])
+
+
+'''
+Sink appending snapshots as json lines to a file
+'''
+class UniswapV2JsonLinesSink:
+
+    def __init__(
+        self,
+        path
+    ):
+        self.path = path
+
+    def __call__(
+        self,
+        snapshot
+    ):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(snapshot) + '\n')
+
+
+# Process wide metrics the instrumented modules record to
+metrics = UniswapV2Metrics()
+
+
+def _wrap(
+    name,
+    function,
+    registry = None
+):
+    '''
+        Returns function wrapped to record its latency in the histogram name,
+        regardless of ENABLED.
+    '''
+    histogram = (registry or metrics).get_histogram(name)
+    buckets = histogram.buckets
+    perf_counter = time.perf_counter
+    last = NR_BUCKETS - 1
+
+    # UniswapV2Histogram.observe inlined, this runs on every call
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        except BaseException:
+            histogram.errors += 1
+            raise
+        finally:
+            seconds = perf_counter() - start
+            histogram.count += 1
+            histogram.total += seconds
+            if seconds > histogram.max:
+                histogram.max = seconds
+            bucket = int(seconds * 1e6).bit_length()
+            buckets[bucket if bucket < last else last] += 1
+
+    return wrapper
+
+
+def timed(
+    name
+):
+    '''
+        Decorator recording call counts, errors and latency of a function in
+        the histogram name. Returns the function unchanged when disabled.
+    '''
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        return _wrap(name, function)
+
+    return decorator
+
+
+def increment(
+    name,
+    n = 1
+):
+    '''
+        Increments a counter of the process wide metrics. Call sites guard it
+        with `if ENABLED:`.
+    '''
+    metrics.increment(name, n)
@@ -0,0 +1,492 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+import mmap
+import os
+import struct
+import time
+
+# NOTE:
+# File layout, all integers big endian:
+#   header (256 bytes)
+#     magic (4) | version (2) | nr sources (2) | nr pools (8) | capacity (8) | block (8)
+#     6 source names of 32 bytes, utf-8 zero padded
+#     padding (24) | sequence (8)
+#   records (96 bytes each)
+#     pool address (20) | token0 (20) | token1 (20) | reserve0 (14) | reserve1 (14)
+#     block of the reserves (4) | source index (1) | reserves known (1) | padding (2)
+# Reserves are uint112 on-chain, so 14 bytes hold them exactly. Addresses are
+# stored as raw bytes and read back lower case.
+CACHE_MAGIC = b'UV2C'
+CACHE_VERSION = 2
+HEADER_SIZE = 256
+RECORD_SIZE = 96
+MAX_SOURCES = 6
+
+_HEADER = struct.Struct('>4sHHQQQ')
+_SEQUENCE = struct.Struct('>Q')
+_SEQUENCE_OFFSET = HEADER_SIZE - 8
+_SOURCE_NAME_SIZE = 32
+
+
+'''
+Memory-mapped on-disk cache of the Uniswap V2 pool universe
+'''
+class UniswapV2PoolCache:
+
+    def __init__(
+        self,
+        path,
+        writable = False,
+        spins = 64,
+        backoff = 0.0001,
+        max_retries = 10000
+    ):
+
+        # NOTE:
+        # Readers map the file read-only and decode only the fields they
+        # access, so any number of processes share the same page cache without
+        # deserializing the universe. A single writer updates reserves in place.
+        # The header sequence is a sequence lock as in UniswapV2SharedReserves:
+        # it is odd while the writer updates records. Readers that need the
+        # reserves of one block run their reads through read, which retries
+        # reads that overlapped a write. The block of each record tells which
+        # block its reserves are from. Readers remap the file when the writer
+        # grew it.
+        self.path = path
+        self.writable = writable
+        self.spins = spins
+        self.backoff = backoff
+        self.max_retries = max_retries
+
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+
+        magic, version, _, _, _, _ = _HEADER.unpack_from(self.map, 0)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise Exception(f"### ERROR: {path} is not a Uniswap V2 pool cache (version {CACHE_VERSION}).")
+
+        # (pool address) => row, built on first lookup
+        self.rows = None
+
+    @classmethod
+    def create(
+        cls,
+        path,
+        pools,
+        block = 0,
+        capacity = None
+    ):
+        '''
+            Writes a new cache file from pool objects or dicts and opens it
+            writable. capacity reserves room for pools added later.
+        '''
+        pools = list(pools)
+        capacity = max(capacity or 0, len(pools), 1)
+
+        with open(path, 'wb') as f:
+            f.truncate(HEADER_SIZE + capacity * RECORD_SIZE)
+            f.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, 0, 0, capacity, block))
+            f.seek(_SEQUENCE_OFFSET)
+            f.write(_SEQUENCE.pack(0))
+
+        cache = cls(path, writable = True)
+        cache.add_pools(pools)
+
+        return cache
+
+    def close(
+        self
+    ):
+        self.map.close()
+        self.file.close()
+
+    def __len__(
+        self
+    ):
+        nr_pools = _HEADER.unpack_from(self.map, 0)[3]
+        if HEADER_SIZE + nr_pools * RECORD_SIZE > len(self.map):
+            self._remap()
+
+        return nr_pools
+
+    def _remap(
+        self
+    ):
+        '''
+            Maps the whole file again after the writer grew it.
+        '''
+        self.map.close()
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ)
+
+    def _get_offset(
+        self,
+        row
+    ):
+        offset = HEADER_SIZE + row * RECORD_SIZE
+        if offset + RECORD_SIZE > len(self.map):
+            self._remap()
+            if offset + RECORD_SIZE > len(self.map):
+                raise IndexError(f"Pool cache row {row} out of range")
+
+        return offset
+
+    def get_sequence(
+        self
+    ):
+        return _SEQUENCE.unpack_from(self.map, _SEQUENCE_OFFSET)[0]
+
+    def _begin_write(
+        self
+    ):
+        if not self.writable:
+            raise Exception("### ERROR: Pool cache opened read-only.")
+
+        _SEQUENCE.pack_into(self.map, _SEQUENCE_OFFSET, self.get_sequence() + 1)
+
+    def _end_write(
+        self
+    ):
+        _SEQUENCE.pack_into(self.map, _SEQUENCE_OFFSET, self.get_sequence() + 1)
+
+    def read(
+        self,
+        function,
+        *args
+    ):
+        '''
+            Calls function(*args), which reads from this cache, and retries it
+            until no write overlapped the call. Raises once max_retries reads
+            overlapped a write.
+        '''
+        retries = 0
+        while True:
+            sequence = self.get_sequence()
+            if not sequence & 1:
+                result = function(*args)
+
+                if self.get_sequence() == sequence:
+                    return result
+
+            retries += 1
+            if retries >= self.max_retries:
+                raise Exception(f"### ERROR: Pool cache {self.path} still written after {retries} reads (sequence {sequence}), writer stalled?")
+
+            if retries >= self.spins:
+                time.sleep(self.backoff)
+
+    def get_block(
+        self
+    ):
+        '''
+            Block of the last completed update.
+        '''
+        return _HEADER.unpack_from(self.map, 0)[5]
+
+    def set_block(
+        self,
+        block
+    ):
+        magic, version, nr_sources, nr_pools, capacity, _ = _HEADER.unpack_from(self.map, 0)
+        _HEADER.pack_into(self.map, 0, magic, version, nr_sources, nr_pools, capacity, block)
+
+    def get_sources(
+        self
+    ) -> list:
+        nr_sources = _HEADER.unpack_from(self.map, 0)[2]
+        sources = list()
+        for i in range(nr_sources):
+            offset = _HEADER.size + i * _SOURCE_NAME_SIZE
+            sources.append(bytes(self.map[offset:offset + _SOURCE_NAME_SIZE]).rstrip(b'\x00').decode())
+
+        return sources
+
+    def _get_source_index(
+        self,
+        source
+    ):
+        sources = self.get_sources()
+        if source in sources:
+            return sources.index(source)
+
+        if len(sources) == MAX_SOURCES:
+            raise Exception(f"### ERROR: Pool cache holds at most {MAX_SOURCES} sources.")
+
+        name = source.encode()
+        if len(name) > _SOURCE_NAME_SIZE:
+            raise Exception(f"### ERROR: Source name {source} too long for the pool cache.")
+
+        offset = _HEADER.size + len(sources) * _SOURCE_NAME_SIZE
+        self.map[offset:offset + _SOURCE_NAME_SIZE] = name.ljust(_SOURCE_NAME_SIZE, b'\x00')
+
+        magic, version, _, nr_pools, capacity, block = _HEADER.unpack_from(self.map, 0)
+        _HEADER.pack_into(self.map, 0, magic, version, len(sources) + 1, nr_pools, capacity, block)
+
+        return len(sources)
+
+    def _grow(
+        self,
+        capacity
+    ):
+        self.map.flush()
+        self.file.truncate(HEADER_SIZE + capacity * RECORD_SIZE)
+        self._remap()
+
+        magic, version, nr_sources, nr_pools, _, block = _HEADER.unpack_from(self.map, 0)
+        _HEADER.pack_into(self.map, 0, magic, version, nr_sources, nr_pools, capacity, block)
+
+    def _get_rows(
+        self
+    ):
+        if self.rows is None:
+            self.rows = dict()
+
+        # Pools appended by the writer since the last lookup
+        for row in range(len(self.rows), len(self)):
+            self.rows[self.get_pool_address(row)] = row
+
+        return self.rows
+
+    def get_row(
+        self,
+        pool_address
+    ):
+        '''
+            Row of a pool address, None if not cached.
+        '''
+        return self._get_rows().get(pool_address.lower())
+
+    def add_pools(
+        self,
+        pools
+    ):
+        '''
+            Appends pools (objects or dicts) not cached yet and returns their
+            rows. Grows the file if needed.
+        '''
+
+        self._begin_write()
+        try:
+            return self._add_pools(pools)
+        finally:
+            self._end_write()
+
+    def _add_pools(
+        self,
+        pools
+    ):
+        rows = self._get_rows()
+        result = list()
+
+        for pool in pools:
+            if isinstance(pool, dict):
+                pool = UniswapV2Pool(pool)
+
+            pool_address = pool.pool_address.lower()
+            if pool_address in rows:
+                result.append(rows[pool_address])
+                continue
+
+            # The source is registered first, so that a rejected source leaves
+            # the file unchanged
+            source_index = self._get_source_index(pool.source)
+
+            magic, version, nr_sources, nr_pools, capacity, block = _HEADER.unpack_from(self.map, 0)
+            if nr_pools == capacity:
+                self._grow(capacity * 2)
+
+            row = nr_pools
+            offset = HEADER_SIZE + row * RECORD_SIZE
+            self.map[offset:offset + 60] = bytes.fromhex(pool_address[2:] + pool.token0[2:].lower() + pool.token1[2:].lower())
+            self.map[offset + 92] = source_index
+            self._write_reserves(row, pool.reserve0, pool.reserve1, 0)
+
+            magic, version, nr_sources, _, capacity, block = _HEADER.unpack_from(self.map, 0)
+            _HEADER.pack_into(self.map, 0, magic, version, nr_sources, row + 1, capacity, block)
+
+            rows[pool_address] = row
+            result.append(row)
+
+        return result
+
+    def get_pool_address(
+        self,
+        row
+    ):
+        offset = self._get_offset(row)
+        return '0x' + self.map[offset:offset + 20].hex()
+
+    def get_tokens(
+        self,
+        row
+    ):
+        offset = self._get_offset(row)
+        return ['0x' + self.map[offset + 20:offset + 40].hex(), '0x' + self.map[offset + 40:offset + 60].hex()]
+
+    def get_reserves(
+        self,
+        row
+    ):
+        '''
+            Returns (reserve0, reserve1, block) of a row, reserves are None if
+            unknown.
+        '''
+        offset = self._get_offset(row) + 60
+        record = self.map[offset:offset + 34]
+        if not record[33]:
+            return None, None, int.from_bytes(record[28:32], 'big')
+
+        return int.from_bytes(record[0:14], 'big'), int.from_bytes(record[14:28], 'big'), int.from_bytes(record[28:32], 'big')
+
+    def update_reserves(
+        self,
+        row,
+        reserve0,
+        reserve1,
+        block
+    ):
+        '''
+            Rewrites the reserves of a row in place.
+        '''
+        self._begin_write()
+        try:
+            self._write_reserves(row, reserve0, reserve1, block)
+        finally:
+            self._end_write()
+
+    def _write_reserves(
+        self,
+        row,
+        reserve0,
+        reserve1,
+        block
+    ):
+        offset = HEADER_SIZE + row * RECORD_SIZE + 60
+        if reserve0 is None or reserve1 is None:
+            self.map[offset:offset + 32] = bytes(28) + block.to_bytes(4, 'big')
+            self.map[offset + 33] = 0
+        else:
+            self.map[offset:offset + 32] = reserve0.to_bytes(14, 'big') + reserve1.to_bytes(14, 'big') + block.to_bytes(4, 'big')
+            self.map[offset + 33] = 1
+
+    def update_pools(
+        self,
+        pools,
+        block
+    ):
+        '''
+            Writes the reserves of pools with complete data at block, adding
+            pools that are not cached, then sets the cache block. Returns the
+            number of rows written.
+        '''
+
+        self._begin_write()
+        try:
+            rows = self._get_rows()
+            count = 0
+
+            for pool in pools:
+                if not pool.has_complete_data():
+                    continue
+
+                row = rows.get(pool.pool_address.lower())
+                if row is None:
+                    row = self._add_pools([pool])[0]
+
+                self._write_reserves(row, pool.reserve0, pool.reserve1, block)
+                count += 1
+
+            self.set_block(block)
+        finally:
+            self._end_write()
+
+        return count
+
+    def get_pool_dict(
+        self,
+        row
+    ):
+        offset = self._get_offset(row)
+        record = self.map[offset:offset + RECORD_SIZE]
+
+        p = dict()
+        p['pool_address'] = '0x' + record[0:20].hex()
+        p['tokens'] = ['0x' + record[20:40].hex(), '0x' + record[40:60].hex()]
+        p['source'] = self.get_sources()[record[92]]
+        p['reserve0'] = int.from_bytes(record[60:74], 'big') if record[93] else None
+        p['reserve1'] = int.from_bytes(record[74:88], 'big') if record[93] else None
+
+        return p
+
+    def iter_pools(
+        self
+    ):
+        '''
+            Lazily yields cached pools as UniswapV2Pool objects.
+        '''
+        for row in range(len(self)):
+            yield UniswapV2Pool(self.get_pool_dict(row))
+
+    def load_registry(
+        self,
+        registry
+    ):
+        '''
+            Adds all cached pools with their last reserves to a PoolRegistry
+            and returns the registry rows. Unknown reserves are None, as in
+            get_pool_dict.
+        '''
+        return registry.add_columns(*self.read(self.get_columns))
+
+    def get_columns(
+        self
+    ):
+        '''
+            Returns the (pool_addresses, tokens0, tokens1, sources, reserves0,
+            reserves1) columns of all records, as taken by
+            PoolRegistry.add_columns. Use through read for one block.
+        '''
+
+        # NOTE:
+        # The records are copied and hex encoded once, fields are then cut
+        # out of the hex string per column, without a dict per pool.
+        nr_pools = len(self)
+        data = self.map[HEADER_SIZE:HEADER_SIZE + nr_pools * RECORD_SIZE]
+        h = data.hex()
+        end = len(h)
+        step = 2 * RECORD_SIZE
+
+        pool_addresses = ['0x' + h[i:i + 40] for i in range(0, end, step)]
+        tokens0 = ['0x' + h[i:i + 40] for i in range(40, end, step)]
+        tokens1 = ['0x' + h[i:i + 40] for i in range(80, end, step)]
+
+        from_bytes = int.from_bytes
+        reserves0 = [from_bytes(data[i:i + 14], 'big') for i in range(60, len(data), RECORD_SIZE)]
+        reserves1 = [from_bytes(data[i:i + 14], 'big') for i in range(74, len(data), RECORD_SIZE)]
+
+        known = data[93::RECORD_SIZE]
+        if 0 in known:
+            for row, k in enumerate(known):
+                if not k:
+                    reserves0[row] = reserves1[row] = None
+
+        names = self.get_sources()
+        sources = [names[i] for i in data[92::RECORD_SIZE]]
+
+        return pool_addresses, tokens0, tokens1, sources, reserves0, reserves1
+
+    def flush(
+        self
+    ):
+        self.map.flush()
+
+
+def open_pool_cache(
+    path,
+    writable = False
+):
+    '''
+        Opens a pool cache, None if the file does not exist.
+    '''
+    if not os.path.exists(path):
+        return None
+
+    return UniswapV2PoolCache(path, writable = writable)
@@ -1,9 +1,16 @@
 from utils.Uniswap.Uniswap_v2.Uniswap_v2_helper import UniswapV2Helper
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_forks import get_fork
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_metrics import timed
 
 UniswapV2Helper = UniswapV2Helper()
 
 class UniswapV2Pool:
 
+    # Reference bid cache counters, across all pools, registry rows and
+    # UniswapV2Quoter.refresh_reference_bids
+    reference_bid_hits = 0
+    reference_bid_misses = 0
+
     def __init__(
         self,
         pool
@@ -12,6 +19,7 @@ class UniswapV2Pool:
         self.pool_address = pool['pool_address']
         self.tokens = sorted(pool['tokens'])
         self.source = pool['source']
+        self.fork = get_fork(self.source)
         self.token0 = self.tokens[0]
         self.token1 = self.tokens[1]
         self.has_liquidity = True
@@ -21,9 +29,47 @@ class UniswapV2Pool:
         # whereby the trade size is fixed and equal across all pools. 
         # The trade size is a meta parameter
 
-        self.reserve0 = None if 'reserve0' not in pool else pool['reserve0']
-        self.reserve1 = None if 'reserve1' not in pool else pool['reserve1']
+        self._reserve0 = None if 'reserve0' not in pool else pool['reserve0']
+        self._reserve1 = None if 'reserve1' not in pool else pool['reserve1']
         self.reference_bids = {t: dict() for t in self.tokens} if not 'reference_bids' in pool else pool['reference_bids']
+
+        # NOTE:
+        # reference_bids are evaluated lazily. They are reused while reserves
+        # and the trade size they were computed for are unchanged. Every
+        # reserve write (set_reserves or the reserve0/reserve1 setters) marks
+        # them dirty.
+        self.reference_bids_dirty = False
+        self.reference_trade_size = None
+
+    @property
+    def reserve0(
+        self
+    ):
+        return self._reserve0
+
+    @reserve0.setter
+    def reserve0(
+        self,
+        value
+    ):
+        if value != self._reserve0:
+            self._reserve0 = value
+            self.reference_bids_dirty = True
+
+    @property
+    def reserve1(
+        self
+    ):
+        return self._reserve1
+
+    @reserve1.setter
+    def reserve1(
+        self,
+        value
+    ):
+        if value != self._reserve1:
+            self._reserve1 = value
+            self.reference_bids_dirty = True
     
     def has_complete_data(
         self
@@ -53,8 +99,22 @@ class UniswapV2Pool:
     def get_path(
         self,
         sell_token,
-        buy_token
+        buy_token,
+        registry = None
     ):
+        '''
+            Returns the token path through the pool, as expected by the
+            encoder in hop.pools_utils. With a PoolRegistry (by default the
+            registry of a view), None if its pair index has no pool trading
+            the two tokens.
+        '''
+        registry = registry or getattr(self, 'registry', None)
+        if registry is not None:
+            sell_token_id = registry.get_token_id(sell_token)
+            buy_token_id = registry.get_token_id(buy_token)
+            if sell_token_id is None or buy_token_id is None or not registry.has_pair(sell_token_id, buy_token_id):
+                return None
+
         return [sell_token, buy_token]
 
     def get_reference_bid(
@@ -63,6 +123,18 @@ class UniswapV2Pool:
         token_out,
         amount_in
     ):
+
+        # Stale bids of both directions are dropped at once
+        if self.reference_bids_dirty or self.reference_trade_size != amount_in:
+            self.reference_bids = {t: dict() for t in self.tokens}
+            self.reference_bids_dirty = False
+            self.reference_trade_size = amount_in
+
+        elif token_out in self.reference_bids[token_in]:
+            UniswapV2Pool.reference_bid_hits += 1
+            return self.reference_bids[token_in][token_out]
+
+        UniswapV2Pool.reference_bid_misses += 1
         
         if token_in == self.token0:
             reserve_in = self.reserve0
@@ -73,6 +145,32 @@ class UniswapV2Pool:
 
         _ , self.reference_bids[token_in][token_out] = self.get_amount_out(amount_in = amount_in, reserve_in = reserve_in, reserve_out = reserve_out)
 
+        return self.reference_bids[token_in][token_out]
+
+    def needs_reference_bids(
+        self,
+        trade_size
+    ):
+        '''
+            True if reference_bids are missing or stale for trade_size.
+        '''
+        return self.reference_bids_dirty or self.reference_trade_size != trade_size \
+            or self.token1 not in self.reference_bids[self.token0] or self.token0 not in self.reference_bids[self.token1]
+
+    def set_reference_bids(
+        self,
+        trade_size,
+        bid0,
+        bid1
+    ):
+        '''
+            Sets both reference bids: bid0 sells token0, bid1 sells token1.
+        '''
+        self.reference_bids = {self.token0: {self.token1: bid0}, self.token1: {self.token0: bid1}}
+        self.reference_bids_dirty = False
+        self.reference_trade_size = trade_size
+
+    @timed('pool.get_amount_out')
     def get_amount_out(
         self,
         amount_in,
@@ -89,16 +187,44 @@ class UniswapV2Pool:
         if not (reserve_in > 0 and reserve_out > 0):
             return 0, 0
         
+        # NOTE:
+        # Integer floor division only, so that the quote matches the router's
+        # uint256 arithmetic bit-for-bit. Float division loses precision on
+        # 112-bit reserves.
+
         # multiply amount_in by fee
+        fee_numerator = self.fork.fee_numerator
+        fee_denominator = self.fork.fee_denominator
         amount_in = int(amount_in)
-        amount_in_with_fee = amount_in * 9975
-        fee_amount = int(amount_in * 0.0025)
+        amount_in_with_fee = amount_in * fee_numerator
+        fee_amount = (amount_in * (fee_denominator - fee_numerator)) // fee_denominator
         numerator = amount_in_with_fee * reserve_out
-        denominator = reserve_in * 10000 + amount_in_with_fee
-        amount_out = int(numerator/denominator)
+        denominator = reserve_in * fee_denominator + amount_in_with_fee
+        amount_out = numerator // denominator
         return fee_amount, amount_out
+
+    def get_pair_amount_out(
+        self,
+        amount_in,
+        reserve_in,
+        reserve_out
+    ):
+        '''
+            Largest amount out the pair contract pays for amount_in, i.e. the
+            amount out at the fee of its K check (fork.pair_fee_numerator).
+            Direct swaps must not request more, or swap() reverts with K.
+        '''
+        if not (reserve_in > 0 and reserve_out > 0):
+            return 0
+
+        fee_numerator = self.fork.pair_fee_numerator
+        fee_denominator = self.fork.pair_fee_denominator
+        amount_in_with_fee = int(amount_in) * fee_numerator
+
+        return (amount_in_with_fee * reserve_out) // (reserve_in * fee_denominator + amount_in_with_fee)
       
 
+    @timed('pool.get_amount_in')
     def get_amount_in(
         self,
         amount_out,
@@ -114,13 +240,15 @@ class UniswapV2Pool:
         if not (reserve_in > 0 and reserve_out > 0):
             return 0, 0
 
+        fee_numerator = self.fork.fee_numerator
+        fee_denominator = self.fork.fee_denominator
         amount_out = int(amount_out)
-        numerator = reserve_in * amount_out * 10000
-        denominator = (reserve_out - amount_out) * 9975
-        amount_in =  (numerator / denominator) + 1
-        if amount_in < 0:
+        if amount_out >= reserve_out:
             return None, None
-        fee_amount = int(amount_in * 0.0025)
+        numerator = reserve_in * amount_out * fee_denominator
+        denominator = (reserve_out - amount_out) * fee_numerator
+        amount_in = (numerator // denominator) + 1
+        fee_amount = (amount_in * (fee_denominator - fee_numerator)) // fee_denominator
         
         return fee_amount, amount_in
 
@@ -147,6 +275,7 @@ class UniswapV2Pool:
     ):
         raise Exception("### ERROR: No paramter call required for Uniswap V2 pool.")
     
+    @timed('pool.process_balances_call')
     def process_balances_call(
         self,
         data
@@ -158,8 +287,20 @@ class UniswapV2Pool:
 
         
         
-        self.reserve0 = state[0]
-        self.reserve1 = state[1]
+        self.set_reserves(state[0], state[1])
+
+    def set_reserves(
+        self,
+        reserve0,
+        reserve1
+    ):
+        '''
+            Updates reserves and marks reference_bids dirty if they changed.
+        '''
+        if reserve0 != self._reserve0 or reserve1 != self._reserve1:
+            self._reserve0 = reserve0
+            self._reserve1 = reserve1
+            self.reference_bids_dirty = True
     
     
     def get_state_calls(
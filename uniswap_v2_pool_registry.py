@@ -0,0 +1,636 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_helper import UniswapV2Helper
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_quoter import UniswapV2Quoter
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_forks import get_fork
+from array import array
+
+UniswapV2Helper = UniswapV2Helper()
+UniswapV2Quoter = UniswapV2Quoter()
+
+'''
+Columnar registry of Uniswap V2 pools
+'''
+class PoolRegistry:
+
+    def __init__(
+        self
+    ):
+
+        # NOTE:
+        # Pools are stored by row in contiguous columns instead of one
+        # UniswapV2Pool object (with its own __dict__, tokens list and nested
+        # reference_bids dicts) per pool. Token addresses and sources are
+        # interned once and referenced by index. Pool views are built on
+        # demand and never stored.
+
+        # Interned values, token_ids is keyed by the lower case token
+        self.tokens = list()
+        self.token_ids = dict()
+        self.sources = list()
+        self.source_ids = dict()
+        # UniswapV2Fork per interned source
+        self.forks = list()
+
+        # Columns
+        self.pool_addresses = list()
+        # Pool addresses are stored lower case, see get_row
+        self.pool_ids = dict()
+        self.token0 = array('I')
+        self.token1 = array('I')
+        self.source = array('B')
+        # Reserves are None while unknown
+        self.reserve0 = list()
+        self.reserve1 = list()
+        # has_liquidity flag, maintained by UniswapV2LiquidityIndex
+        self.liquidity = bytearray()
+
+        # Reference bids per direction, None if not computed
+        # reference_bids0: token0 => token1, reference_bids1: token1 => token0
+        self.reference_bids0 = list()
+        self.reference_bids1 = list()
+        self.reference_bids_dirty = bytearray()
+        self.reference_trade_size = None
+
+        # Rows whose reserves changed since the last snapshot was published
+        self.changed_rows = set()
+
+        # Pair index over rows, updated as pools are added. Pairs are keyed
+        # by their two token ids in one int (see _get_pair_key). pair_rows
+        # holds the first row of a pair, more_pair_rows the rows of further
+        # pools of that pair. adjacency is (token id) => array of the token
+        # ids sharing a pool with it, each once.
+        self.pair_rows = dict()
+        self.more_pair_rows = dict()
+        self.adjacency = dict()
+
+    def __len__(
+        self
+    ):
+        return len(self.pool_addresses)
+
+    def __getitem__(
+        self,
+        row
+    ):
+        return UniswapV2PoolView(self, row)
+
+    def __iter__(
+        self
+    ):
+        for row in range(len(self.pool_addresses)):
+            yield UniswapV2PoolView(self, row)
+
+    def _intern_token(
+        self,
+        token
+    ):
+        key = token.lower()
+        token_id = self.token_ids.get(key)
+        if token_id is None:
+            token_id = len(self.tokens)
+            self.token_ids[key] = token_id
+            self.tokens.append(token)
+
+        return token_id
+
+    def _intern_source(
+        self,
+        source
+    ):
+        source_id = self.source_ids.get(source)
+        if source_id is None:
+            source_id = len(self.sources)
+            self.forks.append(get_fork(source))
+            self.source_ids[source] = source_id
+            self.sources.append(source)
+
+        return source_id
+
+    def add_pool(
+        self,
+        pool
+    ):
+        '''
+            Adds a pool given as a dict in the UniswapV2Pool input format
+            (e.g. parse_pool_query output or UniswapV2Pool.to_dict). Returns
+            the pool row. Pools already in the registry are not duplicated.
+        '''
+
+        # Lower case addresses are kept as given, not copied
+        pool_id = pool['pool_address']
+        if not pool_id.islower():
+            pool_id = pool_id.lower()
+
+        row = self.pool_ids.get(pool_id)
+        if row is not None:
+            return row
+
+        tokens = sorted(pool['tokens'])
+        token0_id = self._intern_token(tokens[0])
+        token1_id = self._intern_token(tokens[1])
+
+        row = len(self.pool_addresses)
+        self.pool_ids[pool_id] = row
+        self.pool_addresses.append(pool_id)
+        self.token0.append(token0_id)
+        self.token1.append(token1_id)
+        self.source.append(self._intern_source(pool['source']))
+        self.reserve0.append(pool.get('reserve0'))
+        self.reserve1.append(pool.get('reserve1'))
+        self.liquidity.append(1)
+
+        reference_bids = pool.get('reference_bids') or dict()
+        self.reference_bids0.append(reference_bids.get(tokens[0], dict()).get(tokens[1]))
+        self.reference_bids1.append(reference_bids.get(tokens[1], dict()).get(tokens[0]))
+        self.reference_bids_dirty.append(0)
+
+        key = self._get_pair_key(token0_id, token1_id)
+        if key in self.pair_rows:
+            self.more_pair_rows.setdefault(key, list()).append(row)
+        else:
+            self.pair_rows[key] = row
+            self.adjacency.setdefault(token0_id, array('I')).append(token1_id)
+            self.adjacency.setdefault(token1_id, array('I')).append(token0_id)
+
+        return row
+
+    def add_pools(
+        self,
+        pools
+    ):
+        return [self.add_pool(pool) for pool in pools]
+
+    def add_columns(
+        self,
+        pool_addresses,
+        tokens0,
+        tokens1,
+        sources,
+        reserves0,
+        reserves1
+    ) -> list:
+        '''
+            Bulk version of add_pool for pools given as aligned columns, e.g.
+            the records of a UniswapV2PoolCache. Tokens must be lower case and
+            sorted per pool. Returns the pool rows.
+        '''
+
+        # NOTE:
+        # Same columns as add_pool, built with one dict or list operation per
+        # column instead of a dict and a sort per pool. Only the pair index is
+        # updated pool by pool.
+        pool_ids = self.pool_ids
+        token_ids = self.token_ids
+        start = len(self.pool_addresses)
+
+        # Pools already in the registry, or repeated, keep their first row
+        pool_keys = [p if p.islower() else p.lower() for p in pool_addresses]
+        new = dict()
+        for i, pool_id in enumerate(pool_keys):
+            if pool_id not in pool_ids and pool_id not in new:
+                new[pool_id] = i
+
+        if len(new) < len(pool_addresses):
+            index = list(new.values())
+            tokens0 = [tokens0[i] for i in index]
+            tokens1 = [tokens1[i] for i in index]
+            sources = [sources[i] for i in index]
+            reserves0 = [reserves0[i] for i in index]
+            reserves1 = [reserves1[i] for i in index]
+
+        rows = range(start, start + len(new))
+        pool_ids.update(zip(new, rows))
+
+        # Interned in the order of add_pool
+        for token in dict.fromkeys([token for pair in zip(tokens0, tokens1) for token in pair]):
+            if token not in token_ids:
+                self._intern_token(token)
+
+        token0_ids = array('I', map(token_ids.__getitem__, tokens0))
+        token1_ids = array('I', map(token_ids.__getitem__, tokens1))
+        source_ids = {source: self._intern_source(source) for source in dict.fromkeys(sources)}
+
+        self.pool_addresses.extend(new)
+        self.token0.extend(token0_ids)
+        self.token1.extend(token1_ids)
+        self.source.extend([source_ids[source] for source in sources])
+        self.reserve0.extend(reserves0)
+        self.reserve1.extend(reserves1)
+        self.liquidity.extend(b'\x01' * len(new))
+        self.reference_bids0.extend([None] * len(new))
+        self.reference_bids1.extend([None] * len(new))
+        self.reference_bids_dirty.extend(bytes(len(new)))
+
+        # Pair keys as in _get_pair_key, inlined
+        pair_rows = self.pair_rows
+        adjacency = self.adjacency
+        for row, a, b in zip(rows, token0_ids, token1_ids):
+            key = (a << 32) | b if a < b else (b << 32) | a
+            if key in pair_rows:
+                self.more_pair_rows.setdefault(key, list()).append(row)
+                continue
+
+            pair_rows[key] = row
+            neighbours = adjacency.get(a)
+            if neighbours is None:
+                neighbours = adjacency[a] = array('I')
+            neighbours.append(b)
+            neighbours = adjacency.get(b)
+            if neighbours is None:
+                neighbours = adjacency[b] = array('I')
+            neighbours.append(a)
+
+        return list(map(pool_ids.__getitem__, pool_keys))
+
+    def get_row(
+        self,
+        pool_address
+    ):
+        '''
+            Returns the row of a pool address in any case, None if unknown.
+        '''
+        return self.pool_ids.get(pool_address.lower())
+
+    def get_pool(
+        self,
+        pool_address
+    ):
+        '''
+            Returns the pool view for a pool address, None if unknown.
+        '''
+        row = self.get_row(pool_address)
+        if row is None:
+            return None
+
+        return UniswapV2PoolView(self, row)
+
+    def _get_pair_key(
+        self,
+        token_a_id,
+        token_b_id
+    ):
+        if token_a_id < token_b_id:
+            return (token_a_id << 32) | token_b_id
+
+        return (token_b_id << 32) | token_a_id
+
+    def get_token_id(
+        self,
+        token
+    ):
+        '''
+            Returns the interned id of a token (any case), None if unknown.
+        '''
+        return self.token_ids.get(token.lower())
+
+    def get_pair_rows(
+        self,
+        token_a_id,
+        token_b_id
+    ) -> list:
+        '''
+            Returns the rows of the pools trading two token ids.
+        '''
+        key = self._get_pair_key(token_a_id, token_b_id)
+        row = self.pair_rows.get(key)
+        if row is None:
+            return []
+
+        return [row] + self.more_pair_rows.get(key, [])
+
+    def has_pair(
+        self,
+        token_a_id,
+        token_b_id
+    ):
+        return self._get_pair_key(token_a_id, token_b_id) in self.pair_rows
+
+    def get_neighbour_ids(
+        self,
+        token_id
+    ):
+        '''
+            Returns the ids of the tokens sharing a pool with token_id. The
+            array is the index itself and must not be modified.
+        '''
+        return self.adjacency.get(token_id, ())
+
+    def get_common_neighbour_ids(
+        self,
+        token_a_id,
+        token_b_id
+    ) -> list:
+        '''
+            Returns the ids of the tokens sharing a pool with both tokens,
+            scanning the smaller of the two neighbourhoods.
+        '''
+        neighbours_a = self.get_neighbour_ids(token_a_id)
+        neighbours_b = self.get_neighbour_ids(token_b_id)
+        if len(neighbours_b) < len(neighbours_a):
+            neighbours_a, token_b_id = neighbours_b, token_a_id
+
+        # Pair keys as in _get_pair_key, inlined
+        pair_rows = self.pair_rows
+        high = token_b_id << 32
+
+        return [
+            t for t in neighbours_a
+            if ((t << 32) | token_b_id if t < token_b_id else high | t) in pair_rows
+        ]
+
+    def get_neighbours(
+        self,
+        token
+    ) -> set:
+        '''
+            Returns the tokens that share at least one pool with token.
+        '''
+        token_id = self.get_token_id(token)
+        if token_id is None:
+            return set()
+
+        return {self.tokens[i] for i in self.get_neighbour_ids(token_id)}
+
+    def get_pair_pools(
+        self,
+        sell_token,
+        buy_token
+    ) -> list:
+        '''
+            Returns the pool views trading sell_token against buy_token.
+        '''
+        sell_token_id = self.get_token_id(sell_token)
+        buy_token_id = self.get_token_id(buy_token)
+        if sell_token_id is None or buy_token_id is None:
+            return []
+
+        return [UniswapV2PoolView(self, row) for row in self.get_pair_rows(sell_token_id, buy_token_id)]
+
+    def set_reserves(
+        self,
+        row,
+        reserve0,
+        reserve1
+    ):
+        '''
+            Updates reserves of a row and marks its reference bids dirty if
+            they changed.
+        '''
+        if reserve0 != self.reserve0[row] or reserve1 != self.reserve1[row]:
+            self.reserve0[row] = reserve0
+            self.reserve1[row] = reserve1
+            self.reference_bids_dirty[row] = 1
+            self.changed_rows.add(row)
+
+    def refresh_reference_bids(
+        self,
+        trade_size
+    ):
+        '''
+            Recomputes both reference bids of the rows that are dirty, with
+            one batch per direction. A new trade size makes all rows dirty.
+            Returns the number of rows recomputed.
+        '''
+
+        if trade_size != self.reference_trade_size:
+            self.reference_bids_dirty = bytearray(b'\x01' * len(self.pool_addresses))
+            self.reference_trade_size = trade_size
+
+        dirty = self.reference_bids_dirty
+        rows = [row for row in range(len(dirty)) if dirty[row]]
+
+        UniswapV2Pool.reference_bid_hits += len(dirty) - len(rows)
+        UniswapV2Pool.reference_bid_misses += len(rows)
+
+        if not rows:
+            return 0
+
+        reserves0 = [self.reserve0[row] for row in rows]
+        reserves1 = [self.reserve1[row] for row in rows]
+
+        pools = [UniswapV2PoolView(self, row) for row in rows]
+        bids0 = UniswapV2Quoter.get_amount_out_pools(pools, trade_size, reserves0, reserves1)
+        bids1 = UniswapV2Quoter.get_amount_out_pools(pools, trade_size, reserves1, reserves0)
+
+        for row, bid0, bid1 in zip(rows, bids0, bids1):
+            self.reference_bids0[row] = bid0
+            self.reference_bids1[row] = bid1
+            dirty[row] = 0
+
+        return len(rows)
+
+    def get_state_calls(
+        self
+    ):
+        '''
+            Returns the getReserves calls of all pools, aligned with rows.
+        '''
+        return [UniswapV2Helper.get_balances_call(pool_address = a) for a in self.pool_addresses]
+
+
+'''
+Lightweight UniswapV2Pool interface on top of a PoolRegistry row
+'''
+class UniswapV2PoolView:
+
+    __slots__ = ('registry', 'row')
+
+    def __init__(
+        self,
+        registry,
+        row
+    ):
+        self.registry = registry
+        self.row = row
+
+    @property
+    def pool_address(
+        self
+    ):
+        return self.registry.pool_addresses[self.row]
+
+    @property
+    def source(
+        self
+    ):
+        return self.registry.sources[self.registry.source[self.row]]
+
+    @property
+    def fork(
+        self
+    ):
+        return self.registry.forks[self.registry.source[self.row]]
+
+    @property
+    def token0(
+        self
+    ):
+        return self.registry.tokens[self.registry.token0[self.row]]
+
+    @property
+    def token1(
+        self
+    ):
+        return self.registry.tokens[self.registry.token1[self.row]]
+
+    @property
+    def tokens(
+        self
+    ):
+        return [self.token0, self.token1]
+
+    @property
+    def has_liquidity(
+        self
+    ):
+        return bool(self.registry.liquidity[self.row])
+
+    @has_liquidity.setter
+    def has_liquidity(
+        self,
+        value
+    ):
+        self.registry.liquidity[self.row] = 1 if value else 0
+
+    @property
+    def reserve0(
+        self
+    ):
+        return self.registry.reserve0[self.row]
+
+    @reserve0.setter
+    def reserve0(
+        self,
+        value
+    ):
+        registry = self.registry
+        if value != registry.reserve0[self.row]:
+            registry.reserve0[self.row] = value
+            registry.reference_bids_dirty[self.row] = 1
+            registry.changed_rows.add(self.row)
+
+    @property
+    def reserve1(
+        self
+    ):
+        return self.registry.reserve1[self.row]
+
+    @reserve1.setter
+    def reserve1(
+        self,
+        value
+    ):
+        registry = self.registry
+        if value != registry.reserve1[self.row]:
+            registry.reserve1[self.row] = value
+            registry.reference_bids_dirty[self.row] = 1
+            registry.changed_rows.add(self.row)
+
+    @property
+    def reference_bids_dirty(
+        self
+    ):
+        return bool(self.registry.reference_bids_dirty[self.row])
+
+    @reference_bids_dirty.setter
+    def reference_bids_dirty(
+        self,
+        value
+    ):
+        self.registry.reference_bids_dirty[self.row] = 1 if value else 0
+
+    def set_reserves(
+        self,
+        reserve0,
+        reserve1
+    ):
+        self.registry.set_reserves(self.row, reserve0, reserve1)
+
+    @property
+    def reference_bids(
+        self
+    ):
+        '''
+            Read-only (sell_token) => (buy_token) => (buy_token_amount) dict
+            built from the registry columns.
+        '''
+        token0 = self.token0
+        token1 = self.token1
+        bids = {token0: dict(), token1: dict()}
+
+        if self.registry.reference_bids0[self.row] is not None:
+            bids[token0][token1] = self.registry.reference_bids0[self.row]
+        if self.registry.reference_bids1[self.row] is not None:
+            bids[token1][token0] = self.registry.reference_bids1[self.row]
+
+        return bids
+
+    def get_reference_bid(
+        self,
+        token_in,
+        token_out,
+        amount_in
+    ):
+
+        registry = self.registry
+        row = self.row
+
+        # Stale bids of both directions are dropped at once
+        if registry.reference_bids_dirty[row] or registry.reference_trade_size != amount_in:
+            if registry.reference_trade_size != amount_in:
+                registry.reference_bids_dirty = bytearray(b'\x01' * len(registry))
+                registry.reference_trade_size = amount_in
+            registry.reference_bids0[row] = None
+            registry.reference_bids1[row] = None
+            registry.reference_bids_dirty[row] = 0
+
+        bids = registry.reference_bids0 if token_in == self.token0 else registry.reference_bids1
+        if bids[row] is not None:
+            UniswapV2Pool.reference_bid_hits += 1
+            return bids[row]
+
+        UniswapV2Pool.reference_bid_misses += 1
+
+        if token_in == self.token0:
+            _ , bids[row] = self.get_amount_out(amount_in = amount_in, reserve_in = self.reserve0, reserve_out = self.reserve1)
+        else:
+            _ , bids[row] = self.get_amount_out(amount_in = amount_in, reserve_in = self.reserve1, reserve_out = self.reserve0)
+
+        return bids[row]
+
+    def needs_reference_bids(
+        self,
+        trade_size
+    ):
+        registry = self.registry
+        return bool(registry.reference_bids_dirty[self.row]) or registry.reference_trade_size != trade_size \
+            or registry.reference_bids0[self.row] is None or registry.reference_bids1[self.row] is None
+
+    def set_reference_bids(
+        self,
+        trade_size,
+        bid0,
+        bid1
+    ):
+        registry = self.registry
+        if registry.reference_trade_size != trade_size:
+            registry.reference_bids_dirty = bytearray(b'\x01' * len(registry))
+            registry.reference_trade_size = trade_size
+
+        registry.reference_bids0[self.row] = bid0
+        registry.reference_bids1[self.row] = bid1
+        registry.reference_bids_dirty[self.row] = 0
+
+    # NOTE:
+    # The remaining interface is shared with UniswapV2Pool, which only relies
+    # on attributes exposed by the view.
+    has_complete_data = UniswapV2Pool.has_complete_data
+    to_dict = UniswapV2Pool.to_dict
+    get_path = UniswapV2Pool.get_path
+    get_amount_out = UniswapV2Pool.get_amount_out
+    get_pair_amount_out = UniswapV2Pool.get_pair_amount_out
+    get_amount_in = UniswapV2Pool.get_amount_in
+    process_rpc_data = UniswapV2Pool.process_rpc_data
+    process_parameter_call = UniswapV2Pool.process_parameter_call
+    process_balances_call = UniswapV2Pool.process_balances_call
+    get_state_calls = UniswapV2Pool.get_state_calls
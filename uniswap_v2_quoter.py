@@ -0,0 +1,219 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_forks import FORKS
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_metrics import timed
+
+'''
+Uniswap V2 batch quoter class
+'''
+class UniswapV2Quoter:
+
+    def __init__(
+        self
+    ):
+
+        # Default fee applied by the pool on amount in, expressed as
+        # fee_numerator / fee_denominator of the amount that is kept.
+        self.fee_numerator = FORKS['UniswapV2'].fee_numerator
+        self.fee_denominator = FORKS['UniswapV2'].fee_denominator
+
+    @timed('quoter.get_amount_out_batch')
+    def get_amount_out_batch(
+        self,
+        amounts_in,
+        reserves_in,
+        reserves_out,
+        fee_numerator = None,
+        fee_denominator = None
+    ) -> list:
+        '''
+            Batch version of the constant-product amount out calculation.
+
+            Quotes all pools in a single call. amounts_in is either a list aligned
+            with reserves_in/reserves_out or a single amount applied to every pool.
+            Pools without reserves quote 0. All pools share one fee, the default
+            fee unless given.
+
+            Source sample:
+            https://etherscan.io/address/0x7a250d5630b4cf539739df2c5dacb4c659f2488d#code
+        '''
+
+        # NOTE:
+        # Reserves are uint112, so numerator can reach ~2^240. Python ints are
+        # arbitrary precision and floor division matches the router's uint256
+        # arithmetic exactly, hence no limb splitting is required. The batch
+        # gain comes from avoiding one method call and attribute lookups per pool.
+
+        fee_numerator = fee_numerator or self.fee_numerator
+        fee_denominator = fee_denominator or self.fee_denominator
+
+        if isinstance(amounts_in, (list, tuple)):
+            amounts_in_with_fee = [int(a) * fee_numerator for a in amounts_in]
+        else:
+            amounts_in_with_fee = [int(amounts_in) * fee_numerator] * len(reserves_in)
+
+        return [
+            (a * r_out) // (r_in * fee_denominator + a) if r_in and r_out and a > 0 else 0
+            for a, r_in, r_out in zip(amounts_in_with_fee, reserves_in, reserves_out)
+        ]
+
+    @timed('quoter.get_amount_in_batch')
+    def get_amount_in_batch(
+        self,
+        amounts_out,
+        reserves_in,
+        reserves_out,
+        fee_numerator = None,
+        fee_denominator = None
+    ) -> list:
+        '''
+            Batch version of the constant-product amount in calculation.
+
+            Pools that cannot provide the requested amount out quote None.
+        '''
+
+        fee_numerator = fee_numerator or self.fee_numerator
+        fee_denominator = fee_denominator or self.fee_denominator
+
+        if isinstance(amounts_out, (list, tuple)):
+            amounts_out = [int(a) for a in amounts_out]
+        else:
+            amounts_out = [int(amounts_out)] * len(reserves_in)
+
+        return [
+            (r_in * a * fee_denominator) // ((r_out - a) * fee_numerator) + 1
+            if r_in and r_out and r_out > a else None
+            for a, r_in, r_out in zip(amounts_out, reserves_in, reserves_out)
+        ]
+
+    @timed('quoter.get_amount_out_pools')
+    def get_amount_out_pools(
+        self,
+        pools,
+        amounts_in,
+        reserves_in,
+        reserves_out
+    ) -> list:
+        '''
+            get_amount_out_batch for pools of possibly different forks. Pools
+            are grouped by fee, with one batch per fee tier, and the amounts
+            out are returned aligned with pools.
+        '''
+
+        if not isinstance(amounts_in, (list, tuple)):
+            amounts_in = [amounts_in] * len(pools)
+
+        tiers = dict()
+        for i, pool in enumerate(pools):
+            fork = pool.fork
+            tiers.setdefault((fork.fee_numerator, fork.fee_denominator), list()).append(i)
+
+        # NOTE:
+        # Most universes hold one fee tier, which skips the regrouping.
+        if len(tiers) == 1:
+            (fee_numerator, fee_denominator), = tiers.keys()
+            return self.get_amount_out_batch(amounts_in, reserves_in, reserves_out, fee_numerator, fee_denominator)
+
+        amounts_out = [0] * len(pools)
+        for (fee_numerator, fee_denominator), rows in tiers.items():
+            tier_amounts_out = self.get_amount_out_batch(
+                                    amounts_in = [amounts_in[i] for i in rows],
+                                    reserves_in = [reserves_in[i] for i in rows],
+                                    reserves_out = [reserves_out[i] for i in rows],
+                                    fee_numerator = fee_numerator,
+                                    fee_denominator = fee_denominator
+                                )
+            for i, amount_out in zip(rows, tier_amounts_out):
+                amounts_out[i] = amount_out
+
+        return amounts_out
+
+    def get_reserves(
+        self,
+        pools,
+        sell_token
+    ):
+        '''
+            Returns (reserves_in, reserves_out) lists for a list of UniswapV2Pool
+            objects oriented for selling sell_token.
+        '''
+
+        # NOTE:
+        # Subgraph addresses are lower case, callers may pass checksummed ones
+        sell_token = sell_token.lower()
+
+        reserves_in = list()
+        reserves_out = list()
+        for pool in pools:
+            if pool.token0.lower() == sell_token:
+                reserves_in.append(pool.reserve0 or 0)
+                reserves_out.append(pool.reserve1 or 0)
+            else:
+                reserves_in.append(pool.reserve1 or 0)
+                reserves_out.append(pool.reserve0 or 0)
+
+        return reserves_in, reserves_out
+
+    def refresh_reference_bids(
+        self,
+        pools,
+        trade_size
+    ):
+        '''
+            Recomputes the reference bids of both directions for the pools
+            whose bids are missing or stale for trade_size, with one batch per
+            direction. Returns the number of pools recomputed. Hits and misses
+            are counted in UniswapV2Pool.reference_bid_hits/misses.
+        '''
+
+        pools = list(pools)
+        stale = [pool for pool in pools if pool.needs_reference_bids(trade_size)]
+
+        UniswapV2Pool.reference_bid_hits += len(pools) - len(stale)
+        UniswapV2Pool.reference_bid_misses += len(stale)
+
+        if not stale:
+            return 0
+
+        reserves0 = [pool.reserve0 or 0 for pool in stale]
+        reserves1 = [pool.reserve1 or 0 for pool in stale]
+
+        bids0 = self.get_amount_out_pools(stale, trade_size, reserves0, reserves1)
+        bids1 = self.get_amount_out_pools(stale, trade_size, reserves1, reserves0)
+
+        for pool, bid0, bid1 in zip(stale, bids0, bids1):
+            pool.set_reference_bids(trade_size, bid0, bid1)
+
+        return len(stale)
+
+    def quote_pools(
+        self,
+        pools,
+        sell_token,
+        amounts_in
+    ) -> list:
+        '''
+            Quotes selling sell_token in every pool of a list of UniswapV2Pool
+            objects. Returns the amounts out aligned with pools. Pools without
+            liquidity (see UniswapV2LiquidityIndex) quote 0 and are not computed.
+        '''
+
+        liquid = [i for i, pool in enumerate(pools) if pool.has_liquidity]
+        if len(liquid) < len(pools):
+            amounts_out = [0] * len(pools)
+            if isinstance(amounts_in, (list, tuple)):
+                amounts_in = [amounts_in[i] for i in liquid]
+
+            liquid_amounts_out = self.quote_pools([pools[i] for i in liquid], sell_token, amounts_in) if liquid else []
+            for i, amount_out in zip(liquid, liquid_amounts_out):
+                amounts_out[i] = amount_out
+
+            return amounts_out
+
+        reserves_in, reserves_out = self.get_reserves(pools, sell_token)
+
+        return self.get_amount_out_pools(
+                                pools = pools,
+                                amounts_in = amounts_in,
+                                reserves_in = reserves_in,
+                                reserves_out = reserves_out
+                            )
@@ -0,0 +1,198 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_quoter import UniswapV2Quoter
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_registry import UniswapV2PoolView
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_metrics import timed
+
+UniswapV2Quoter = UniswapV2Quoter()
+
+'''
+Route search over the Uniswap V2 pool graph of a PoolRegistry
+'''
+class UniswapV2Router:
+
+    def __init__(
+        self,
+        registry
+    ):
+
+        self.registry = registry
+        self.max_hops = 3
+
+    def _get_edges(
+        self,
+        frontier,
+        sell_token,
+        buy_token,
+        hop,
+        max_hops,
+        snapshot = None
+    ):
+        '''
+            Returns the (parent_token, next_token, pool, reserve_in, reserve_out)
+            edges that extend the frontier by one hop. Tokens are registry
+            token ids.
+        '''
+
+        registry = self.registry
+        token0 = registry.token0
+        liquidity = registry.liquidity
+        pair_rows = registry.pair_rows
+        more_pair_rows = registry.more_pair_rows
+
+        edges = list()
+        for token, (_, path, _) in frontier.items():
+
+            if hop == max_hops:
+                # Last hop can only close the route
+                next_tokens = (buy_token,) if registry.has_pair(token, buy_token) else ()
+            elif hop == max_hops - 1:
+                # Second to last hop must reach a neighbour of buy_token
+                next_tokens = registry.get_common_neighbour_ids(token, buy_token)
+                if registry.has_pair(token, buy_token):
+                    next_tokens.append(buy_token)
+            else:
+                next_tokens = registry.get_neighbour_ids(token)
+
+            for next_token in next_tokens:
+                if next_token in path or next_token == sell_token:
+                    continue
+
+                # registry.get_pair_rows, inlined
+                key = (token << 32) | next_token if token < next_token else (next_token << 32) | token
+                rows = (pair_rows[key],)
+                if key in more_pair_rows:
+                    rows = rows + tuple(more_pair_rows[key])
+
+                for row in rows:
+                    # Pools pruned by a UniswapV2LiquidityIndex
+                    if not liquidity[row]:
+                        continue
+
+                    # Pools added after the snapshot was published
+                    reserve0, reserve1 = self._get_reserves(row, snapshot)
+                    if reserve0 is None:
+                        continue
+
+                    pool = UniswapV2PoolView(registry, row)
+                    if token0[row] == token:
+                        edges.append((token, next_token, pool, reserve0, reserve1))
+                    else:
+                        edges.append((token, next_token, pool, reserve1, reserve0))
+
+        return edges
+
+    def _get_reserves(
+        self,
+        row,
+        snapshot
+    ):
+        if snapshot is None:
+            return self.registry.reserve0[row], self.registry.reserve1[row]
+
+        return snapshot.get_reserves(row)
+
+    @timed('router.find_best_route')
+    def find_best_route(
+        self,
+        sell_token,
+        buy_token,
+        amount_in,
+        max_hops = None,
+        snapshot = None
+    ):
+        '''
+            Returns the route with the best amount out for selling amount_in of
+            sell_token into buy_token over paths of 1 to max_hops pools:
+            {'path': [tokens], 'pools': [pool addresses], 'amounts': [amounts], 'amount_out': int}
+            Returns None if the tokens are not connected.
+
+            With a UniswapV2ReserveSnapshot, all reserves are read from that
+            snapshot, so the route is consistent with one block while the
+            registry is being refreshed.
+        '''
+
+        # NOTE:
+        # Amounts are propagated hop by hop and every hop is quoted with a
+        # single batch call. Since the amount out of a pool is increasing in the
+        # amount in, only the best partial route into each intermediate token is
+        # kept per hop, which keeps the search exact for simple paths.
+
+        registry = self.registry
+        sell_token = registry.get_token_id(sell_token)
+        buy_token = registry.get_token_id(buy_token)
+        if sell_token is None or buy_token is None:
+            return None
+
+        max_hops = max_hops or self.max_hops
+
+        best = None
+        frontier = {sell_token: (int(amount_in), [sell_token], [])}
+
+        for hop in range(1, max_hops + 1):
+
+            edges = self._get_edges(frontier, sell_token, buy_token, hop, max_hops, snapshot)
+            if not edges:
+                break
+
+            amounts_out = UniswapV2Quoter.get_amount_out_pools(
+                                    pools = [e[2] for e in edges],
+                                    amounts_in = [frontier[e[0]][0] for e in edges],
+                                    reserves_in = [e[3] for e in edges],
+                                    reserves_out = [e[4] for e in edges]
+                                )
+
+            next_frontier = dict()
+            for (token, next_token, pool, _, _), amount_out in zip(edges, amounts_out):
+                if not amount_out:
+                    continue
+
+                if next_token == buy_token:
+                    if best is None or amount_out > best[0]:
+                        _, path, pools = frontier[token]
+                        best = (amount_out, path + [next_token], pools + [pool])
+                    continue
+
+                if next_token not in next_frontier or amount_out > next_frontier[next_token][0]:
+                    _, path, pools = frontier[token]
+                    next_frontier[next_token] = (amount_out, path + [next_token], pools + [pool])
+
+            frontier = next_frontier
+
+        if best is None:
+            return None
+
+        amount_out, path, pools = best
+
+        # Amounts along the route
+        amounts = [int(amount_in)]
+        for token, pool in zip(path, pools):
+            reserve0, reserve1 = self._get_reserves(pool.row, snapshot)
+            if registry.token0[pool.row] == token:
+                _, amount = pool.get_amount_out(amounts[-1], reserve0, reserve1)
+            else:
+                _, amount = pool.get_amount_out(amounts[-1], reserve1, reserve0)
+            amounts.append(amount)
+
+        route = {
+            'path': [registry.tokens[token].lower() for token in path],
+            'pools': [pool.pool_address for pool in pools],
+            'amounts': amounts,
+            'amount_out': amount_out
+        }
+
+        return route
+
+    def get_path(
+        self,
+        sell_token,
+        buy_token,
+        amount_in
+    ):
+        '''
+            Returns the token path of the best route, as expected by the
+            encoder in hop.pools_utils. None if no route exists.
+        '''
+        route = self.find_best_route(sell_token, buy_token, amount_in)
+        if route is None:
+            return None
+
+        return route['path']
@@ -0,0 +1,303 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_helper import UniswapV2Helper, rpc
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import aiohttp
+import asyncio
+import http.client
+import threading
+import queue
+import json
+
+UniswapV2Helper = UniswapV2Helper()
+
+'''
+Keep-alive HTTP client with a connection pool per host, for JSON POST requests
+'''
+class UniswapV2HttpClient:
+
+    def __init__(
+        self,
+        max_connections = 8,
+        timeout = 10
+    ):
+
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        # (scheme, host, port) => queue of idle connections
+        self._pools = dict()
+        self._lock = threading.Lock()
+
+    def _get_pool(
+        self,
+        key
+    ):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = queue.LifoQueue(maxsize = self.max_connections)
+
+            return self._pools[key]
+
+    def _connect(
+        self,
+        key
+    ):
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout = self.timeout)
+
+        return http.client.HTTPConnection(host, port, timeout = self.timeout)
+
+    def post(
+        self,
+        url,
+        payload
+    ):
+        '''
+            Posts a JSON payload and returns the decoded JSON response. Idle
+            connections are reused; a request that fails on a reused connection
+            is retried once on a new connection.
+        '''
+
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        body = json.dumps(payload).encode()
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+
+        pool = self._get_pool(key)
+
+        for attempt in range(2):
+            try:
+                conn = pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn = self._connect(key)
+                reused = False
+
+            try:
+                conn.request('POST', path, body = body, headers = headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+
+            if resp.status != 200:
+                conn.close()
+                raise Exception(f"### ERROR: HTTP {resp.status} from {url}")
+
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+            return json.loads(data)
+
+    def close(
+        self
+    ):
+        with self._lock:
+            for pool in self._pools.values():
+                while not pool.empty():
+                    pool.get_nowait().close()
+            self._pools = dict()
+
+
+'''
+asyncio HTTP client (aiohttp) with a keep-alive connection pool, for JSON POST requests
+'''
+class UniswapV2AsyncHttpClient:
+
+    def __init__(
+        self,
+        max_connections = 8,
+        timeout = 10
+    ):
+
+        # NOTE:
+        # The aiohttp session is created lazily in the running event loop and
+        # bound to it. A call from another loop (e.g. a second asyncio.run)
+        # gets a new session, so close the client before its loop ends.
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self.session = None
+        self._loop = None
+
+    def _get_session(
+        self
+    ):
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self._loop is not loop:
+            self.session = aiohttp.ClientSession(
+                                connector = aiohttp.TCPConnector(limit = self.max_connections),
+                                timeout = aiohttp.ClientTimeout(total = self.timeout)
+                            )
+            self._loop = loop
+
+        return self.session
+
+    async def post(
+        self,
+        url,
+        payload
+    ):
+        '''
+            Posts a JSON payload and returns the decoded JSON response, on a
+            pooled keep-alive connection.
+        '''
+        async with self._get_session().post(url, json = payload) as resp:
+            if resp.status != 200:
+                raise Exception(f"### ERROR: HTTP {resp.status} from {url}")
+
+            return await resp.json(content_type = None)
+
+    async def close(
+        self
+    ):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self._loop = None
+
+
+'''
+Batched getReserves refresh of Uniswap V2 pools over JSON-RPC
+'''
+class UniswapV2ReserveRefresher:
+
+    def __init__(
+        self,
+        client = None,
+        url = rpc,
+        batch_size = 100,
+        concurrency = 4,
+        multicall = False
+    ):
+
+        self.client = client or UniswapV2HttpClient(max_connections = concurrency)
+        self.url = url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+        # NOTE:
+        # With multicall, each batch is a single aggregate3 eth_call instead
+        # of a JSON-RPC batch of eth_calls.
+        self.multicall = multicall
+
+    def _refresh_batch(
+        self,
+        pools,
+        start_id
+    ):
+        '''
+            Sends one JSON-RPC batch and routes each response to its pool by id.
+            Returns (updated, failed).
+        '''
+
+        query = UniswapV2Helper.get_balances_batch_call(
+                                pool_addresses = [pool.pool_address for pool in pools],
+                                start_id = start_id
+                            )
+
+        responses = self.client.post(self.url, query['params'])
+
+        # NOTE:
+        # Nodes may answer a batch in any order, hence routing by id. An
+        # invalid batch is answered with a single error object whose id is
+        # null (JSON-RPC 2.0), which fails every call of the batch.
+        if isinstance(responses, dict):
+            responses = [responses]
+        elif not isinstance(responses, list):
+            responses = []
+
+        done = set()
+        for resp in responses:
+            if not isinstance(resp, dict):
+                continue
+
+            # Parse and invalid request errors carry a null id
+            i = resp.get('id')
+            if not isinstance(i, int) or isinstance(i, bool):
+                if 'error' in resp:
+                    print(f"### ERROR: Reserve refresh batch error: {resp['error']}")
+                continue
+
+            i -= start_id
+            if not resp.get('result') or not (0 <= i < len(pools)) or i in done:
+                continue
+
+            pools[i].process_rpc_data({'attribute': query['attribute'], 'result': resp['result']})
+            done.add(i)
+
+        return len(done), len(pools) - len(done)
+
+    def _refresh_multicall_batch(
+        self,
+        pools,
+        start_id
+    ):
+        '''
+            Sends one aggregate3 call for the batch and sets the decoded
+            reserves of the pools whose call succeeded. Returns (updated, failed).
+        '''
+
+        query = UniswapV2Helper.get_reserves_multicall_call(
+                                pool_addresses = [pool.pool_address for pool in pools],
+                                request_id = start_id
+                            )
+
+        resp = self.client.post(self.url, query['params'])
+        if not isinstance(resp, dict) or not resp.get('result'):
+            return 0, len(pools)
+
+        reserves0, reserves1, success = UniswapV2Helper.process_reserves_multicall(resp['result'])
+
+        updated = 0
+        for pool, reserve0, reserve1, ok in zip(pools, reserves0, reserves1, success):
+            if ok:
+                pool.set_reserves(reserve0, reserve1)
+                updated += 1
+
+        return updated, len(pools) - updated
+
+    def refresh(
+        self,
+        pools
+    ):
+        '''
+            Refreshes reserves of all pools with batches of batch_size calls,
+            concurrency batches in flight at a time.
+        '''
+
+        pools = list(pools)
+        batches = [
+            (pools[i:i + self.batch_size], i + 1)
+            for i in range(0, len(pools), self.batch_size)
+        ]
+
+        stats = {'updated': 0, 'failed': 0, 'batches': len(batches)}
+        if not batches:
+            return stats
+
+        refresh_batch = self._refresh_multicall_batch if self.multicall else self._refresh_batch
+
+        with ThreadPoolExecutor(max_workers = self.concurrency) as executor:
+            futures = [executor.submit(refresh_batch, batch, start_id) for batch, start_id in batches]
+            for (batch, _), future in zip(batches, futures):
+                try:
+                    updated, failed = future.result()
+                except Exception as e:
+                    print(f"### ERROR: Reserve refresh batch failed: {e}")
+                    updated, failed = 0, len(batch)
+
+                stats['updated'] += updated
+                stats['failed'] += failed
+
+        return stats
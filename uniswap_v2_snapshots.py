@@ -0,0 +1,290 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_pool_model import UniswapV2Pool
+import threading
+import weakref
+
+'''
+Immutable, block-tagged snapshot of the reserves of a PoolRegistry
+'''
+class UniswapV2ReserveSnapshot:
+
+    __slots__ = ('block', 'shift', 'mask', 'chunks', 'size', '__weakref__')
+
+    def __init__(
+        self,
+        block,
+        shift,
+        chunks,
+        size
+    ):
+
+        # NOTE:
+        # Reserves are stored in fixed-size chunks of interleaved
+        # (reserve0, reserve1) tuples. Chunks are never mutated, so snapshots
+        # of consecutive blocks share all chunks without changed rows, and a
+        # reader always sees both reserves of a row from the same block.
+        self.block = block
+        self.shift = shift
+        self.mask = (1 << shift) - 1
+        self.chunks = chunks
+        self.size = size
+
+    def __len__(
+        self
+    ):
+        return self.size
+
+    def get_reserves(
+        self,
+        row
+    ):
+        '''
+            Returns (reserve0, reserve1) of a registry row, (None, None) for
+            rows added to the registry after the snapshot was published.
+        '''
+        if row >= self.size:
+            return None, None
+
+        chunk = self.chunks[row >> self.shift]
+        i = (row & self.mask) << 1
+
+        return chunk[i], chunk[i + 1]
+
+    def get_reserves_batch(
+        self,
+        rows
+    ):
+        '''
+            Returns the (reserves0, reserves1) lists of registry rows, None for
+            rows added after the snapshot was published.
+        '''
+        chunks = self.chunks
+        shift = self.shift
+        mask = self.mask
+        size = self.size
+
+        reserves0 = list()
+        reserves1 = list()
+        for row in rows:
+            if row >= size:
+                reserves0.append(None)
+                reserves1.append(None)
+                continue
+
+            chunk = chunks[row >> shift]
+            i = (row & mask) << 1
+            reserves0.append(chunk[i])
+            reserves1.append(chunk[i + 1])
+
+        return reserves0, reserves1
+
+
+'''
+Copy-on-write publisher of reserve snapshots of a PoolRegistry
+'''
+class UniswapV2SnapshotStore:
+
+    def __init__(
+        self,
+        registry,
+        chunk_size = 1024,
+        block = None
+    ):
+
+        # NOTE:
+        # A single writer (the refresh or event thread) updates the registry
+        # and calls publish once a block is fully applied. publish rebuilds
+        # only the chunks of rows changed since the previous snapshot and then
+        # swaps the current reference, which is atomic. Readers take the
+        # current snapshot with get_snapshot and keep using it without locks.
+        # Snapshots are freed as soon as no reader references them.
+        if chunk_size & (chunk_size - 1):
+            raise Exception(f"### ERROR: Snapshot chunk size {chunk_size} is not a power of two.")
+
+        self.registry = registry
+        self.chunk_size = chunk_size
+        self.shift = chunk_size.bit_length() - 1
+
+        # Serializes writers, readers never take it
+        self.lock = threading.Lock()
+
+        # (block) => snapshot, for snapshots still held by a reader
+        self.snapshots = weakref.WeakValueDictionary()
+
+        self.current = None
+        self.publish(block, full = True)
+
+    def _build_chunk(
+        self,
+        index
+    ):
+        start = index * self.chunk_size
+        end = min(start + self.chunk_size, len(self.registry))
+
+        chunk = [0] * ((end - start) << 1)
+        chunk[0::2] = self.registry.reserve0[start:end]
+        chunk[1::2] = self.registry.reserve1[start:end]
+
+        return tuple(chunk)
+
+    def publish(
+        self,
+        block,
+        full = False
+    ):
+        '''
+            Publishes the current registry reserves as the snapshot of block
+            and returns it. Only chunks with changed or new rows are copied,
+            unless full is set.
+        '''
+
+        with self.lock:
+
+            registry = self.registry
+            size = len(registry)
+            nr_chunks = (size + self.chunk_size - 1) >> self.shift
+
+            changed_rows = registry.changed_rows
+            registry.changed_rows = set()
+
+            if full or self.current is None:
+                chunks = [self._build_chunk(i) for i in range(nr_chunks)]
+            else:
+                chunks = list(self.current.chunks)
+
+                changed = {row >> self.shift for row in changed_rows if row < size}
+
+                # New rows extend the last chunk of the previous snapshot
+                if size > self.current.size:
+                    changed.update(range(self.current.size >> self.shift, nr_chunks))
+                    chunks.extend([None] * (nr_chunks - len(chunks)))
+
+                for i in changed:
+                    chunks[i] = self._build_chunk(i)
+
+            snapshot = UniswapV2ReserveSnapshot(block, self.shift, tuple(chunks), size)
+
+            if block is not None:
+                self.snapshots[block] = snapshot
+            self.current = snapshot
+
+        return snapshot
+
+    def get_snapshot(
+        self,
+        block = None
+    ):
+        '''
+            Returns the latest snapshot, or the snapshot of block if a reader
+            still holds it. Returns None for released or unknown blocks.
+        '''
+        if block is None:
+            return self.current
+
+        return self.snapshots.get(block)
+
+    def get_live_blocks(
+        self
+    ) -> list:
+        '''
+            Returns the blocks of the snapshots that are still referenced.
+        '''
+        return sorted(self.snapshots.keys())
+
+    def get_pool(
+        self,
+        pool_address,
+        snapshot = None
+    ):
+        '''
+            Returns a pool of the registry whose reserves are read from
+            snapshot (the latest snapshot by default). None if not found.
+        '''
+        row = self.registry.get_row(pool_address)
+        if row is None:
+            return None
+
+        return UniswapV2SnapshotPoolView(self.registry, snapshot or self.current, row)
+
+
+'''
+Read-only UniswapV2Pool interface on a registry row, with reserves of a snapshot
+'''
+class UniswapV2SnapshotPoolView:
+
+    __slots__ = ('registry', 'snapshot', 'row')
+
+    def __init__(
+        self,
+        registry,
+        snapshot,
+        row
+    ):
+        self.registry = registry
+        self.snapshot = snapshot
+        self.row = row
+
+    @property
+    def pool_address(
+        self
+    ):
+        return self.registry.pool_addresses[self.row]
+
+    @property
+    def source(
+        self
+    ):
+        return self.registry.sources[self.registry.source[self.row]]
+
+    @property
+    def fork(
+        self
+    ):
+        return self.registry.forks[self.registry.source[self.row]]
+
+    @property
+    def token0(
+        self
+    ):
+        return self.registry.tokens[self.registry.token0[self.row]]
+
+    @property
+    def token1(
+        self
+    ):
+        return self.registry.tokens[self.registry.token1[self.row]]
+
+    @property
+    def tokens(
+        self
+    ):
+        return [self.token0, self.token1]
+
+    @property
+    def has_liquidity(
+        self
+    ):
+        return bool(self.registry.liquidity[self.row])
+
+    @property
+    def reserve0(
+        self
+    ):
+        return self.snapshot.get_reserves(self.row)[0]
+
+    @property
+    def reserve1(
+        self
+    ):
+        return self.snapshot.get_reserves(self.row)[1]
+
+    @property
+    def block(
+        self
+    ):
+        return self.snapshot.block
+
+    has_complete_data = UniswapV2Pool.has_complete_data
+    get_path = UniswapV2Pool.get_path
+    get_amount_out = UniswapV2Pool.get_amount_out
+    get_pair_amount_out = UniswapV2Pool.get_pair_amount_out
+    get_amount_in = UniswapV2Pool.get_amount_in
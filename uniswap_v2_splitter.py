@@ -0,0 +1,176 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_quoter import UniswapV2Quoter
+import math
+import time
+
+UniswapV2Quoter = UniswapV2Quoter()
+
+'''
+Splits an order across parallel Uniswap V2 pools or paths
+'''
+class UniswapV2Splitter:
+
+    def __init__(
+        self
+    ):
+
+        self.fee = UniswapV2Quoter.fee_numerator / UniswapV2Quoter.fee_denominator
+
+    def get_virtual_reserves(
+        self,
+        path,
+        sell_token
+    ):
+        '''
+            Returns the (reserve_in, reserve_out) of the single constant-product
+            pool equivalent to a path of pools, starting with sell_token.
+
+            Two pools (x1, y1), (x2, y2) compose into a pool with fee of the first
+            hop and reserves x = x1 x2 / (x2 + g2 y1), y = g2 y1 y2 / (x2 + g2 y1).
+            The result is expressed for the splitter fee: a pool (x, y) with fee
+            g1 quotes as a pool (x g / g1, y) with fee g.
+        '''
+
+        first_fee = None
+        token_in = sell_token.lower()
+        reserve_in = None
+        reserve_out = None
+        for pool in path:
+            fee = pool.fork.fee_numerator / pool.fork.fee_denominator
+            if pool.token0.lower() == token_in:
+                x, y = pool.reserve0 or 0, pool.reserve1 or 0
+                token_in = pool.token1.lower()
+            else:
+                x, y = pool.reserve1 or 0, pool.reserve0 or 0
+                token_in = pool.token0.lower()
+
+            if reserve_in is None:
+                first_fee = fee
+                reserve_in, reserve_out = float(x), float(y)
+                continue
+
+            denominator = x + fee * reserve_out
+            if not denominator:
+                return 0.0, 0.0
+            reserve_in, reserve_out = reserve_in * x / denominator, fee * reserve_out * y / denominator
+
+        if reserve_in is None:
+            return reserve_in, reserve_out
+
+        return reserve_in * self.fee / first_fee, reserve_out
+
+    def split_reserves(
+        self,
+        reserves,
+        amount_in
+    ) -> list:
+        '''
+            Returns the amounts in per pool that maximize total amount out for
+            a list of (reserve_in, reserve_out).
+
+            The allocation equalizes marginal prices of the active pools,
+            g x y / (x + g a)^2 = l, which gives in closed form
+            a_i = (sqrt(g x_i y_i / l) - x_i) / g over the pools whose marginal
+            price at zero, g y / x, exceeds l.
+        '''
+
+        fee = self.fee
+        amount_in = int(amount_in)
+        amounts_in = [0] * len(reserves)
+
+        # Pools by marginal price at zero, best first
+        order = sorted(
+            (i for i, (x, y) in enumerate(reserves) if x > 0 and y > 0),
+            key = lambda i: reserves[i][1] / reserves[i][0],
+            reverse = True
+        )
+        if not order or amount_in <= 0:
+            return amounts_in
+
+        # Grow the active set while the next pool is still worth entering
+        sum_x = 0.0
+        sum_sqrt = 0.0
+        active = 0
+        for k, i in enumerate(order):
+            x, y = reserves[i]
+            sum_x += x
+            sum_sqrt += math.sqrt(fee * x * y)
+            active = k + 1
+            inv_sqrt_l = (fee * amount_in + sum_x) / sum_sqrt
+            if k + 1 < len(order):
+                x_next, y_next = reserves[order[k + 1]]
+                if math.sqrt(fee * x_next * y_next) * inv_sqrt_l <= x_next:
+                    break
+
+        inv_sqrt_l = (fee * amount_in + sum_x) / sum_sqrt
+        for i in order[:active]:
+            x, y = reserves[i]
+            amounts_in[i] = max(int((math.sqrt(fee * x * y) * inv_sqrt_l - x) / fee), 0)
+
+        # Assign rounding residual to the largest allocation
+        residual = amount_in - sum(amounts_in)
+        largest = max(order[:active], key = lambda i: amounts_in[i])
+        amounts_in[largest] += residual
+
+        return amounts_in
+
+    def _get_path_amount_out(
+        self,
+        path,
+        sell_token,
+        amount_in
+    ):
+        token_in = sell_token.lower()
+        amount = amount_in
+        for pool in path:
+            if pool.token0.lower() == token_in:
+                _, amount = pool.get_amount_out(amount, pool.reserve0, pool.reserve1)
+                token_in = pool.token1.lower()
+            else:
+                _, amount = pool.get_amount_out(amount, pool.reserve1, pool.reserve0)
+                token_in = pool.token0.lower()
+
+        return amount
+
+    def split_paths(
+        self,
+        paths,
+        sell_token,
+        amount_in
+    ):
+        '''
+            Splits amount_in of sell_token across alternative paths, each a list
+            of pools. Returns the amounts in and exact amounts out per path, the
+            total amount out and the solve time in seconds.
+        '''
+
+        start = time.perf_counter()
+
+        reserves = [self.get_virtual_reserves(path, sell_token) for path in paths]
+        amounts_in = self.split_reserves(reserves, amount_in)
+
+        solve_time = time.perf_counter() - start
+
+        amounts_out = [
+            self._get_path_amount_out(path, sell_token, a) if a > 0 else 0
+            for path, a in zip(paths, amounts_in)
+        ]
+
+        split = {
+            'amounts_in': amounts_in,
+            'amounts_out': amounts_out,
+            'amount_out': sum(amounts_out),
+            'solve_time': solve_time
+        }
+
+        return split
+
+    def split_pools(
+        self,
+        pools,
+        sell_token,
+        amount_in
+    ):
+        '''
+            Splits amount_in of sell_token across pools of the same pair.
+        '''
+        return self.split_paths([[pool] for pool in pools], sell_token, amount_in)
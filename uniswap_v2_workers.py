@@ -0,0 +1,343 @@
+from utils.Uniswap.Uniswap_v2.Uniswap_v2_router import UniswapV2Router
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import struct
+import time
+
+# NOTE:
+# Shared table layout: a 32 byte header (version, size, block as uint64)
+# followed by one 32 byte record per registry row, reserve0 and reserve1 as
+# 14 byte big endian uint112, a known flag (1) and padding (3), then one
+# has_liquidity byte per row. Reserves of rows without the flag are unknown,
+# which is not the same as 0. The version is a sequence lock: it is odd while
+# the writer updates records, and readers retry a read that overlapped a
+# write, so a quote never mixes reserves of two blocks.
+_HEADER = struct.Struct('>QQQ')
+_HEADER_SIZE = 32
+_RECORD_SIZE = 32
+
+
+'''
+Reserve table of a PoolRegistry in shared memory
+'''
+class UniswapV2SharedReserves:
+
+    def __init__(
+        self,
+        size = None,
+        name = None,
+        spins = 64,
+        backoff = 0.0001,
+        max_retries = 10000
+    ):
+        '''
+            Creates a table for size rows, or attaches to the table name.
+        '''
+
+        # NOTE:
+        # read retries spins times back to back, then sleeps backoff seconds
+        # between retries and gives up after max_retries, about one second
+        # by default. A writer dying mid-write leaves the version odd, which
+        # would otherwise hang every reader.
+        self.spins = spins
+        self.backoff = backoff
+        self.max_retries = max_retries
+
+        if size is not None:
+            self.memory = shared_memory.SharedMemory(create = True, size = _HEADER_SIZE + max(size, 1) * (_RECORD_SIZE + 1))
+            _HEADER.pack_into(self.memory.buf, 0, 0, size, 0)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name = name)
+            self.owner = False
+
+        self.name = self.memory.name
+        self.buf = self.memory.buf
+
+        # has_liquidity per row, a drop-in for PoolRegistry.liquidity
+        size = len(self)
+        self.liquidity = self.buf[_HEADER_SIZE + size * _RECORD_SIZE:_HEADER_SIZE + size * (_RECORD_SIZE + 1)]
+
+    def __len__(
+        self
+    ):
+        return _HEADER.unpack_from(self.buf, 0)[1]
+
+    def get_version(
+        self
+    ):
+        return _HEADER.unpack_from(self.buf, 0)[0]
+
+    def get_block(
+        self
+    ):
+        return _HEADER.unpack_from(self.buf, 0)[2]
+
+    def get_reserves(
+        self,
+        row
+    ):
+        '''
+            Returns (reserve0, reserve1) of a registry row, (None, None) if
+            unknown, without any consistency check (see read).
+        '''
+        offset = _HEADER_SIZE + row * _RECORD_SIZE
+        record = self.buf[offset:offset + _RECORD_SIZE]
+        if not record[28]:
+            return None, None
+
+        return int.from_bytes(record[0:14], 'big'), int.from_bytes(record[14:28], 'big')
+
+    def read(
+        self,
+        function,
+        *args
+    ):
+        '''
+            Calls function(*args), which reads reserves from this table, and
+            retries it until no write overlapped the call. Raises once
+            max_retries reads overlapped a write.
+        '''
+        retries = 0
+        while True:
+            version = self.get_version()
+            if not version & 1:
+                result = function(*args)
+
+                if self.get_version() == version:
+                    return result
+
+            retries += 1
+            if retries >= self.max_retries:
+                raise Exception(f"### ERROR: Shared reserves {self.name} still written after {retries} reads (version {version}), writer stalled?")
+
+            if retries >= self.spins:
+                time.sleep(self.backoff)
+
+    def write(
+        self,
+        rows,
+        reserves0,
+        reserves1,
+        block,
+        liquidity = None
+    ):
+        '''
+            Writes the reserves of rows and sets the table block, None
+            reserves are written as unknown. With liquidity, also copies the
+            has_liquidity flags of all rows. Single writer.
+        '''
+
+        version, size, _ = _HEADER.unpack_from(self.buf, 0)
+
+        rows = list(rows)
+        if rows and max(rows) >= size:
+            raise Exception(f"### ERROR: Row {max(rows)} is out of the {size} rows of shared reserves {self.name}, create a new table.")
+        if liquidity is not None and len(liquidity) > size:
+            raise Exception(f"### ERROR: {len(liquidity)} liquidity flags for the {size} rows of shared reserves {self.name}, create a new table.")
+
+        _HEADER.pack_into(self.buf, 0, version + 1, size, block)
+
+        if liquidity is not None:
+            self.liquidity[:len(liquidity)] = liquidity
+
+        buf = self.buf
+        for row, reserve0, reserve1 in zip(rows, reserves0, reserves1):
+            offset = _HEADER_SIZE + row * _RECORD_SIZE
+            if reserve0 is None or reserve1 is None:
+                buf[offset:offset + _RECORD_SIZE] = bytes(_RECORD_SIZE)
+            else:
+                buf[offset:offset + _RECORD_SIZE] = reserve0.to_bytes(14, 'big') + reserve1.to_bytes(14, 'big') + b'\x01\x00\x00\x00'
+
+        _HEADER.pack_into(self.buf, 0, version + 2, size, block)
+
+    def write_registry(
+        self,
+        registry,
+        block,
+        rows = None
+    ):
+        '''
+            Copies the reserves of registry rows (all rows by default) and the
+            has_liquidity flags of all rows into the table. Raises if the
+            registry has more rows than the table.
+        '''
+        if len(registry) > len(self):
+            raise Exception(f"### ERROR: Registry has {len(registry)} pools, shared reserves {self.name} only {len(self)} rows, create a new table.")
+
+        if rows is None:
+            rows = range(len(registry))
+
+        rows = list(rows)
+        self.write(rows, [registry.reserve0[r] for r in rows], [registry.reserve1[r] for r in rows], block, registry.liquidity)
+
+    def close(
+        self
+    ):
+        self.liquidity.release()
+        self.liquidity = None
+        self.buf = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+# Per worker process state, set by _init_worker
+_worker = dict()
+
+
+def _init_worker(
+    name,
+    registry
+):
+    reserves = UniswapV2SharedReserves(name = name)
+
+    # NOTE:
+    # The worker registry is a copy of the refresher's, so tokens, sources and
+    # the pair index are the same rows. Its has_liquidity column is replaced
+    # by the shared flags, so pruning by the refresher reaches the workers
+    # with the next refresh.
+    registry.liquidity = reserves.liquidity
+
+    _worker['registry'] = registry
+    _worker['reserves'] = reserves
+    _worker['router'] = UniswapV2Router(registry)
+
+
+def _quote(
+    registry,
+    reserves,
+    pool_address,
+    token_in,
+    amount_in
+):
+    row = registry.get_row(pool_address)
+    if row is None:
+        return None
+
+    reserve0, reserve1 = reserves.get_reserves(row)
+    if reserve0 is None:
+        return 0
+
+    pool = registry[row]
+
+    if pool.token0.lower() == token_in.lower():
+        return pool.get_amount_out(amount_in, reserve0, reserve1)[1]
+
+    return pool.get_amount_out(amount_in, reserve1, reserve0)[1]
+
+
+def _quote_chunk(
+    requests
+) -> list:
+    registry = _worker['registry']
+    reserves = _worker['reserves']
+
+    return [reserves.read(_quote, registry, reserves, *request) for request in requests]
+
+
+def _route_chunk(
+    requests
+) -> list:
+    reserves = _worker['reserves']
+    router = _worker['router']
+
+    return [
+        reserves.read(router.find_best_route, sell_token, buy_token, amount_in, None, reserves)
+        for sell_token, buy_token, amount_in in requests
+    ]
+
+
+'''
+Process pool of quoting workers reading reserves from shared memory
+'''
+class UniswapV2QuoteWorkerPool:
+
+    def __init__(
+        self,
+        registry,
+        processes = None,
+        chunk_size = 256,
+        block = 0
+    ):
+
+        # NOTE:
+        # The process owning the pool (the refresher) keeps updating its
+        # registry and pushes reserves with refresh. Workers get a copy of the
+        # registry once at startup and read reserves and has_liquidity
+        # zero-copy from the shared table, so quoting runs on all cores
+        # without pickling reserves. Pools added to the registry later make
+        # refresh restart the workers on a new table.
+        self.registry = registry
+        self.processes = processes
+        self.chunk_size = chunk_size
+
+        self._start(block)
+
+    def _start(
+        self,
+        block
+    ):
+        self.reserves = UniswapV2SharedReserves(size = len(self.registry))
+        self.reserves.write_registry(self.registry, block)
+
+        self.executor = ProcessPoolExecutor(
+                                max_workers = self.processes,
+                                initializer = _init_worker,
+                                initargs = (self.reserves.name, self.registry)
+                            )
+
+    def refresh(
+        self,
+        block,
+        rows = None
+    ):
+        '''
+            Publishes the registry reserves of rows (all by default) and the
+            has_liquidity flags to the workers as the state of block. If pools
+            were added to the registry, restarts the workers on a new table.
+        '''
+        if len(self.registry) > len(self.reserves):
+            print(f"### INFO: Registry grew to {len(self.registry)} pools, restarting quote workers.")
+            self.close()
+            self._start(block)
+            return
+
+        self.reserves.write_registry(self.registry, block, rows)
+
+    def _map(
+        self,
+        function,
+        requests
+    ) -> list:
+        requests = list(requests)
+        chunks = [requests[i:i + self.chunk_size] for i in range(0, len(requests), self.chunk_size)]
+
+        return [result for chunk in self.executor.map(function, chunks) for result in chunk]
+
+    def get_amount_out_batch(
+        self,
+        requests
+    ) -> list:
+        '''
+            Quotes (pool_address, token_in, amount_in) requests on the workers
+            and returns the amounts out, None for unknown pools and 0 for
+            pools with unknown reserves.
+        '''
+        return self._map(_quote_chunk, requests)
+
+    def find_best_routes(
+        self,
+        requests
+    ) -> list:
+        '''
+            Runs UniswapV2Router.find_best_route for (sell_token, buy_token,
+            amount_in) requests on the workers.
+        '''
+        return self._map(_route_chunk, requests)
+
+    def close(
+        self
+    ):
+        self.executor.shutdown()
+        self.reserves.close()